@@ -0,0 +1,190 @@
+# bench/engines.py — micro-benchmark dos engines de domínio (caminho do toggle)
+#
+#   python -m bench.engines                       (de dentro de backend/)
+#   python -m bench.engines --save                grava o baseline
+#   python -m bench.engines --baseline outro.json --tolerance 0.5
+#
+# Mede xp_engine, level_engine, streak_engine, achievement_engine, o
+# filtro de tokens revogados (caminho de todo request autenticado) e o
+# estágio de CPU de services/analytics.py com entradas realistas e
+# adversariais (XP muito alto, históricos de anos). Cada caso reporta a
+# mediana de --rounds rodadas, em µs por chamada.
+#
+# Sem --save, compara com o baseline (bench/baselines/engines.json) e sai
+# com código 1 se algum caso ficar mais de --tolerance mais lento. O
+# baseline é da máquina onde foi gravado: grave antes de mexer no código e
+# compare na mesma máquina.
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(BACKEND_DIR, "bench", "baselines", "engines.json")
+
+
+# ============================================================
+# MEDIÇÃO
+# ============================================================
+def _per_call_us(fn, number: int, rounds: int) -> float:
+    fn()  # aquece caches
+    samples = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - t0) / number * 1e6)
+    return statistics.median(samples)
+
+
+# ============================================================
+# ENTRADAS
+# ============================================================
+def _history(days: int, habits: int = 5):
+    """[(habit_id, date, done)] de `days` dias terminando hoje (~70% feitos)."""
+    today = date.today()
+    logs = []
+    for i in range(days):
+        ds = (today - timedelta(days=days - 1 - i)).strftime("%Y-%m-%d")
+        for h in range(habits):
+            logs.append((f"h{h}", ds, (i * 7 + h * 3) % 10 < 7))
+    return logs
+
+
+def _streak_habit(last_done_date):
+    return SimpleNamespace(current_streak=5, best_streak=9, last_done_date=last_done_date)
+
+
+def _achievements_session():
+    """Conquistas padrão e dois usuários (banco temporário, ver main)."""
+    from database import SessionLocal
+    from models import Achievement, UserAchievement
+    from models_auth import AuthUser
+    from services.bootstrap import init_database
+
+    init_database()
+    db = SessionLocal()
+    fresh = AuthUser(email="fresh@b.com", username="fresh", password_hash="x", xp_total=0)
+    veteran = AuthUser(email="vet@b.com", username="vet", password_hash="x", xp_total=10**9)
+    db.add_all([fresh, veteran])
+    db.flush()
+    for ach in db.query(Achievement).all():
+        db.add(UserAchievement(user_id=veteran.id, achievement_id=ach.id))
+    db.commit()
+    return db, fresh, veteran
+
+
+# ============================================================
+# CASOS
+# ============================================================
+def _cases(history_days: int):
+    from services import analytics
+    from services.achievement_engine import check_achievements
+    from services.level_engine import calculate_level, level_progress
+    from services.revocation import denylist
+    from services.streak_engine import update_streak
+    from services.xp_engine import calculate_xp_for_habit, get_level_from_xp
+
+    today = date.today().strftime("%Y-%m-%d")
+    yesterday = (datetime.utcnow().date() - timedelta(days=1)).strftime("%Y-%m-%d")
+    long_ago = (datetime.utcnow().date() - timedelta(days=400)).strftime("%Y-%m-%d")
+
+    history = _history(history_days)
+    habits = [(f"h{h}", f"Hábito {h}", 4, 12) for h in range(5)]
+    one_habit = [(d, done) for habit_id, d, done in history if habit_id == "h0"]
+
+    db, fresh, veteran = _achievements_session()
+
+    # (nome, fn, chamadas por rodada)
+    return [
+        ("xp.calculate_xp_for_habit", lambda: calculate_xp_for_habit("hard", 5, 3), 20000),
+        ("xp.get_level_from_xp[xp=1e3]", lambda: get_level_from_xp(1_000), 20000),
+        ("xp.get_level_from_xp[xp=1e6]", lambda: get_level_from_xp(1_000_000), 20000),
+        ("xp.get_level_from_xp[xp=1e12]", lambda: get_level_from_xp(10**12), 200),
+        ("level.calculate_level[xp=1e3]", lambda: calculate_level(1_000), 20000),
+        ("level.calculate_level[xp=1e12]", lambda: calculate_level(10**12), 200),
+        ("level.level_progress[xp=1e12]", lambda: level_progress(10**12), 200),
+        ("streak.update_streak[yesterday]", lambda: update_streak(_streak_habit(yesterday), True), 20000),
+        ("streak.update_streak[broken]", lambda: update_streak(_streak_habit(long_ago), True), 20000),
+        ("streak.update_streak[first]", lambda: update_streak(_streak_habit(None), True), 20000),
+        ("achievements.check[none_unlocked]", lambda: check_achievements(fresh, 0, 0, False, db), 200),
+        ("achievements.check[all_unlocked]", lambda: check_achievements(veteran, 400, 5, True, db), 200),
+        ("revocation.is_revoked[miss]", lambda: denylist.is_revoked("00000000-jti-not-revoked"), 20000),
+        (f"analytics.full_history[{history_days}d]", lambda: analytics.full_history(5, history, today), 20),
+        (f"analytics.insights[{history_days}d]", lambda: analytics.insights(habits, history, today), 20),
+        (f"analytics.habit_analytics[{history_days}d]", lambda: analytics.habit_analytics(one_habit, today), 50),
+    ]
+
+
+# ============================================================
+# BASELINE
+# ============================================================
+def _compare(results: dict, baseline: dict, tolerance: float) -> dict:
+    report = {}
+    for name, us in results.items():
+        before = baseline.get(name)
+        if before is None:
+            report[name] = {"us": us, "baseline_us": None, "ratio": None, "regressed": False}
+            continue
+        ratio = us / before if before else None
+        report[name] = {
+            "us": us,
+            "baseline_us": before,
+            "ratio": round(ratio, 3) if ratio is not None else None,
+            "regressed": ratio is not None and ratio > 1 + tolerance,
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark dos engines de domínio")
+    parser.add_argument("--rounds", type=int, default=7)
+    parser.add_argument("--history-days", type=int, default=3 * 365)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save", action="store_true", help="grava o resultado como baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="regressão tolerada (0.25 = +25%%)")
+    parser.add_argument("--only", help="só os casos cujo nome contém este texto")
+    args = parser.parse_args()
+
+    # antes de qualquer import de database
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "engines.db")
+    sys.path.insert(0, BACKEND_DIR)
+
+    results = {}
+    for name, fn, number in _cases(args.history_days):
+        if args.only and args.only not in name:
+            continue
+        results[name] = round(_per_call_us(fn, number, args.rounds), 3)
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "machine": platform.platform(),
+                "saved_at": datetime.utcnow().isoformat(timespec="seconds"),
+                "results_us": results,
+            }, f, indent=2)
+        print(json.dumps({"saved": args.baseline, "results_us": results}, indent=2))
+        return
+
+    if not os.path.exists(args.baseline):
+        print(json.dumps({"baseline": None, "results_us": results}, indent=2))
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    report = _compare(results, baseline["results_us"], args.tolerance)
+    regressed = sorted(name for name, row in report.items() if row["regressed"])
+    print(json.dumps({"baseline": args.baseline, "cases": report, "regressed": regressed}, indent=2))
+    sys.exit(1 if regressed else 0)
+
+
+if __name__ == "__main__":
+    main()
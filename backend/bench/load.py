@@ -0,0 +1,230 @@
+# bench/load.py — driver de carga assíncrono contra o app FastAPI
+#
+#   python -m bench.seed --db sqlite:///./bench.db --users 500 --reset
+#   DATABASE_URL=sqlite:///./bench.db python -m bench.load --scenario mixed --duration 30
+#   python -m bench.load --url http://127.0.0.1:8000 --scenario morning --concurrency 200
+#
+# Sem --url o app roda no mesmo processo (httpx.ASGITransport); com --url os
+# tokens são emitidos localmente, então SECRET_KEY/DATABASE_URL precisam
+# ser os mesmos do servidor. Requer httpx (bench/requirements.txt).
+#
+# Saída: JSON com throughput, p50/p95/p99 e taxa de erro por rota.
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# (peso, ação) — mistura típica de um dia normal
+SCENARIOS = {
+    # abre o app e marca tudo de manhã
+    "morning": [(70, "toggle"), (25, "dashboard"), (5, "habits")],
+    # clientes com o dashboard aberto fazendo polling
+    "polling": [(90, "dashboard"), (10, "progress")],
+    # painéis de análise abertos enquanto o resto usa o app:
+    # comparar o p99 das rotas baratas com COMPUTE_POOL_ENABLED=0/1
+    "analytics": [(40, "habits"), (30, "dashboard"), (20, "insights"), (10, "full_history")],
+    "mixed": [
+        (45, "dashboard"),
+        (25, "toggle"),
+        (10, "progress"),
+        (8, "habits"),
+        (5, "weekly_overview"),
+        (4, "monthly_overview"),
+        (2, "insights"),
+        (1, "full_history"),
+    ],
+}
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    k = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    def add(self, route, seconds, status):
+        self.latencies[route].append(seconds)
+        self.statuses[route][status] += 1
+        if status >= 400 or status == 0:
+            self.errors[route] += 1
+
+    def report(self, elapsed):
+        routes = {}
+        total = 0
+        total_errors = 0
+        for route, values in sorted(self.latencies.items()):
+            values.sort()
+            count = len(values)
+            total += count
+            total_errors += self.errors[route]
+            routes[route] = {
+                "requests": count,
+                "rps": round(count / elapsed, 1),
+                "p50_ms": round(_percentile(values, 50) * 1000, 2),
+                "p95_ms": round(_percentile(values, 95) * 1000, 2),
+                "p99_ms": round(_percentile(values, 99) * 1000, 2),
+                "error_rate": round(self.errors[route] / count, 4),
+                "statuses": dict(self.statuses[route]),
+            }
+        return {
+            "duration_s": round(elapsed, 2),
+            "requests": total,
+            "rps": round(total / elapsed, 1) if elapsed else 0,
+            "error_rate": round(total_errors / total, 4) if total else 0,
+            "routes": routes,
+        }
+
+
+def _load_bench_users(limit):
+    """(user_id, [habit_ids]) dos usuários gerados pelo bench.seed."""
+    from database import SessionLocal
+    from models import Habit
+    from models_auth import AuthUser
+    from bench.seed import BENCH_EMAIL_DOMAIN
+
+    db = SessionLocal()
+    try:
+        users = (
+            db.query(AuthUser.id)
+            .filter(AuthUser.email.like(f"%{BENCH_EMAIL_DOMAIN}"))
+            .limit(limit)
+            .all()
+        )
+        user_ids = [u.id for u in users]
+        habits = defaultdict(list)
+        if user_ids:
+            for habit_id, user_id in (
+                db.query(Habit.id, Habit.user_id).filter(Habit.user_id.in_(user_ids)).all()
+            ):
+                habits[user_id].append(habit_id)
+        return [(uid, habits[uid]) for uid in user_ids]
+    finally:
+        db.close()
+
+
+async def _virtual_user(client, recorder, user, weights, deadline, month, rng):
+    from services.jwt_token import create_access_token
+
+    user_id, habit_ids = user
+    headers = {"Authorization": f"Bearer {create_access_token(user_id)}"}
+    actions = [a for _, a in weights]
+    cum_weights = []
+    acc = 0
+    for w, _ in weights:
+        acc += w
+        cum_weights.append(acc)
+
+    while time.perf_counter() < deadline:
+        action = rng.choices(actions, cum_weights=cum_weights)[0]
+
+        if action == "toggle":
+            if not habit_ids:
+                continue
+            method, path, route = "POST", f"/habits/{rng.choice(habit_ids)}/toggle", "POST /habits/{habit_id}/toggle"
+        elif action == "dashboard":
+            method, path, route = "GET", "/dashboard/", "GET /dashboard/"
+        elif action == "habits":
+            method, path, route = "GET", "/habits/", "GET /habits/"
+        elif action == "progress":
+            method, path, route = "GET", "/progress/", "GET /progress/"
+        elif action == "weekly_overview":
+            method, path, route = "GET", "/progress/weekly-overview", "GET /progress/weekly-overview"
+        elif action == "monthly_overview":
+            method, path, route = "GET", f"/progress/monthly-overview?month={month}", "GET /progress/monthly-overview"
+        elif action == "insights":
+            method, path, route = "GET", "/progress/insights", "GET /progress/insights"
+        else:
+            method, path, route = "GET", "/progress/full-history", "GET /progress/full-history"
+
+        t0 = time.perf_counter()
+        try:
+            response = await client.request(method, path, headers=headers)
+            status = response.status_code
+        except Exception:
+            status = 0
+        recorder.add(route, time.perf_counter() - t0, status)
+
+
+async def run(args):
+    import httpx
+
+    from services.timezone import now_brazil
+
+    users = _load_bench_users(args.users)
+    if not users:
+        raise SystemExit("Nenhum usuário de bench encontrado — rode `python -m bench.seed` antes.")
+
+    if args.url:
+        transport = None
+        base_url = args.url
+    else:
+        from main import app
+        from services.bootstrap import init_database
+
+        init_database()
+        transport = httpx.ASGITransport(app=app)
+        base_url = "http://localhost"
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    month = now_brazil().strftime("%Y-%m")
+    weights = SCENARIOS[args.scenario]
+    recorder = Recorder()
+    rng = random.Random(args.seed)
+
+    async with httpx.AsyncClient(
+        transport=transport, base_url=base_url, limits=limits, timeout=args.timeout
+    ) as client:
+        t0 = time.perf_counter()
+        deadline = t0 + args.duration
+        tasks = [
+            _virtual_user(
+                client, recorder, users[i % len(users)], weights, deadline, month,
+                random.Random(rng.random()),
+            )
+            for i in range(args.concurrency)
+        ]
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - t0
+
+    result = recorder.report(elapsed)
+    result["scenario"] = args.scenario
+    result["concurrency"] = args.concurrency
+    result["target"] = args.url or "in-process"
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Driver de carga do Discipline API")
+    parser.add_argument("--url", help="servidor alvo (padrão: app em processo)")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="mixed")
+    parser.add_argument("--duration", type=float, default=20.0, help="segundos")
+    parser.add_argument("--concurrency", type=int, default=50, help="usuários virtuais")
+    parser.add_argument("--users", type=int, default=1000, help="usuários de bench usados")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="grava o JSON também neste arquivo")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    text = json.dumps(result, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+# bench/seed.py — gera histórico sintético para benchmarks
+#
+#   python -m bench.seed --users 500 --habits 5 --days 365          (de dentro de backend/)
+#   python -m bench.seed --db sqlite:///./bench.db --users 2000 --reset
+#   python -m bench.seed --db postgresql://localhost/discipline_bench
+#
+# Usuários: load{i}@bench.local / load{i}, senha "bench-password".
+# Determinístico para o mesmo --seed. Não grava habit_events: se o bench
+# precisar do log, rodar `python manage.py backfill-events` depois.
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BENCH_PASSWORD = "bench-password"
+BENCH_EMAIL_DOMAIN = "@bench.local"
+
+DIFFICULTIES = ("easy", "medium", "medium", "hard")
+CHUNK = 20_000
+
+
+def _uuid(rng: random.Random) -> str:
+    h = "%032x" % rng.getrandbits(128)
+    return f"{h[:8]}-{h[8:12]}-4{h[13:16]}-{h[16:20]}-{h[20:]}"
+
+
+def _habit_history(rng, adherence, days):
+    """Lista de (offset_do_dia, done) como o toggle deixaria no banco."""
+    history = []
+    for offset in range(days):
+        roll = rng.random()
+        if roll < adherence:
+            history.append((offset, True))
+        elif roll < adherence + 0.05:
+            # marcou e desmarcou no mesmo dia
+            history.append((offset, False))
+    return history
+
+
+def _streaks(done_offsets, last_offset):
+    """(current_streak, best_streak) a partir dos dias concluídos."""
+    best = run = 0
+    prev = None
+    for offset in done_offsets:
+        run = run + 1 if prev is not None and offset == prev + 1 else 1
+        best = max(best, run)
+        prev = offset
+    # streak atual só vale se o último dia feito foi hoje ou ontem
+    current = run if prev is not None and last_offset - prev <= 1 else 0
+    return current, best
+
+
+def seed(users: int, habits_per_user: int, days: int, seed_value: int = 42) -> dict:
+    from sqlalchemy import insert
+
+    from database import engine
+    from models import Habit, HabitLog
+    from models_auth import AuthUser
+    from services.bootstrap import init_database
+    from services.password import hash_password
+    from services.sharding import backfill_directory
+    from services.timezone import now_brazil
+    from services.xp_engine import calculate_xp_for_habit, get_level_from_xp
+
+    init_database()
+
+    rng = random.Random(seed_value)
+    password_hash = hash_password(BENCH_PASSWORD)  # bcrypt uma vez só
+
+    today = now_brazil().date()
+    first_day = today - timedelta(days=days - 1)
+    day_strs = [(first_day + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(days)]
+    created_at = datetime.combine(first_day, datetime.min.time())
+
+    user_rows, habit_rows, log_rows = [], [], []
+    total_logs = 0
+    t0 = time.perf_counter()
+
+    with engine.begin() as conn:
+        if conn.dialect.name == "sqlite":
+            conn.exec_driver_sql("PRAGMA synchronous=OFF")
+
+        # logs vão direto no executemany do driver (sem compilar params no SQLAlchemy)
+        mark = "?" if conn.dialect.paramstyle == "qmark" else "%s"
+        insert_log_sql = (
+            f"INSERT INTO {HabitLog.__tablename__} (id, date, done, habit_id, user_id) "
+            f"VALUES ({mark}, {mark}, {mark}, {mark}, {mark})"
+        )
+
+        def flush_logs():
+            nonlocal log_rows
+            if log_rows:
+                conn.exec_driver_sql(insert_log_sql, log_rows)
+                log_rows = []
+
+        for u in range(users):
+            user_id = _uuid(rng)
+            adherence = rng.uniform(0.35, 0.95)
+            xp_total = 0
+
+            for h in range(habits_per_user):
+                habit_id = _uuid(rng)
+                difficulty = rng.choice(DIFFICULTIES)
+                importance = rng.randint(1, 5)
+                frequency = rng.randint(3, 7)
+                xp_per_done = calculate_xp_for_habit(difficulty, importance, frequency)
+
+                history = _habit_history(rng, adherence, days)
+                done_offsets = [offset for offset, done in history if done]
+                current, best = _streaks(done_offsets, days - 1)
+                habit_xp = xp_per_done * len(done_offsets)
+                xp_total += habit_xp
+
+                habit_rows.append({
+                    "id": habit_id,
+                    "user_id": user_id,
+                    "title": f"Hábito {h + 1}",
+                    "difficulty": difficulty,
+                    "importance_weight": importance,
+                    "frequency_per_week": frequency,
+                    "xp": habit_xp,
+                    "current_streak": current,
+                    "best_streak": best,
+                    "last_done_date": day_strs[done_offsets[-1]] if done_offsets else None,
+                    "created_at": created_at,
+                })
+
+                for offset, done in history:
+                    log_rows.append((_uuid(rng), day_strs[offset], done, habit_id, user_id))
+                total_logs += len(history)
+
+            level = get_level_from_xp(xp_total)
+            user_rows.append({
+                "id": user_id,
+                "email": f"load{u}{BENCH_EMAIL_DOMAIN}",
+                "username": f"load{u}",
+                "password_hash": password_hash,
+                "is_active": True,
+                "created_at": created_at,
+                "xp_total": xp_total,
+                "level": level["level"],
+                "level_progress": level["progress"],
+            })
+
+            # usuários/hábitos antes dos logs (FK no Postgres)
+            if len(log_rows) >= CHUNK:
+                conn.execute(insert(AuthUser.__table__), user_rows)
+                conn.execute(insert(Habit.__table__), habit_rows)
+                user_rows, habit_rows = [], []
+                flush_logs()
+
+        if user_rows:
+            conn.execute(insert(AuthUser.__table__), user_rows)
+            conn.execute(insert(Habit.__table__), habit_rows)
+        flush_logs()
+
+    # login por email/username passa pelo diretório
+    backfill_directory()
+
+    elapsed = time.perf_counter() - t0
+    rows = users + users * habits_per_user + total_logs
+    return {
+        "users": users,
+        "habits": users * habits_per_user,
+        "logs": total_logs,
+        "seconds": round(elapsed, 2),
+        "rows_per_sec": round(rows / elapsed) if elapsed else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera dados sintéticos de hábitos")
+    parser.add_argument("--db", help="DATABASE_URL alvo (padrão: a do .env)")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--habits", type=int, default=5, help="hábitos por usuário")
+    parser.add_argument("--days", type=int, default=180)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reset", action="store_true", help="apaga o arquivo SQLite antes")
+    args = parser.parse_args()
+
+    if args.db:
+        os.environ["DATABASE_URL"] = args.db
+
+    url = os.environ.get("DATABASE_URL", "")
+    if args.reset and url.startswith("sqlite:///"):
+        path = url[len("sqlite:///"):]
+        if os.path.exists(path):
+            os.remove(path)
+
+    print(json.dumps(seed(args.users, args.habits, args.days, args.seed)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# bench/serialization.py — custo de serialização dos payloads grandes
+#
+#   python -m bench.serialization                 (de dentro de backend/)
+#   python -m bench.serialization --days 730 --repeat 200
+#
+# Compara o caminho antigo (dict → jsonable_encoder → json.dumps) com o atual
+# (dict → model pydantic → serializer compilado do pydantic-core).
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from starlette.responses import JSONResponse  # noqa: E402
+
+from responses import ModelResponse  # noqa: E402
+from schemas import FullHistoryOut, InsightsOut  # noqa: E402
+
+
+def _full_history_payload(days: int) -> dict:
+    start = date(2024, 1, 1)
+    timeline = []
+    for i in range(days):
+        done = (i * 7) % 5
+        timeline.append({
+            "date": (start + timedelta(days=i)).strftime("%Y-%m-%d"),
+            "done": done,
+            "total": 5,
+            "percent": round(done / 5 * 100, 2),
+        })
+    return {
+        "start": timeline[0]["date"],
+        "end": timeline[-1]["date"],
+        "total_days": days,
+        "perfect_days": 0,
+        "timeline": timeline,
+    }
+
+
+def _insights_payload(days: int) -> dict:
+    start = date(2024, 1, 1)
+    week = [{"day": d, "percent": 50.0} for d in
+            ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]]
+    habit = {"id": "h1", "title": "Ler", "percent": 42.5}
+    return {
+        "consistency_score": 71.3,
+        "days_of_week": week,
+        "best_day": week[0],
+        "worst_day": week[-1],
+        "habit_difficulty": {"easiest": habit, "hardest": habit},
+        "rolling_average": [
+            {"date": (start + timedelta(days=i)).strftime("%Y-%m-%d"), "rolling_percent": 57.14}
+            for i in range(days)
+        ],
+        "streaks": {"average_current": 3.2, "average_best": 9.1},
+        "perfect_days_last_30": 4,
+        "completion_last_30_percent": 63.3,
+    }
+
+
+def _per_call_us(fn, repeat: int) -> float:
+    fn()  # aquece caches
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de serialização")
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--repeat", type=int, default=300)
+    args = parser.parse_args()
+
+    cases = {
+        "full_history": (FullHistoryOut, _full_history_payload(args.days)),
+        "insights": (InsightsOut, _insights_payload(args.days)),
+    }
+
+    report = {}
+    for name, (model, payload) in cases.items():
+        legacy = _per_call_us(lambda: JSONResponse(jsonable_encoder(payload)), args.repeat)
+        fast = _per_call_us(lambda: ModelResponse(model.model_validate(payload)), args.repeat)
+        report[name] = {
+            "bytes": len(ModelResponse(model.model_validate(payload)).body),
+            "legacy_us": round(legacy, 1),
+            "model_us": round(fast, 1),
+            "speedup": round(legacy / fast, 2),
+        }
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
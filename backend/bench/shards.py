@@ -0,0 +1,135 @@
+# bench/shards.py — roteamento por shard ponta a ponta com SQLite
+#
+#   python -m bench.shards                   (de dentro de backend/)
+#   python -m bench.shards --shards 4 --users 60
+#
+# Sobe o app com N arquivos SQLite em DATABASE_SHARDS, cadastra usuários
+# pela API e confere:
+#   - distribuição do anel (cada shard recebe usuários)
+#   - cada usuário só existe no shard do diretório
+#   - login, toggle, dashboard e refresh funcionam em todos
+#   - move-user leva as linhas junto e a API segue funcionando
+#   - com um shard a mais no anel, o plano move ~1/(N+1) dos usuários
+# Sai com código 1 se alguma verificação falhar.
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _configure(shards: int) -> str:
+    tmp = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = f"sqlite:///{tmp}/home.db"
+    os.environ["DATABASE_SHARDS"] = ",".join(
+        ["main=sqlite:///" + os.path.join(tmp, "home.db")]
+        + [f"s{i}=sqlite:///" + os.path.join(tmp, f"s{i}.db") for i in range(1, shards)]
+    )
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+    os.environ.setdefault("STREAK_RESET_SCHEDULE", "0")
+    sys.path.insert(0, BACKEND_DIR)
+    return tmp
+
+
+def run(shards: int, users: int) -> dict:
+    _configure(shards)
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy import func, select
+
+    import main
+    from database import SHARD_ENGINES
+    from models import Habit
+    from models_auth import AuthUser
+    from services import sharding
+    from services.rebalance import move_user, plan
+
+    checks = {}
+    with TestClient(main.app, base_url="http://localhost") as client:
+        accounts = {}
+        for i in range(users):
+            r = client.post("/auth/register", json={"email": f"u{i}@s.com", "username": f"u{i}", "password": "pw"})
+            r.raise_for_status()
+            accounts[r.json()["user_id"]] = f"u{i}"
+
+        duplicate = client.post("/auth/register", json={"email": "u0@s.com", "username": "outro", "password": "pw"})
+        checks["duplicate_email_rejected"] = duplicate.status_code == 400
+
+        def session_for(username):
+            tokens = client.post("/auth/login", json={"identifier": username, "password": "pw"}).json()
+            return tokens, {"Authorization": f"Bearer {tokens['access_token']}"}
+
+        for user_id, username in accounts.items():
+            _, headers = session_for(username)
+            habit_id = client.post("/habits/", json={"title": "Ler"}, headers=headers).json()["id"]
+            client.post(f"/habits/{habit_id}/toggle", headers=headers).raise_for_status()
+
+        # onde cada usuário ficou
+        placement = {}
+        for name, bind in SHARD_ENGINES.items():
+            with bind.connect() as conn:
+                for user_id in conn.execute(select(AuthUser.__table__.c.id)).scalars():
+                    placement.setdefault(user_id, []).append(name)
+        distribution = {name: 0 for name in SHARD_ENGINES}
+        for names in placement.values():
+            for name in names:
+                distribution[name] += 1
+
+        checks["every_shard_used"] = all(distribution.values())
+        checks["one_copy_per_user"] = all(len(names) == 1 for names in placement.values())
+        checks["directory_matches"] = all(
+            sharding.shard_for_user(user_id, fresh=True) == placement[user_id][0] for user_id in accounts
+        )
+
+        # move um usuário e usa a API de novo (cache do shard é esquecido)
+        user_id, username = next(iter(accounts.items()))
+        source = placement[user_id][0]
+        target = next(name for name in SHARD_ENGINES if name != source)
+        tokens, headers = session_for(username)
+        moved = move_user(user_id, target)
+
+        dashboard = client.get("/dashboard/", headers=headers)
+        refreshed = client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+        with SHARD_ENGINES[source].connect() as conn:
+            left_behind = conn.execute(
+                select(func.count()).select_from(Habit.__table__).where(Habit.__table__.c.user_id == user_id)
+            ).scalar()
+        checks["move_user_keeps_api"] = dashboard.status_code == 200 and refreshed.status_code == 200
+        checks["move_user_cleans_source"] = left_behind == 0
+        checks["move_user_keeps_habit"] = len(dashboard.json()["habits"]) == 1
+
+        # devolve para o lugar do anel: o plano atual fica vazio
+        move_user(user_id, sharding.ring.node_for(user_id))
+        checks["plan_empty_when_balanced"] = plan() == []
+
+        # anel com um shard a mais: fração que sairia do lugar
+        bigger = sharding.HashRing(list(SHARD_ENGINES) + ["novo"])
+        moving = plan(ring=bigger)
+        checks["new_shard_moves_only_to_it"] = all(target == "novo" for _, _, target in moving)
+
+    return {
+        "shards": list(SHARD_ENGINES),
+        "users": users,
+        "distribution": distribution,
+        "moved_example": {k: v for k, v in moved.items() if k != "rows"},
+        "add_shard_would_move": round(len(moving) / users, 3),
+        "checks": checks,
+        "ok": all(checks.values()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verificação do roteamento por shard (SQLite)")
+    parser.add_argument("--shards", type=int, default=3)
+    parser.add_argument("--users", type=int, default=40)
+    args = parser.parse_args()
+
+    report = run(args.shards, args.users)
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if report["ok"] else 1)
+
+
+if __name__ == "__main__":
+    main()
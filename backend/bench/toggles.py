@@ -0,0 +1,127 @@
+# bench/toggles.py — throughput do toggle: commit por request vs group commit
+#
+#   python -m bench.seed --db sqlite:///./bench.db --users 500 --reset
+#   DATABASE_URL=sqlite:///./bench.db python -m bench.toggles --threads 32 --duration 10
+#
+# Chama o caminho do toggle direto (sem HTTP) nos dois modos, com as mesmas
+# threads e os mesmos hábitos, e imprime JSON com toggles/s e p50/p99.
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.load import _load_bench_users, _percentile  # noqa: E402
+
+
+def _targets(users):
+    """(user, habit) já carregados: o bench mede só a escrita."""
+    from database import SessionLocal
+    from models import Habit
+    from models_auth import AuthUser
+
+    db = SessionLocal()
+    try:
+        user_ids = [uid for uid, habit_ids in users if habit_ids]
+        by_id = {u.id: u for u in db.query(AuthUser).filter(AuthUser.id.in_(user_ids))}
+        habits = db.query(Habit).filter(Habit.user_id.in_(user_ids)).all()
+        return [(by_id[h.user_id], h) for h in habits]
+    finally:
+        db.close()
+
+
+def _run_mode(mode, targets, threads, duration, today, seed):
+    from database import SessionLocal
+    from services.toggle_engine import apply_toggle
+    from services.write_coalescer import WriteCoalescer
+
+    coalescer = WriteCoalescer() if mode == "coalesced" else None
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker(worker_seed):
+        nonlocal errors
+        rng = random.Random(worker_seed)
+        local = []
+        local_errors = 0
+        while time.perf_counter() < deadline:
+            user, habit = rng.choice(targets)
+            t0 = time.perf_counter()
+            try:
+                if coalescer is not None:
+                    coalescer.run(apply_toggle, user, habit, today)
+                else:
+                    db = SessionLocal()
+                    try:
+                        apply_toggle(db, user, habit, today)
+                        db.commit()
+                    finally:
+                        db.close()
+            except Exception:
+                local_errors += 1
+                continue
+            local.append(time.perf_counter() - t0)
+        with lock:
+            latencies.extend(local)
+            errors += local_errors
+
+    rng = random.Random(seed)
+    pool = [threading.Thread(target=worker, args=(rng.random(),)) for _ in range(threads)]
+    t0 = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    if coalescer is not None:
+        coalescer.stop()
+
+    latencies.sort()
+    return {
+        "toggles": len(latencies),
+        "toggles_per_sec": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(_percentile(latencies, 50) * 1000, 2) if latencies else None,
+        "p99_ms": round(_percentile(latencies, 99) * 1000, 2) if latencies else None,
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara commit por toggle com group commit")
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0, help="segundos por modo")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--mode", choices=("both", "direct", "coalesced"), default="both")
+    args = parser.parse_args()
+
+    from services.bootstrap import init_database
+    from services.timezone import today_brazil_str
+
+    init_database()
+    users = _load_bench_users(args.users)
+    targets = _targets(users)
+    if not targets:
+        raise SystemExit("Nenhum usuário de bench encontrado — rode `python -m bench.seed` antes.")
+
+    today = today_brazil_str()
+    modes = ("direct", "coalesced") if args.mode == "both" else (args.mode,)
+    result = {"threads": args.threads, "duration_s": args.duration}
+    for mode in modes:
+        result[mode] = _run_mode(mode, targets, args.threads, args.duration, today, args.seed)
+
+    if len(modes) == 2 and result["direct"]["toggles_per_sec"]:
+        result["speedup"] = round(
+            result["coalesced"]["toggles_per_sec"] / result["direct"]["toggles_per_sec"], 2
+        )
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,8 @@
 import os
+import re
 
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
 from dotenv import load_dotenv
 
 # Carrega .env local (no Render, env vars já vêm do painel)
@@ -9,22 +10,118 @@ load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./discipline.db")
 
-# Render às vezes fornece postgres:// (SQLAlchemy quer postgresql://)
-if DATABASE_URL.startswith("postgres://"):
-    DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
 
-# SQLite precisa de connect_args específico
-connect_args = {}
-if DATABASE_URL.startswith("sqlite"):
-    connect_args = {"check_same_thread": False}
+def _normalize_url(url: str) -> str:
+    # Render às vezes fornece postgres:// (SQLAlchemy quer postgresql://)
+    if url.startswith("postgres://"):
+        return url.replace("postgres://", "postgresql://", 1)
+    return url
 
-engine = create_engine(
-    DATABASE_URL,
-    connect_args=connect_args,
-    pool_pre_ping=True,  # ajuda em conexões que caem (cloud)
-)
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def _make_engine(url: str):
+    # SQLite precisa de connect_args específico
+    connect_args = {}
+    if url.startswith("sqlite"):
+        connect_args = {"check_same_thread": False}
+
+    return create_engine(
+        url,
+        connect_args=connect_args,
+        pool_pre_ping=True,  # ajuda em conexões que caem (cloud)
+    )
+
+
+DATABASE_URL = _normalize_url(DATABASE_URL)
+
+# banco "home": diretório global de usuários (login por email/username)
+# e, sem DATABASE_SHARDS, também o único shard
+engine = _make_engine(DATABASE_URL)
+
+# ============================================================
+# SHARDS (opcional) — ver services/sharding.py
+#   DATABASE_SHARDS="main=postgresql://...,s1=postgresql://..."
+# Sem a variável, um shard só ("main") = o próprio DATABASE_URL.
+# O banco que já tem os dados precisa continuar com o nome "main": o
+# diretório guarda o nome do shard de cada usuário.
+# ============================================================
+DEFAULT_SHARD = "main"
+
+# "nome=" só é prefixo quando vem logo antes de um esquema (xxx://): um URL
+# sem nome pode ter "=" na query string (?sslmode=require)
+_SHARD_NAME_RE = re.compile(r"^(\w+)=(?=[\w+.-]+://)")
+
+
+def _parse_shards(spec: str) -> dict:
+    shards = {}
+    for i, item in enumerate(p.strip() for p in spec.split(",")):
+        if not item:
+            continue
+        named = _SHARD_NAME_RE.match(item)
+        if named:
+            name, url = named.group(1), item[named.end():]
+        else:
+            name, url = (DEFAULT_SHARD if i == 0 else f"s{i}"), item
+        url = _normalize_url(url.strip())
+        shards[name] = engine if url == DATABASE_URL else _make_engine(url)
+    shards = shards or {DEFAULT_SHARD: engine}
+
+    # usuário sem linha no diretório (anterior aos shards) mora no DEFAULT_SHARD
+    if DEFAULT_SHARD not in shards:
+        raise RuntimeError(
+            f"DATABASE_SHARDS precisa de um shard {DEFAULT_SHARD!r} "
+            f"(o banco que já tem os dados); recebidos: {sorted(shards)}"
+        )
+    return shards
+
+
+SHARD_ENGINES = _parse_shards(os.getenv("DATABASE_SHARDS", ""))
+
+
+def all_engines() -> list:
+    """Home + shards, sem repetir (eventos/métricas/jobs por banco)."""
+    engines = [engine]
+    for shard_engine in SHARD_ENGINES.values():
+        if shard_engine not in engines:
+            engines.append(shard_engine)
+    return engines
+
+
+def dialect_insert(dialect_name: str):
+    """insert() com on_conflict_do_update (upsert) do dialeto em uso."""
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise RuntimeError(f"Upsert não suportado no dialeto {dialect_name}")
+    return insert
+
+
+class RoutingSession(Session):
+    """
+    Session que escolhe o banco por request: o shard em info["shard"]
+    (definido pelo get_current_user) ou, sem shard, o home.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        shard = self.info.get("shard")
+        if shard is None:
+            return engine
+        try:
+            return SHARD_ENGINES[shard]
+        except KeyError:
+            raise RuntimeError(f"Shard desconhecido: {shard!r} (DATABASE_SHARDS)")
+
+    def use_shard(self, shard: str):
+        if self.info.get("shard") == shard:
+            return
+        # trocar no meio da transação dividiria a escrita entre dois bancos
+        if self.in_transaction():
+            raise RuntimeError("use_shard() depois da primeira query da sessão")
+        self.info["shard"] = shard
+
+
+SessionLocal = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False)
 Base = declarative_base()
 
 def get_db():
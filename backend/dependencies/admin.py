@@ -0,0 +1,18 @@
+import hmac
+import os
+
+from fastapi import Header, HTTPException
+
+# sem ADMIN_TOKEN configurado, nenhuma rota admin responde
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "").strip()
+
+
+def is_admin_token(value) -> bool:
+    if not ADMIN_TOKEN or not value:
+        return False
+    return hmac.compare_digest(value.encode(), ADMIN_TOKEN.encode())
+
+
+def require_admin(x_admin_token: str = Header(default=None)):
+    if not is_admin_token(x_admin_token):
+        raise HTTPException(403, "Acesso restrito")
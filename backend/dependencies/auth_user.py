@@ -5,6 +5,7 @@ from sqlalchemy.orm import Session
 from database import get_db
 from services.jwt_token import decode_token
 from models_auth import AuthUser
+from services import sharding
 
 security = HTTPBearer()
 
@@ -24,7 +25,20 @@ def get_current_user(
     if not user_id:
         raise HTTPException(401, "Token inválido (sem sub)")
 
+    # daqui em diante a sessão do request (get_db é a mesma) vai para o shard do usuário
+    shard = sharding.shard_for_user(user_id)
+    db.use_shard(shard)
     user = db.query(AuthUser).filter(AuthUser.id == user_id).first()
+
+    if not user and sharding.SHARDED:
+        # cache velho: o usuário pode ter sido movido (rebalance)
+        fresh = sharding.shard_for_user(user_id, fresh=True)
+        if fresh != shard:
+            db.rollback()
+            db.info.pop("shard", None)
+            db.use_shard(fresh)
+            user = db.query(AuthUser).filter(AuthUser.id == user_id).first()
+
     if not user:
         raise HTTPException(401, "Usuário não encontrado")
 
@@ -0,0 +1,22 @@
+from fastapi import HTTPException
+
+from services.load_shedding import SHED_RETRY_AFTER, should_shed, shed_requests
+
+
+def priority(level: str):
+    """
+    Dependência de router: APIRouter(dependencies=[Depends(priority("low"))]).
+    Async de propósito — decide no event loop, antes de a rota sync
+    entrar na fila do threadpool ou pedir conexão ao pool.
+    """
+
+    async def check_load():
+        if should_shed(level):
+            shed_requests.inc(level)
+            raise HTTPException(
+                503,
+                "Servidor sobrecarregado. Tente novamente em instantes.",
+                headers={"Retry-After": str(SHED_RETRY_AFTER)},
+            )
+
+    return check_load
@@ -1,19 +1,35 @@
+from contextlib import asynccontextmanager
+import os
+
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.trustedhost import TrustedHostMiddleware
-import os
 
 # -----------------------------------------
-# A.3 — carregar .env automaticamente
+# A.3 — .env é carregado uma única vez, em database.py
 # -----------------------------------------
-from dotenv import load_dotenv
-load_dotenv()  # Carrega variáveis do arquivo .env
-
-from database import Base, engine
-from routers import habits, progress, auth
+import database
+
+from middleware.compression import CompressionMiddleware
+from middleware.load_shedding import InFlightMiddleware
+from middleware.metrics import MetricsMiddleware
+from middleware.profiling import ProfilingMiddleware
+from middleware.query_stats import QueryStatsMiddleware
+from responses import ORJSONResponse
+from routers import habits, progress, auth, health, metrics, admin, sync
 from routers.dashboard import router as dashboard_router
-from database import SessionLocal
-from services.achievement_engine import create_default_achievements
+from schemas import MessageOut
+from services.bootstrap import init_database, mark_ready
+from services.compute_pool import compute_pool
+from services.load_shedding import LOAD_SHEDDING_ENABLED, install_pool_probe
+from services.metrics import instrument_engine
+from services.profiling import PROFILING_ENABLED, instrument_router
+from services.query_stats import install_query_hooks
+from services.revocation import sync as revocation_sync
+from services.streak_reset import STREAK_RESET_SCHEDULE, scheduler as streak_reset_scheduler
+from services.tenant_guard import install_tenant_guard
+from services.write_coalescer import coalescer
 
 # -----------------------------------------
 # A.4 — ENV (dev/prod) para ligar/desligar docs
@@ -22,9 +38,49 @@ ENV = os.getenv("ENV", "dev").strip().lower()
 
 disable_docs = os.getenv("DISABLE_DOCS", "0").strip() == "1"
 
+# -----------------------------------------
+# A.5 — init do banco fora do import
+# DB_AUTO_INIT=0 → schema/seeds ficam por conta de `python manage.py init-db`
+# (recomendado em scale-to-zero: o worker sobe sem tocar no banco)
+# -----------------------------------------
+DB_AUTO_INIT = os.getenv("DB_AUTO_INIT", "1").strip() == "1"
+
+# -----------------------------------------
+# A.6 — Guard de tenant: SELECT em habits/habit_logs sem filtro de
+# usuário/hábito levanta erro (fora de prod; ver services/tenant_guard.py)
+# -----------------------------------------
+TENANT_GUARD = os.getenv("TENANT_GUARD", "0" if ENV == "prod" else "1").strip() == "1"
+
+if TENANT_GUARD:
+    install_tenant_guard(database.SessionLocal)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if DB_AUTO_INIT:
+        await run_in_threadpool(init_database)
+    else:
+        mark_ready()
+    # jti revogados (logout) → Bloom filter deste worker, a cada poucos
+    # segundos; nada roda no boot (carga na primeira verificação)
+    revocation_sync.start()
+    # virada do dia: zera streaks quebrados depois de cada meia-noite
+    # (o catch-up no start é opt-in: STREAK_RESET_ON_START=1)
+    if STREAK_RESET_SCHEDULE:
+        streak_reset_scheduler.start()
+    yield
+    revocation_sync.stop()
+    streak_reset_scheduler.stop()
+    # toggles já enfileirados ainda são commitados
+    await run_in_threadpool(coalescer.stop)
+    await run_in_threadpool(compute_pool.shutdown)
+
+
 app = FastAPI(
     title="Discipline API",
     version="1.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
     docs_url=None if disable_docs else "/docs",
     redoc_url=None if disable_docs else "/redoc",
     openapi_url=None if disable_docs else "/openapi.json",
@@ -66,26 +122,80 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# -----------------------------------------
+# 2.1) Compressão (gzip; brotli/zstd se instalados)
+# COMPRESSION_MIN_SIZE em bytes; rotas podem sair com @skip_compression
+# (ex.: /dashboard/stream)
+# -----------------------------------------
+app.add_middleware(CompressionMiddleware)
+
+# -----------------------------------------
+# 2.2) Queries por request (Server-Timing / X-DB-Queries) — só fora de prod
+# -----------------------------------------
+SQL_DEBUG_HEADERS = os.getenv("SQL_DEBUG_HEADERS", "0" if ENV == "prod" else "1").strip() == "1"
+
+if SQL_DEBUG_HEADERS:
+    for bind in database.all_engines():
+        install_query_hooks(bind)
+    app.add_middleware(QueryStatsMiddleware)
+
+# -----------------------------------------
+# 2.3) Profiling opt-in (PROFILING_ENABLED=1 + ADMIN_TOKEN)
+# desligado: nenhuma rota é envolvida e nada é instalado
+# -----------------------------------------
+if PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+
+# -----------------------------------------
+# 2.4) Load shedding: conta in-flight e espera do pool; o descarte
+# (503 + Retry-After) é pela prioridade declarada em cada router
+# -----------------------------------------
+if LOAD_SHEDDING_ENABLED:
+    for bind in database.all_engines():
+        install_pool_probe(bind)
+    app.add_middleware(InFlightMiddleware)
+
+# -----------------------------------------
+# 2.5) Métricas (/metrics, formato Prometheus)
+# por último = mais externo: mede o request inteiro
+# Em prod: desligado por padrão e, ligado, exige METRICS_TOKEN (rotas,
+# latências e estado do pool não ficam públicos)
+# -----------------------------------------
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "0" if ENV == "prod" else "1").strip() == "1"
+
+if METRICS_ENABLED and ENV == "prod" and not metrics.METRICS_TOKEN:
+    raise RuntimeError("METRICS_ENABLED=1 em prod exige METRICS_TOKEN")
+
+if METRICS_ENABLED:
+    # gauges do pool: só do home (checkout wait conta todos os bancos)
+    for bind in database.all_engines():
+        instrument_engine(bind, gauges=bind is database.engine)
+    app.add_middleware(MetricsMiddleware)
+
 # -----------------------------------------
 # 3) Registrar routers
 # -----------------------------------------
+if PROFILING_ENABLED:
+    for r in (habits.router, habits.toggle_router, progress.router, dashboard_router, auth.router, sync.router):
+        instrument_router(r)
+
 app.include_router(habits.router)
+app.include_router(habits.toggle_router)
 app.include_router(progress.router)
 app.include_router(dashboard_router)
 app.include_router(auth.router)
+app.include_router(sync.router)
+app.include_router(health.router)
 
-# -----------------------------------------
-# 4) Criar tabelas
-# -----------------------------------------
-Base.metadata.create_all(bind=engine)
+if METRICS_ENABLED:
+    app.include_router(metrics.router)
 
-db = SessionLocal()
-create_default_achievements(db)
-db.close()
+if PROFILING_ENABLED:
+    app.include_router(admin.router)
 
 # -----------------------------------------
-# 5) Rota de teste
+# 4) Rota de teste
 # -----------------------------------------
-@app.get("/")
+@app.get("/", response_model=MessageOut)
 def root():
     return {"message": "API funcionando"}
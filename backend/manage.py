@@ -0,0 +1,160 @@
+# manage.py — comandos operacionais (rodar de dentro de backend/)
+#
+#   python manage.py init-db
+#   python manage.py backfill-events
+#   python manage.py rebuild-projections [--only habits users]
+#   python manage.py backfill-log-users [--batch 10000]
+#   python manage.py reset-streaks [--date YYYY-MM-DD] [--batch 5000]
+#   python manage.py backfill-directory [--batch 10000]
+#   python manage.py rebalance-shards [--dry-run] [--batch 100]
+#   python manage.py move-user <user_id> <shard>
+#   python manage.py clear-aggregates [--user ID] [--month YYYY-MM]
+#
+# Com DATABASE_SHARDS, os comandos de dados rodam em cada shard e
+# devolvem {shard: resultado}.
+#
+import argparse
+import json
+
+
+def cmd_init_db(args):
+    from services.bootstrap import init_database
+
+    init_database()
+    print("Banco inicializado")
+
+
+def cmd_backfill_events(args):
+    from database import SHARD_ENGINES
+    from services.bootstrap import init_database
+    from services.projections import backfill_events
+
+    init_database()
+    print(json.dumps({
+        name: backfill_events(bind, batch_size=args.batch) for name, bind in SHARD_ENGINES.items()
+    }))
+
+
+def cmd_rebuild_projections(args):
+    from database import SHARD_ENGINES
+    from services.bootstrap import init_database
+    from services.projections import rebuild
+
+    init_database()
+    print(json.dumps({
+        name: rebuild(bind, only=tuple(args.only), batch_size=args.batch) for name, bind in SHARD_ENGINES.items()
+    }))
+
+
+def cmd_backfill_log_users(args):
+    from database import SHARD_ENGINES
+    from services.bootstrap import backfill_log_user_ids, init_database
+
+    init_database(backfill=False)
+    print(json.dumps({
+        name: {"filled": backfill_log_user_ids(batch_size=args.batch, log=print, bind=bind)}
+        for name, bind in SHARD_ENGINES.items()
+    }))
+
+
+def cmd_reset_streaks(args):
+    from database import SHARD_ENGINES
+    from services.bootstrap import init_database
+    from services.streak_reset import reset_broken_streaks
+
+    init_database()
+    print(json.dumps({
+        name: reset_broken_streaks(bind, today=args.date, batch_size=args.batch, log=print)
+        for name, bind in SHARD_ENGINES.items()
+    }))
+
+
+def cmd_backfill_directory(args):
+    from services.bootstrap import init_database
+    from services.sharding import backfill_directory
+
+    init_database(backfill=False)
+    print(json.dumps({"filled": backfill_directory(batch_size=args.batch, log=print)}))
+
+
+def cmd_rebalance_shards(args):
+    from services.bootstrap import init_database
+    from services.rebalance import rebalance
+
+    init_database()
+    print(json.dumps(rebalance(batch_size=args.batch, dry_run=args.dry_run, log=print)))
+
+
+def cmd_move_user(args):
+    from database import SHARD_ENGINES
+    from services.bootstrap import init_database
+    from services.rebalance import move_user
+
+    if args.shard not in SHARD_ENGINES:
+        raise SystemExit(f"Shard desconhecido: {args.shard} (configurados: {', '.join(SHARD_ENGINES)})")
+    init_database()
+    print(json.dumps(move_user(args.user_id, args.shard)))
+
+
+def cmd_clear_aggregates(args):
+    from database import SHARD_ENGINES
+    from services import aggregate_cache
+    from services.bootstrap import init_database
+
+    init_database()
+    print(json.dumps({
+        name: {"deleted": aggregate_cache.clear(bind, user_id=args.user, month=args.month)}
+        for name, bind in SHARD_ENGINES.items()
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Discipline API — comandos operacionais")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("init-db", help="cria tabelas e conquistas padrão (idempotente)")
+    p.set_defaults(func=cmd_init_db)
+
+    p = sub.add_parser("backfill-events", help="gera o habit_events a partir do estado atual (log vazio)")
+    p.add_argument("--batch", type=int, default=50_000)
+    p.set_defaults(func=cmd_backfill_events)
+
+    p = sub.add_parser("rebuild-projections", help="refaz projeções a partir do habit_events")
+    p.add_argument("--only", nargs="+", choices=("habits", "users"), default=["habits", "users"])
+    p.add_argument("--batch", type=int, default=50_000)
+    p.set_defaults(func=cmd_rebuild_projections)
+
+    p = sub.add_parser("backfill-log-users", help="preenche habit_logs.user_id em lotes (retomável)")
+    p.add_argument("--batch", type=int, default=10_000)
+    p.set_defaults(func=cmd_backfill_log_users)
+
+    p = sub.add_parser("reset-streaks", help="zera streaks quebrados (virada do dia; idempotente)")
+    p.add_argument("--date", help="dia de referência (padrão: hoje em Brasília)")
+    p.add_argument("--batch", type=int, default=5000)
+    p.set_defaults(func=cmd_reset_streaks)
+
+    p = sub.add_parser("backfill-directory", help="cria o diretório de usuários (login/shards) em lotes")
+    p.add_argument("--batch", type=int, default=10_000)
+    p.set_defaults(func=cmd_backfill_directory)
+
+    p = sub.add_parser("rebalance-shards", help="move para o shard do anel quem está fora dele")
+    p.add_argument("--batch", type=int, default=100, help="usuários por lote (log de progresso)")
+    p.add_argument("--dry-run", action="store_true", help="só mostra o plano")
+    p.set_defaults(func=cmd_rebalance_shards)
+
+    p = sub.add_parser("move-user", help="move um usuário para outro shard")
+    p.add_argument("user_id")
+    p.add_argument("shard")
+    p.set_defaults(func=cmd_move_user)
+
+    p = sub.add_parser("clear-aggregates", help="apaga agregados de meses fechados (depois de import em massa)")
+    p.add_argument("--user", help="só deste usuário")
+    p.add_argument("--month", help="só deste mês (YYYY-MM)")
+    p.set_defaults(func=cmd_clear_aggregates)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+# middleware/compression.py
+import gzip
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from starlette.datastructures import Headers, MutableHeaders
+
+# ============================================================
+# CONFIG
+# ============================================================
+MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+CACHE_BYTES = int(os.getenv("COMPRESSION_CACHE_MB", "16")) * 1024 * 1024
+
+GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "5"))
+ZSTD_LEVEL = int(os.getenv("COMPRESSION_ZSTD_LEVEL", "3"))
+
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+EXCLUDED_TYPES = ("text/event-stream",)
+
+
+# ============================================================
+# CODECS (brotli/zstd só se instalados)
+# ============================================================
+def _load_codecs():
+    codecs = {}
+
+    try:
+        from compression import zstd  # Python 3.14+
+        codecs["zstd"] = lambda body: zstd.compress(body, level=ZSTD_LEVEL)
+    except ImportError:
+        try:
+            import zstandard
+            _cctx = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+            codecs["zstd"] = _cctx.compress
+        except ImportError:
+            pass
+
+    try:
+        import brotli
+        codecs["br"] = lambda body: brotli.compress(body, quality=BROTLI_QUALITY)
+    except ImportError:
+        pass
+
+    # mtime=0 → saída determinística (mesmo payload, mesmos bytes)
+    codecs["gzip"] = lambda body: gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    return codecs
+
+
+CODECS = _load_codecs()
+
+# ordem de preferência quando o cliente aceita mais de um
+PREFERENCE = [name for name in ("zstd", "br", "gzip") if name in CODECS]
+
+
+def choose_encoding(accept_encoding: str):
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        token, _, params = part.partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if q > 0:
+            accepted.add(token.strip())
+
+    for name in PREFERENCE:
+        if name in accepted:
+            return name
+    return None
+
+
+# ============================================================
+# OPT-OUT POR ROTA
+# ============================================================
+def skip_compression(endpoint):
+    """Decorator: a rota nunca tem o corpo comprimido."""
+    endpoint._skip_compression = True
+    return endpoint
+
+
+# ============================================================
+# CACHE DE CORPOS COMPRIMIDOS
+# Polling devolve o mesmo payload várias vezes: a chave é o hash do corpo,
+# então o mesmo JSON não é recomprimido a cada request.
+# ============================================================
+class CompressedBodyCache:
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value: bytes):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._items[key] = value
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.size -= len(evicted)
+
+
+body_cache = CompressedBodyCache(CACHE_BYTES)
+
+
+def compress_body(body: bytes, encoding: str) -> bytes:
+    key = (encoding, hashlib.blake2b(body, digest_size=16).digest())
+    cached = body_cache.get(key)
+    if cached is not None:
+        return cached
+
+    compressed = CODECS[encoding](body)
+    body_cache.put(key, compressed)
+    return compressed
+
+
+# ============================================================
+# MIDDLEWARE (ASGI puro)
+# ============================================================
+class CompressionMiddleware:
+    """
+    Comprime respostas JSON/texto acima de `minimum_size`.
+    - respostas em streaming (more_body) passam direto
+    - rotas marcadas com @skip_compression passam direto
+    - toda resposta que PODERIA sair comprimida leva Vary: Accept-Encoding,
+      inclusive a pequena e a de cliente sem Accept-Encoding — senão um
+      cache na frente guarda a versão crua e serve para todo mundo
+    """
+
+    def __init__(self, app, minimum_size: int = MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        start_message = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                if not self._compressible(scope, message["status"], headers):
+                    passthrough = True
+                    await send(message)
+                    return
+                headers.add_vary_header("Accept-Encoding")
+                if encoding is None:
+                    passthrough = True
+                    await send(message)
+                    return
+                start_message = message
+                return
+
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            initial, start_message = start_message, None
+            body = message.get("body", b"")
+
+            if message.get("more_body", False) or len(body) < self.minimum_size:
+                passthrough = True
+                await send(initial)
+                await send(message)
+                return
+
+            compressed = compress_body(body, encoding)
+
+            headers = MutableHeaders(scope=initial)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+
+            await send(initial)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
+
+    @staticmethod
+    def _compressible(scope, status: int, headers) -> bool:
+        if status < 200 or status in (204, 304):
+            return False
+        if "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "")
+        if content_type.startswith(EXCLUDED_TYPES):
+            return False
+        if not content_type.startswith(COMPRESSIBLE_TYPES):
+            return False
+        endpoint = scope.get("endpoint")
+        return not getattr(endpoint, "_skip_compression", False)
@@ -0,0 +1,34 @@
+# middleware/load_shedding.py
+from services.load_shedding import state
+
+
+class InFlightMiddleware:
+    """
+    Conta requests em andamento até a resposta começar. Streams longos
+    deixam de contar no http.response.start: medem trabalho, não conexões.
+    O descarte em si fica na dependência de prioridade de cada router.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        state.request_started()
+        counted = True
+
+        async def send_wrapper(message):
+            nonlocal counted
+            if counted and message["type"] == "http.response.start":
+                counted = False
+                state.request_finished()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if counted:
+                state.request_finished()
@@ -0,0 +1,38 @@
+# middleware/metrics.py
+import time
+
+from services.metrics import http_latency, http_requests
+
+
+class MetricsMiddleware:
+    """
+    Latência e status por rota. O label é o template da rota
+    (/habits/{habit_id}/toggle), nunca o path cru: cardinalidade fixa.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        t0 = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - t0
+            route = scope.get("route")
+            route_path = getattr(route, "path", "unmatched")
+            method = scope["method"]
+            http_latency.observe(elapsed, method, route_path)
+            http_requests.inc(method, route_path, status)
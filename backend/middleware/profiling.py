@@ -0,0 +1,40 @@
+# middleware/profiling.py
+import random
+
+from starlette.datastructures import Headers
+
+from dependencies.admin import is_admin_token
+from services.profiling import PROFILE_SAMPLE_RATE, profile_requested
+
+
+class ProfilingMiddleware:
+    """
+    Marca o request para profiling quando:
+    - vem com "X-Profile: 1" + "X-Admin-Token" válido, ou
+    - cai na amostragem PROFILE_SAMPLE_RATE (0..1)
+    Só é instalado com PROFILING_ENABLED=1.
+    """
+
+    def __init__(self, app, sample_rate: float = PROFILE_SAMPLE_RATE):
+        self.app = app
+        self.sample_rate = sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        requested = self.sample_rate > 0 and random.random() < self.sample_rate
+        if not requested:
+            headers = Headers(scope=scope)
+            requested = headers.get("x-profile") == "1" and is_admin_token(headers.get("x-admin-token"))
+
+        if not requested:
+            await self.app(scope, receive, send)
+            return
+
+        token = profile_requested.set(True)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            profile_requested.reset(token)
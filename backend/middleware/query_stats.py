@@ -0,0 +1,49 @@
+# middleware/query_stats.py
+import logging
+
+from starlette.datastructures import MutableHeaders
+
+from services.query_stats import track_queries
+
+logger = logging.getLogger("discipline.sql")
+
+
+class QueryStatsMiddleware:
+    """
+    Não-prod: anexa Server-Timing / X-DB-Queries em cada resposta e
+    avisa (log + X-DB-N-Plus-One) quando o mesmo SQL se repete com
+    parâmetros diferentes.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with track_queries() as stats:
+
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    headers = MutableHeaders(scope=message)
+                    duration_ms = stats.duration * 1000
+                    headers.append(
+                        "Server-Timing",
+                        f'db;dur={duration_ms:.2f};desc="{stats.count} queries"',
+                    )
+                    headers["X-DB-Queries"] = str(stats.count)
+
+                    suspects = stats.n_plus_one()
+                    if suspects:
+                        headers["X-DB-N-Plus-One"] = str(len(suspects))
+                        route = getattr(scope.get("route"), "path", scope["path"])
+                        for sql, executions in suspects:
+                            logger.warning(
+                                "Possível N+1 em %s %s: %dx %s",
+                                scope["method"], route, executions, " ".join(sql.split())[:200],
+                            )
+                await send(message)
+
+            await self.app(scope, receive, send_wrapper)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, DateTime, Boolean, ForeignKey
+from sqlalchemy import Column, String, Integer, DateTime, Boolean, ForeignKey, Index, Text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from database import Base
@@ -37,10 +37,17 @@ class Habit(Base):
     last_done_date = Column(String, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    # AuthUser.change_seq da última escrita nesta linha (GET /sync)
+    change_seq = Column(Integer, nullable=False, default=0, server_default="0")
+
     # RELACIONAMENTOS
     user = relationship("AuthUser", back_populates="habits")
     logs = relationship("HabitLog", back_populates="habit", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index("ix_habits_user_seq", "user_id", "change_seq"),
+    )
+
 
 # ============================================================
 # HABIT LOG
@@ -55,6 +62,62 @@ class HabitLog(Base):
     habit_id = Column(String, ForeignKey("habits.id"), nullable=False)
     habit = relationship("Habit", back_populates="logs")
 
+    # desnormalizado de habits.user_id: agregados do usuário viram um
+    # range scan em (user_id, date), sem buscar os hábitos antes
+    user_id = Column(String, ForeignKey("auth_users.id"))
+
+    change_seq = Column(Integer, nullable=False, default=0, server_default="0")
+
+    # um log por hábito/dia: alvo do upsert do toggle
+    __table_args__ = (
+        Index("ux_habit_logs_habit_date", "habit_id", "date", unique=True),
+        Index("ix_habit_logs_habit_seq", "habit_id", "change_seq"),
+        Index("ix_habit_logs_user_date", "user_id", "date"),
+    )
+
+
+# ============================================================
+# HABIT EVENT (append-only)
+# Fonte da verdade das mutações; xp/streak de Habit e xp/level de
+# AuthUser são projeções reconstruíveis a partir daqui.
+# ============================================================
+class HabitEvent(Base):
+    __tablename__ = "habit_events"
+
+    # autoincremento = ordem de aplicação no replay
+    id = Column(Integer, primary_key=True, autoincrement=True)
+
+    type = Column(String, nullable=False)  # habit_created / habit_toggled / xp_applied
+    user_id = Column(String, nullable=False)
+    habit_id = Column(String, nullable=False)
+
+    date = Column(String, nullable=True)       # dia do toggle (fuso Brasil)
+    done = Column(Boolean, nullable=True)      # habit_toggled
+    xp_delta = Column(Integer, nullable=True)  # xp_applied (+ marcou / - desmarcou)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    # cópia/remoção de um usuário (rebalance) sem varrer a tabela toda
+    __table_args__ = (
+        Index("ix_habit_events_user", "user_id", "id"),
+    )
+
+
+# ============================================================
+# AGGREGATE CACHE (meses fechados — ver services/aggregate_cache.py)
+# habit_id = "" nos agregados do usuário inteiro
+# ============================================================
+class AggregateCache(Base):
+    __tablename__ = "aggregate_cache"
+
+    user_id = Column(String, primary_key=True)
+    kind = Column(String, primary_key=True)      # monthly_overview / habit_month
+    habit_id = Column(String, primary_key=True, default="")
+    month = Column(String, primary_key=True)     # YYYY-MM
+
+    payload = Column(Text, nullable=False)       # JSON
+    created_at = Column(DateTime, default=datetime.utcnow)
+
 
 # ============================================================
 # ACHIEVEMENT
@@ -92,6 +155,8 @@ class UserAchievement(Base):
 
     unlocked_at = Column(DateTime, default=datetime.utcnow)
 
+    change_seq = Column(Integer, nullable=False, default=0, server_default="0")
+
     # RELACIONAMENTOS
     user = relationship("AuthUser", back_populates="achievements")
     achievement = relationship("Achievement", back_populates="users")
@@ -33,6 +33,10 @@ class AuthUser(Base):
     level = Column(Integer, default=1)
     level_progress = Column(Float, default=0.0)
 
+    # sequência de mudanças do usuário (GET /sync): incrementada no início
+    # de toda escrita; as linhas alteradas recebem o valor novo
+    change_seq = Column(Integer, nullable=False, default=0, server_default="0")
+
     # ============================================================
     # RELACIONAMENTOS
     # ============================================================
@@ -59,3 +63,34 @@ class RefreshToken(Base):
     revoked = Column(Boolean, default=False)
 
     user = relationship("AuthUser", back_populates="sessions")
+
+
+# ============================================================
+# ACCESS TOKENS REVOGADOS (banco home) — jti do JWT até ele expirar
+# Cada worker espelha a tabela num Bloom filter (services/revocation.py)
+# ============================================================
+class RevokedToken(Base):
+    __tablename__ = "revoked_tokens"
+
+    jti = Column(String, primary_key=True)
+    user_id = Column(String, nullable=True)
+
+    # exp do próprio token: depois disso a linha pode ser apagada
+    expires_at = Column(DateTime, nullable=False, index=True)
+    # cursor da sincronização incremental dos workers
+    revoked_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+
+# ============================================================
+# DIRETÓRIO GLOBAL (banco home) — login e roteamento por shard
+# Uma linha por usuário: email/username únicos entre TODOS os shards
+# e o shard onde os dados dele estão (ver services/sharding.py).
+# ============================================================
+class UserDirectory(Base):
+    __tablename__ = "user_directory"
+
+    user_id = Column(String, primary_key=True)
+    email = Column(String, unique=True, nullable=False)
+    username = Column(String, unique=True, nullable=False)
+    shard = Column(String, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow)
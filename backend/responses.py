@@ -0,0 +1,22 @@
+from fastapi.responses import ORJSONResponse, Response
+from pydantic import BaseModel
+
+__all__ = ["ORJSONResponse", "ModelResponse"]
+
+
+# ============================================================
+# MODEL → BYTES DIRETO (pydantic-core)
+# ============================================================
+class ModelResponse(Response):
+    """
+    Serializa um model pydantic direto para JSON com o serializer compilado
+    do próprio model. Pula a revalidação do response_model (que no FastAPI
+    roda no threadpool para rotas sync) e o jsonable_encoder.
+
+    Usar nos payloads grandes (timelines, rolling averages, calendários).
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: BaseModel) -> bytes:
+        return content.__pydantic_serializer__.to_json(content)
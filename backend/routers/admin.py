@@ -0,0 +1,87 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse, PlainTextResponse
+
+from dependencies.admin import require_admin
+from services.profiling import (
+    list_profiles,
+    profile_path,
+    profile_report,
+    route_memory,
+    snapshot_diff,
+    start_tracing,
+    stop_tracing,
+    take_snapshot,
+)
+
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["Admin"],
+    dependencies=[Depends(require_admin)],
+    include_in_schema=False,
+)
+
+
+# ============================================================
+# PROFILES (cProfile)
+# ============================================================
+@router.get("/profiles")
+def get_profiles(route: Optional[str] = None, user_id: Optional[str] = None, limit: int = 50):
+    return list_profiles(route=route, user_id=user_id)[:limit]
+
+
+@router.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+def get_profile(profile_id: str, sort: str = "cumulative", limit: int = 40):
+    if sort not in ("cumulative", "tottime", "calls", "ncalls"):
+        raise HTTPException(400, "sort inválido")
+
+    report = profile_report(profile_id, sort=sort, limit=limit)
+    if report is None:
+        raise HTTPException(404, "Profile não encontrado")
+    return report
+
+
+@router.get("/profiles/{profile_id}/download")
+def download_profile(profile_id: str):
+    path = profile_path(profile_id)
+    if path is None:
+        raise HTTPException(404, "Profile não encontrado")
+    return FileResponse(path, media_type="application/octet-stream", filename=f"{profile_id}.prof")
+
+
+# ============================================================
+# MEMÓRIA (tracemalloc)
+# ============================================================
+@router.post("/memory/start")
+def memory_start(frames: int = 10):
+    start_tracing(frames)
+    return {"tracing": True}
+
+
+@router.post("/memory/stop")
+def memory_stop():
+    stop_tracing()
+    return {"tracing": False}
+
+
+@router.post("/memory/snapshot")
+def memory_snapshot():
+    return take_snapshot()
+
+
+@router.get("/memory/diff")
+def memory_diff(limit: int = 25, group_by: str = "lineno"):
+    if group_by not in ("lineno", "filename", "traceback"):
+        raise HTTPException(400, "group_by inválido")
+
+    diff = snapshot_diff(limit=limit, group_by=group_by)
+    if diff is None:
+        raise HTTPException(409, "Tire um snapshot antes (POST /admin/memory/snapshot)")
+    return diff
+
+
+@router.get("/memory/routes")
+def memory_routes():
+    return route_memory.summary()
@@ -1,13 +1,28 @@
 # routers/auth.py
-from fastapi import APIRouter, Depends
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Request
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
 from database import get_db
+from schemas import MessageOut, MeOut, RegisterOut, TokenPairOut
 from services.auth import register_user, login_user, refresh_access, logout
+from services import rate_limit
 from dependencies.auth_user import get_current_user
+from dependencies.priority import priority
+
+router = APIRouter(
+    prefix="/auth",
+    tags=["Auth"],
+    # login/refresh nunca caem por carga (o rate limit cuida do abuso)
+    dependencies=[Depends(priority("critical"))],
+)
+
 
-router = APIRouter(prefix="/auth", tags=["Auth"])
+# logout aceita o access token (opcional) para revogá-lo junto
+optional_bearer = HTTPBearer(auto_error=False)
 
 
 class RegisterIn(BaseModel):
@@ -25,28 +40,39 @@ class RefreshIn(BaseModel):
     refresh_token: str
 
 
-@router.post("/register")
-def register(data: RegisterIn, db: Session = Depends(get_db)):
+@router.post("/register", response_model=RegisterOut)
+def register(data: RegisterIn, request: Request, db: Session = Depends(get_db)):
+    # antes do bcrypt: o limite existe justamente para poupar CPU
+    rate_limit.enforce((rate_limit.REGISTER_PER_IP, rate_limit.client_ip(request)))
     user = register_user(db, data.email, data.username, data.password)
     return {"message": "Usuário registrado", "user_id": user.id}
 
 
-@router.post("/login")
-def login(data: LoginIn, db: Session = Depends(get_db)):
+@router.post("/login", response_model=TokenPairOut)
+def login(data: LoginIn, request: Request, db: Session = Depends(get_db)):
+    ip = rate_limit.client_ip(request)
+    rate_limit.enforce(
+        (rate_limit.LOGIN_PER_IP, ip),
+        (rate_limit.LOGIN_PER_IP_IDENTIFIER, f"{ip}:{data.identifier.strip().lower()}"),
+    )
     return login_user(db, data.identifier, data.password)
 
 
-@router.post("/refresh")
+@router.post("/refresh", response_model=TokenPairOut)
 def refresh(data: RefreshIn, db: Session = Depends(get_db)):
     return refresh_access(db, data.refresh_token)
 
 
-@router.post("/logout")
-def do_logout(data: RefreshIn, db: Session = Depends(get_db)):
-    return logout(db, data.refresh_token)
+@router.post("/logout", response_model=MessageOut)
+def do_logout(
+    data: RefreshIn,
+    db: Session = Depends(get_db),
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_bearer),
+):
+    return logout(db, data.refresh_token, access_token=credentials.credentials if credentials else None)
 
 
-@router.get("/me")
+@router.get("/me", response_model=MeOut)
 def me(user=Depends(get_current_user)):
     return {
         "id": user.id,
@@ -1,62 +1,87 @@
-from fastapi import APIRouter, Depends
+import asyncio
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
 from database import get_db
 
-from models import Habit, HabitLog
 from models_auth import AuthUser
-
-from datetime import timedelta
+from schemas import DashboardOut, DayOverviewOut
 
 # XP system
 from services.xp_engine import get_level_from_xp
 
-# Timezone Brasil
-from services.timezone import today_brazil_str, now_brazil
+# Loader por request (hábitos/logs carregados uma vez)
+from services.data_loader import UserDataLoader
+
+# Deltas ao vivo (SSE)
+from services import live_updates
+from middleware.compression import skip_compression
+
+# Fieldsets esparsos (?fields=)
+from services.sections import SectionRegistry
 
 # Auth
 from dependencies.auth_user import get_current_user
+from dependencies.priority import priority
 
 
-router = APIRouter(prefix="/dashboard", tags=["Dashboard"])
+router = APIRouter(
+    prefix="/dashboard",
+    tags=["Dashboard"],
+    dependencies=[Depends(priority("normal"))],
+)
 
 
 # ============================================================
 # DASHBOARD PRINCIPAL (AUTENTICADO)
+# Cada seção é independente: ?fields=today só roda a seção "today".
+# O ctx é o UserDataLoader do request: dados comuns carregados uma vez.
 # ============================================================
-@router.get("/")
-def get_dashboard(
-    db: Session = Depends(get_db),
-    user: AuthUser = Depends(get_current_user)
-):
-    today = today_brazil_str()
-
-    # ===============================
-    # 📌 LEVEL SYSTEM
-    # ===============================
-    level_info = get_level_from_xp(user.xp_total)
-
-    # ===============================
-    # 📌 HÁBITOS DO USUÁRIO
-    # ===============================
-    habits = db.query(Habit).filter(Habit.user_id == user.id).all()
-    habit_ids = [h.id for h in habits]
-
-    # ===============================
-    # 📌 LOGS DO DIA (SÓ DO USUÁRIO)
-    # ===============================
-    logs_today = []
-    if habit_ids:
-        logs_today = db.query(HabitLog).filter(
-            HabitLog.date == today,
-            HabitLog.habit_id.in_(habit_ids)
-        ).all()
-
-    done_ids = {log.habit_id for log in logs_today if log.done}
-
-    habits_data = []
-    for h in habits:
-        habits_data.append({
+dashboard_sections = SectionRegistry()
+
+
+# ===============================
+# 📌 LEVEL SYSTEM
+# ===============================
+@dashboard_sections.section("user")
+def _user_section(ctx):
+    level_info = get_level_from_xp(ctx.user.xp_total)
+    return {
+        "xp_total": ctx.user.xp_total,
+        "level": level_info["level"],
+        "level_progress": level_info["progress"],
+        "next_level_xp": level_info["next_level_xp"]
+    }
+
+
+# ===============================
+# 📌 ESTATÍSTICAS DO DIA
+# ===============================
+@dashboard_sections.section("today")
+def _today_section(ctx):
+    total_habits = len(ctx.habits)
+    done_today = len(ctx.done_habit_ids(ctx.today))
+    percent_today = (done_today / total_habits * 100) if total_habits > 0 else 0
+    return {
+        "date": ctx.today,
+        "total_habits": total_habits,
+        "done_today": done_today,
+        "percent": round(percent_today, 2)
+    }
+
+
+# ===============================
+# 📌 HÁBITOS DO USUÁRIO
+# ===============================
+@dashboard_sections.section("habits")
+def _habits_section(ctx):
+    done_ids = ctx.done_habit_ids(ctx.today)
+    return [
+        {
             "id": h.id,
             "title": h.title,
             "difficulty": h.difficulty,
@@ -66,38 +91,27 @@ def get_dashboard(
             "done_today": h.id in done_ids,
             "current_streak": h.current_streak,
             "best_streak": h.best_streak,
-        })
-
-    # ===============================
-    # 📌 ESTATÍSTICAS DO DIA
-    # ===============================
-    total_habits = len(habits)
-    done_today = len(done_ids)
-    percent_today = (done_today / total_habits * 100) if total_habits > 0 else 0
+        }
+        for h in ctx.habits
+    ]
 
-    # ===============================
-    # 📌 WEEK SUMMARY (SÓ DO USUÁRIO)
-    # ===============================
-    today_date = now_brazil().date()
-    start_date = today_date - timedelta(days=6)
-    dates = [(start_date + timedelta(days=i)) for i in range(7)]
 
-    logs_week = []
-    if habit_ids:
-        logs_week = db.query(HabitLog).filter(
-            HabitLog.date >= start_date.strftime("%Y-%m-%d"),
-            HabitLog.habit_id.in_(habit_ids)
-        ).all()
+# ===============================
+# 📌 WEEK SUMMARY (SÓ DO USUÁRIO)
+# ===============================
+@dashboard_sections.section("week_summary")
+def _week_section(ctx):
+    days = ctx.recent_days(7)
+    logs_week = ctx.logs_between(days[0], days[-1])
 
     # organiza por dia: "YYYY-MM-DD" -> [True/False...]
-    day_map = {d.strftime("%Y-%m-%d"): [] for d in dates}
+    day_map = {ds: [] for ds in days}
     for log in logs_week:
         if log.date in day_map:
             day_map[log.date].append(log.done)
 
     week_summary = []
-    for d in dates:
-        ds = d.strftime("%Y-%m-%d")
+    for ds in days:
         values = day_map[ds]
         percent = (values.count(True) / len(values) * 100) if values else 0
 
@@ -105,71 +119,99 @@ def get_dashboard(
             "date": ds,
             "percent": round(percent, 2)
         })
+    return week_summary
 
-    # ===============================
-    # 📌 RETORNO FINAL
-    # ===============================
-    return {
-        "user": {
-            "xp_total": user.xp_total,
-            "level": level_info["level"],
-            "level_progress": level_info["progress"],
-            "next_level_xp": level_info["next_level_xp"]
-        },
-        "today": {
-            "date": today,
-            "total_habits": total_habits,
-            "done_today": done_today,
-            "percent": round(percent_today, 2)
-        },
-        "habits": habits_data,
-        "week_summary": week_summary,
-        "achievements": []
-    }
+
+@dashboard_sections.section("achievements")
+def _achievements_section(ctx):
+    return []
+
+
+@router.get("/", response_model=DashboardOut, response_model_exclude_unset=True)
+def get_dashboard(
+    fields: Optional[str] = Query(None, description="Seções separadas por vírgula (padrão: todas)"),
+    db: Session = Depends(get_db),
+    user: AuthUser = Depends(get_current_user)
+):
+    loader = UserDataLoader(db, user)
+    if "week_summary" in dashboard_sections.parse(fields):
+        # uma query para a semana; "today"/"habits" saem dela
+        days = loader.recent_days(7)
+        loader.prefetch_logs(days[0], days[-1])
+    return dashboard_sections.compute(fields, loader)
 
 
 # ============================================================
 # 5.1 — WEEKLY OVERVIEW GLOBAL (AUTENTICADO)
 # ============================================================
-@router.get("/weekly-overview")
+@router.get("/weekly-overview", response_model=list[DayOverviewOut])
 def weekly_overview(
     db: Session = Depends(get_db),
     user: AuthUser = Depends(get_current_user)
 ):
-    habits = db.query(Habit).filter(Habit.user_id == user.id).all()
-    total_habits = len(habits)
-    habit_ids = [h.id for h in habits]
-
-    today = now_brazil().date()
-    output = []
+    loader = UserDataLoader(db, user)
+    total_habits = len(loader.habits)
+    days = loader.recent_days(7)
 
     # se não tem hábitos, devolve semana zerada
     if total_habits == 0:
-        for i in range(7):
-            day = today - timedelta(days=i)
-            ds = day.strftime("%Y-%m-%d")
-            output.append({"date": ds, "done": 0, "total": 0, "percent": 0})
-        output.reverse()
-        return output
-
-    for i in range(7):
-        day = today - timedelta(days=i)
-        ds = day.strftime("%Y-%m-%d")
-
-        logs_day = db.query(HabitLog).filter(
-            HabitLog.date == ds,
-            HabitLog.habit_id.in_(habit_ids)
-        ).all()
-
-        done_day = len([l for l in logs_day if l.done])
-        percent = (done_day / total_habits * 100) if total_habits else 0
-
-        output.append({
+        return [{"date": ds, "done": 0, "total": 0, "percent": 0} for ds in days]
+
+    # uma query para a semana inteira (antes: uma por dia)
+    done_by_day = dict.fromkeys(days, 0)
+    for log in loader.logs_between(days[0], days[-1]):
+        if log.done:
+            done_by_day[log.date] += 1
+
+    return [
+        {
             "date": ds,
-            "done": done_day,
+            "done": done_by_day[ds],
             "total": total_habits,
-            "percent": round(percent, 2)
-        })
+            "percent": round(done_by_day[ds] / total_habits * 100, 2)
+        }
+        for ds in days
+    ]
+
 
-    output.reverse()
-    return output
+# ============================================================
+# STREAM AO VIVO (SSE) — substitui o polling do dashboard
+# ============================================================
+@router.get("/stream", response_class=StreamingResponse)
+@skip_compression
+async def dashboard_stream(
+    db: Session = Depends(get_db),
+    user: AuthUser = Depends(get_current_user)
+):
+    """
+    Eventos: ready, habit_toggled, habit_created, achievement_unlocked,
+    resync (cliente ficou para trás: reler GET /dashboard/).
+    Heartbeat como comentário SSE a cada LIVE_HEARTBEAT_SECONDS.
+    """
+    user_id = user.id
+
+    # a conexão do banco não fica presa durante o stream
+    await run_in_threadpool(db.close)
+
+    sub = live_updates.hub.subscribe(user_id)
+    if sub is None:
+        raise HTTPException(429, "Muitos streams abertos para este usuário")
+
+    async def events():
+        try:
+            yield live_updates.format_sse({"type": "ready"})
+            while True:
+                try:
+                    event = await asyncio.wait_for(sub.queue.get(), live_updates.LIVE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield live_updates.HEARTBEAT
+                    continue
+                yield live_updates.format_sse(event)
+        finally:
+            live_updates.hub.unsubscribe(sub)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,17 +1,39 @@
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional
+
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
 from database import get_db
 
-from schemas import HabitCreate, HabitOut
+from schemas import (
+    HabitCreate,
+    HabitOut,
+    HabitCreatedOut,
+    ToggleOut,
+    HabitStatsOut,
+    HabitHistoryOut,
+    DayDoneOut,
+    DailySummaryOut,
+    MonthlyChartOut,
+    HabitAnalyticsOut,
+    BitSeriesOut,
+    HabitHistoryBitsOut,
+    MonthlyChartBitsOut,
+)
 from models import Habit, HabitLog
 from models_auth import AuthUser  # << NOVO
+from responses import ModelResponse
 
-from datetime import datetime, timedelta
+from datetime import timedelta
 
 # Serviços
-from services.xp_engine import calculate_xp_for_habit, apply_xp_gain
-from services.streak_engine import update_streak
-from services.achievement_engine import check_achievements
+from services import aggregate_cache, analytics, event_log, live_updates
+from services.bitpack import BITS_MEDIA_TYPE, pack, wants_bits
+from services.compute_pool import compute_pool
+from services.change_seq import next_change_seq
+from services.data_loader import owned_logs
+from services.toggle_engine import apply_toggle
+from services.write_coalescer import WRITE_COALESCING, coalescer
+from services.achievement_engine import check_after_toggle
 from services.level_engine import level_progress, calculate_level
 
 # Timezone Brasil
@@ -19,15 +41,31 @@ from services.timezone import today_brazil_str, now_brazil
 
 # Auth
 from dependencies.auth_user import get_current_user
+from dependencies.priority import priority
+
 
+router = APIRouter(
+    prefix="/habits",
+    tags=["Habits"],
+    dependencies=[Depends(priority("normal"))],
+)
 
-router = APIRouter(prefix="/habits", tags=["Habits"])
+# toggle: a escrita principal do app nunca cai por sobrecarga. Router
+# próprio (mesmo prefixo) porque a prioridade é declarada por router
+toggle_router = APIRouter(
+    prefix="/habits",
+    tags=["Habits"],
+    dependencies=[Depends(priority("critical"))],
+)
+
+# calendários/históricos: ?format=bits (ou Accept) → services/bitpack.py
+FORMAT_QUERY = Query(None, pattern="^(json|bits)$", description="json (padrão) ou bits (bitmap base64)")
 
 
 # ============================================================
 # 1) CRIAR HÁBITO  (AGORA AUTENTICADO)
 # ============================================================
-@router.post("/")
+@router.post("/", response_model=HabitCreatedOut)
 def create_habit(
     data: HabitCreate,
     db: Session = Depends(get_db),
@@ -38,13 +76,25 @@ def create_habit(
         user_id=user.id,  # << AGORA VEM DO JWT
         difficulty=data.difficulty,
         importance_weight=data.importance,
-        frequency_per_week=data.frequency
+        frequency_per_week=data.frequency,
+        change_seq=next_change_seq(db, user.id),
     )
 
     db.add(new_habit)
+    db.flush()  # gera o id para o evento
+    event_log.record(db, event_log.habit_created(user.id, new_habit.id))
     db.commit()
     db.refresh(new_habit)
 
+    live_updates.publish(
+        user.id, "habit_created",
+        id=new_habit.id,
+        title=new_habit.title,
+        difficulty=new_habit.difficulty,
+        importance=new_habit.importance_weight,
+        frequency_per_week=new_habit.frequency_per_week,
+    )
+
     return {
         "message": "Hábito criado",
         "id": new_habit.id,
@@ -68,93 +118,65 @@ def list_habits(
 # ============================================================
 # 3) MARCAR / DESMARCAR HÁBITO
 # ============================================================
-@router.post("/{habit_id}/toggle")
+@toggle_router.post("/{habit_id}/toggle", response_model=ToggleOut, response_model_exclude_none=True)
 def toggle_habit(
     habit_id: str,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     user: AuthUser = Depends(get_current_user)
 ):
     today = today_brazil_str()
+    # o commit expira o `user`: ler o id depois custaria um SELECT a mais
+    user_id = user.id
 
     habit = db.query(Habit).filter(
         Habit.id == habit_id,
-        Habit.user_id == user.id
+        Habit.user_id == user_id
     ).first()
 
     if not habit:
         raise HTTPException(404, "Hábito não encontrado")
 
-    # LOG DO DIA
-    log = db.query(HabitLog).filter(
-        HabitLog.habit_id == habit.id,
-        HabitLog.date == today
-    ).first()
-
-    # ❌ DESMARCAR
-    if log and log.done:
-        log.done = False
-
-        xp_change = calculate_xp_for_habit(
-            habit.difficulty, habit.importance_weight, habit.frequency_per_week
-        )
-
-        habit.xp = max(0, habit.xp - xp_change)
-
-        update_streak(habit, done_today=False)
-
-        db.commit()
-
-        return {
-            "done": False,
-            "xp_lost": xp_change,
-            "habit_xp": habit.xp,
-            "current_streak": habit.current_streak,
-            "best_streak": habit.best_streak,
-            "global_xp": user.xp_total,
-            "level": user.level,
-            "level_progress": user.level_progress
-        }
-
-    # ✅ MARCAR COMO FEITO
-    if not log:
-        log = HabitLog(
-            habit_id=habit_id,
-            date=today,
-            done=True
-        )
-        db.add(log)
+    shard = db.info.get("shard")
+    if WRITE_COALESCING:
+        # libera a conexão enquanto espera o commit do lote
+        db.close()
+        result = coalescer.run(apply_toggle, user, habit, today, shard=shard)
     else:
-        log.done = True
+        # upsert do log + incrementos atômicos, tudo numa transação só
+        result = apply_toggle(db, user, habit, today)
+        db.commit()
 
-    xp_change = calculate_xp_for_habit(
-        habit.difficulty, habit.importance_weight, habit.frequency_per_week
+    live_updates.publish(
+        user_id, "habit_toggled",
+        habit_id=habit_id,
+        date=today,
+        done=result["done"],
+        habit_xp=result["habit_xp"],
+        current_streak=result["current_streak"],
+        best_streak=result["best_streak"],
+        xp_total=result["global_xp"],
+        level=result["level"],
+        level_progress=result["level_progress"],
     )
 
-    habit.xp += xp_change
-
-    update_streak(habit, done_today=True)
+    # virada do mês entre o `today` e o commit: o dia já é de mês fechado
+    aggregate_cache.invalidate(db.get_bind(), user_id, [today], habit_id)
 
-    xp_data = apply_xp_gain(user, habit, db)
-
-    db.commit()
+    # marcar pode desbloquear conquista (publica achievement_unlocked);
+    # fica para depois da resposta, fora do orçamento de queries do toggle
+    if result["done"]:
+        background_tasks.add_task(
+            check_after_toggle, user_id, today, result["current_streak"], result["global_xp"], shard,
+        )
 
-    return {
-        "done": True,
-        "xp_gained": xp_change,
-        "habit_xp": habit.xp,
-        "current_streak": habit.current_streak,
-        "best_streak": habit.best_streak,
-        "global_xp": xp_data["total_xp"],
-        "level": xp_data["level"],
-        "level_progress": xp_data["level_progress"],
-        "next_level_xp": xp_data["next_level_xp"]
-    }
+    return result
 
 
 # ============================================================
 # 4) ESTATÍSTICAS DO HÁBITO
 # ============================================================
-@router.get("/{habit_id}/stats")
+@router.get("/{habit_id}/stats", response_model=HabitStatsOut)
 def habit_stats(
     habit_id: str,
     db: Session = Depends(get_db),
@@ -186,20 +208,36 @@ def habit_stats(
     }
 
 
+# ============================================================
+# LOGS DO HÁBITO NO MÊS — [[date, done]] por data
+# (history e monthly-chart; mês fechado vem do aggregate_cache)
+# ============================================================
+def _habit_month_logs(db, user, habit, month_key: str) -> list:
+    def build():
+        rows = db.query(HabitLog.date, HabitLog.done).filter(
+            HabitLog.habit_id == habit.id,
+            HabitLog.date.like(f"{month_key}-%")
+        ).order_by(HabitLog.date).all()
+        return [[d, done] for d, done in rows]
+
+    return aggregate_cache.get_or_build(
+        db, user.id, aggregate_cache.HABIT_MONTH, month_key, build, habit_id=habit.id
+    )
+
+
 # ============================================================
 # 5) HISTÓRICO COMPACTO POR MÊS
 # ============================================================
-@router.get("/{habit_id}/history")
+@router.get("/{habit_id}/history", response_model=HabitHistoryOut)
 def habit_history(
     habit_id: str,
     month: str,
+    request: Request,
+    format: Optional[str] = FORMAT_QUERY,
     db: Session = Depends(get_db),
     user: AuthUser = Depends(get_current_user)
 ):
-    try:
-        year, mon = map(int, month.split("-"))
-    except:
-        raise HTTPException(400, "Formato inválido. Use YYYY-MM")
+    year, mon = aggregate_cache.parse_month(month)
 
     habit = db.query(Habit).filter(
         Habit.id == habit_id,
@@ -209,33 +247,46 @@ def habit_history(
     if not habit:
         raise HTTPException(404, "Hábito não encontrado")
 
-    logs = db.query(HabitLog).filter(
-        HabitLog.habit_id == habit_id,
-        HabitLog.date.like(f"{month}-%")
-    ).all()
+    month_key = f"{year}-{mon:02d}"
+    logs = _habit_month_logs(db, user, habit, month_key)
 
     total_logs = len(logs)
-    done_logs = len([l for l in logs if l.done])
+    done_logs = len([1 for _, done in logs if done])
 
     percent = (done_logs / total_logs * 100) if total_logs else 0
 
-    return {
+    if wants_bits(request, format):
+        import calendar
+
+        series = pack(f"{month_key}-01", calendar.monthrange(year, mon)[1],
+                      (d for d, done in logs if done))
+        response = ModelResponse(HabitHistoryBitsOut(
+            habit_id=habit.id, title=habit.title, month=month,
+            days_total=total_logs, days_done=done_logs, percent=round(percent, 2),
+            history=BitSeriesOut(**series),
+        ), media_type=BITS_MEDIA_TYPE)
+        return aggregate_cache.cache_response(request, response, month_key)
+
+    response = ModelResponse(HabitHistoryOut.model_validate({
         "habit_id": habit.id,
         "title": habit.title,
         "month": month,
         "days_total": total_logs,
         "days_done": done_logs,
         "percent": round(percent, 2),
-        "history": [{"date": l.date, "done": l.done} for l in logs]
-    }
+        "history": [{"date": d, "done": done} for d, done in logs]
+    }))
+    return aggregate_cache.cache_response(request, response, month_key)
 
 
 # ============================================================
 # 6) WEEKLY TREND
 # ============================================================
-@router.get("/{habit_id}/weekly-trend")
+@router.get("/{habit_id}/weekly-trend", response_model=list[DayDoneOut])
 def weekly_trend(
     habit_id: str,
+    request: Request,
+    format: Optional[str] = FORMAT_QUERY,
     db: Session = Depends(get_db),
     user: AuthUser = Depends(get_current_user)
 ):
@@ -248,29 +299,25 @@ def weekly_trend(
         raise HTTPException(404, "Hábito não encontrado")
 
     today = now_brazil().date()
-    week_data = []
+    days = [(today - timedelta(days=i)).strftime("%Y-%m-%d") for i in range(6, -1, -1)]
 
-    for i in range(7):
-        day = today - timedelta(days=i)
-        logs = db.query(HabitLog).filter(
-            HabitLog.habit_id == habit.id,
-            HabitLog.date == day.strftime("%Y-%m-%d")
-        ).first()
-
-        week_data.append({
-            "date": day.strftime("%Y-%m-%d"),
-            "done": bool(logs and logs.done)
-        })
+    # uma query para a semana inteira (antes: uma por dia)
+    done_dates = {row.date for row in db.query(HabitLog.date).filter(
+        HabitLog.habit_id == habit.id,
+        HabitLog.date >= days[0],
+        HabitLog.done == True
+    )}
 
-    week_data.reverse()
+    if wants_bits(request, format):
+        return ModelResponse(BitSeriesOut(**pack(days[0], 7, done_dates)), media_type=BITS_MEDIA_TYPE)
 
-    return week_data
+    return [{"date": ds, "done": ds in done_dates} for ds in days]
 
 
 # ============================================================
 # 7) DAILY SUMMARY
 # ============================================================
-@router.get("/daily-summary")
+@router.get("/daily-summary", response_model=DailySummaryOut)
 def daily_summary(
     db: Session = Depends(get_db),
     user: AuthUser = Depends(get_current_user)
@@ -278,9 +325,13 @@ def daily_summary(
     today = today_brazil_str()
 
     habits = db.query(Habit).filter(Habit.user_id == user.id).all()
-    logs_today = db.query(HabitLog).filter(HabitLog.date == today).all()
 
-    done_ids = {l.habit_id for l in logs_today if l.done}
+    # só os logs de hoje DESTE usuário (índice user_id, date)
+    done_ids = {row.habit_id for row in db.query(HabitLog.habit_id).filter(
+        owned_logs(db, user.id),
+        HabitLog.date == today,
+        HabitLog.done == True
+    )}
 
     return {
         "date": today,
@@ -298,19 +349,18 @@ def daily_summary(
 # ============================================================
 # 8) MONTHLY CALENDAR
 # ============================================================
-@router.get("/{habit_id}/monthly-chart")
+@router.get("/{habit_id}/monthly-chart", response_model=MonthlyChartOut)
 def monthly_chart(
     habit_id: str,
     month: str,
+    request: Request,
+    format: Optional[str] = FORMAT_QUERY,
     db: Session = Depends(get_db),
     user: AuthUser = Depends(get_current_user)
 ):
     import calendar
 
-    try:
-        year, mon = map(int, month.split("-"))
-    except:
-        raise HTTPException(400, "Formato inválido")
+    year, mon = aggregate_cache.parse_month(month)
 
     days = calendar.monthrange(year, mon)[1]
 
@@ -322,30 +372,35 @@ def monthly_chart(
     if not habit:
         raise HTTPException(404, "Hábito não encontrado")
 
-    dates = [f"{year}-{mon:02d}-{d:02d}" for d in range(1, days + 1)]
+    month_key = f"{year}-{mon:02d}"
+    dates = [f"{month_key}-{d:02d}" for d in range(1, days + 1)]
 
-    logs = db.query(HabitLog).filter(
-        HabitLog.habit_id == habit.id,
-        HabitLog.date.like(f"{month}-%")
-    ).all()
+    log_map = dict(_habit_month_logs(db, user, habit, month_key))
 
-    log_map = {l.date: l.done for l in logs}
+    if wants_bits(request, format):
+        series = pack(dates[0], days, (d for d, done in log_map.items() if done))
+        response = ModelResponse(MonthlyChartBitsOut(
+            habit_id=habit.id, title=habit.title, month=month, days=days,
+            calendar=BitSeriesOut(**series),
+        ), media_type=BITS_MEDIA_TYPE)
+        return aggregate_cache.cache_response(request, response, month_key)
 
     calendar_list = [{"date": d, "done": log_map.get(d, False)} for d in dates]
 
-    return {
+    response = ModelResponse(MonthlyChartOut.model_validate({
         "habit_id": habit.id,
         "title": habit.title,
         "month": month,
         "days": days,
         "calendar": calendar_list
-    }
+    }))
+    return aggregate_cache.cache_response(request, response, month_key)
 
 
 # ============================================================
 # 9) ANALYTICS AVANÇADO
 # ============================================================
-@router.get("/{habit_id}/analytics")
+@router.get("/{habit_id}/analytics", response_model=HabitAnalyticsOut)
 def habit_analytics(
     habit_id: str,
     db: Session = Depends(get_db),
@@ -359,40 +414,16 @@ def habit_analytics(
     if not habit:
         raise HTTPException(404, "Hábito não encontrado")
 
-    logs = db.query(HabitLog).filter(HabitLog.habit_id == habit.id).all()
-
-    total_logs = len(logs)
-    done_logs = len([l for l in logs if l.done])
-    adherence = (done_logs / total_logs * 100) if total_logs else 0
-
-    today = now_brazil().date()
-    last_30 = today - timedelta(days=30)
-
-    logs_30 = [
-        {"date": l.date, "done": l.done}
-        for l in logs
-        if datetime.strptime(l.date, "%Y-%m-%d").date() >= last_30
-    ]
+    logs = db.query(HabitLog.date, HabitLog.done).filter(HabitLog.habit_id == habit.id).all()
 
-    sorted_logs = sorted(
-        logs, key=lambda l: datetime.strptime(l.date, "%Y-%m-%d"), reverse=True
+    # CPU no pool de processos; para lá vão só primitivos
+    stats = compute_pool.run(
+        analytics.habit_analytics,
+        [tuple(l) for l in logs],
+        today_brazil_str(),
+        rows=len(logs),
     )
 
-    streak_done = 0
-    streak_failed = 0
-
-    for l in sorted_logs:
-        if l.done:
-            streak_done += 1
-        else:
-            break
-
-    for l in sorted_logs:
-        if not l.done:
-            streak_failed += 1
-        else:
-            break
-
     return {
         "habit": {
             "id": habit.id,
@@ -400,15 +431,12 @@ def habit_analytics(
             "created_at": habit.created_at,
             "current_streak": habit.current_streak,
             "best_streak": habit.best_streak,
-            "total_logs": total_logs,
-            "done_logs": done_logs,
-            "adherence_percent": round(adherence, 2),
-        },
-        "last_30_days": logs_30,
-        "week_stats": {
-            "done": streak_done,
-            "failed": streak_failed
+            "total_logs": stats["total_logs"],
+            "done_logs": stats["done_logs"],
+            "adherence_percent": stats["adherence_percent"],
         },
+        "last_30_days": stats["last_30_days"],
+        "week_stats": stats["week_stats"],
         "common_completion_time": None
     }
 
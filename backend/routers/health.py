@@ -0,0 +1,34 @@
+from fastapi import APIRouter, HTTPException
+from sqlalchemy import text
+
+from database import engine
+from schemas import StatusOut
+from services.bootstrap import is_ready
+
+
+router = APIRouter(prefix="/health", tags=["Health"])
+
+
+# ============================================================
+# LIVENESS — processo de pé (sem tocar no banco)
+# ============================================================
+@router.get("/live", response_model=StatusOut)
+def live():
+    return {"status": "ok"}
+
+
+# ============================================================
+# READINESS — schema pronto + banco respondendo
+# ============================================================
+@router.get("/ready", response_model=StatusOut)
+def ready():
+    if not is_ready():
+        raise HTTPException(503, "Inicialização do banco pendente")
+
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    except Exception:
+        raise HTTPException(503, "Banco indisponível")
+
+    return {"status": "ready"}
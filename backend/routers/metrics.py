@@ -0,0 +1,38 @@
+import hmac
+import os
+
+import anyio.to_thread
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+
+from services.metrics import Gauge, registry
+
+# se definido, o scrape precisa mandar "Authorization: Bearer <METRICS_TOKEN>"
+# (em prod é obrigatório: sem ele o main.py não monta a rota)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "").strip()
+
+router = APIRouter(tags=["Metrics"])
+
+
+# ============================================================
+# /metrics — formato texto do Prometheus
+# ============================================================
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics(request: Request):
+    if METRICS_TOKEN and not hmac.compare_digest(
+        request.headers.get("authorization", "").encode(), f"Bearer {METRICS_TOKEN}".encode(),
+    ):
+        raise HTTPException(401, "Não autorizado")
+
+    # o limiter do anyio só existe dentro do event loop: lê aqui mesmo
+    stats = anyio.to_thread.current_default_thread_limiter().statistics()
+    threadpool = [
+        Gauge("threadpool_size", "Threads disponíveis para rotas sync", lambda: stats.total_tokens),
+        Gauge("threadpool_busy", "Threads ocupadas", lambda: stats.borrowed_tokens),
+        Gauge("threadpool_queue_depth", "Tarefas esperando thread livre", lambda: stats.tasks_waiting),
+    ]
+
+    return PlainTextResponse(
+        registry.render(threadpool),
+        media_type="text/plain; version=0.0.4",
+    )
@@ -1,10 +1,33 @@
-from fastapi import APIRouter, Depends
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query, Request
 from sqlalchemy.orm import Session
 from database import get_db
-from datetime import timedelta, datetime
+from datetime import timedelta
 
-from models import Habit, HabitLog
 from models_auth import AuthUser
+from responses import ModelResponse, ORJSONResponse
+from schemas import (
+    ProgressOut,
+    MonthlyOverviewOut,
+    WeeklyOverviewOut,
+    FullHistoryOut,
+    FullHistoryBitsOut,
+    InsightsOut,
+)
+
+# formato compacto (?format=bits)
+from services.bitpack import BITS_MEDIA_TYPE, wants_bits
+
+# estágio de CPU das análises (pool de processos)
+from services import analytics
+from services.compute_pool import compute_pool
+
+# agregados de meses fechados (cache persistente + Cache-Control/ETag)
+from services import aggregate_cache
+
+# loader por request (hábitos/logs/conquistas carregados uma vez)
+from services.data_loader import UserDataLoader
 
 # funções do engine
 from services.progress_engine import (
@@ -16,65 +39,95 @@ from services.progress_engine import (
 
 # autenticação real
 from dependencies.auth_user import get_current_user
+from dependencies.priority import priority
 
 # timezone Brasil
 from services.timezone import now_brazil
 
+# fieldsets esparsos (?fields=)
+from services.sections import SectionRegistry
 
-router = APIRouter(prefix="/progress", tags=["Progress"])
+
+router = APIRouter(
+    prefix="/progress",
+    tags=["Progress"],
+    # analytics pesados: primeiros a cair sob sobrecarga
+    dependencies=[Depends(priority("low"))],
+)
 
 
 # ============================================================
 # 📌 ENDPOINT PRINCIPAL — PROGRESSO GLOBAL
 # ============================================================
-@router.get("/")
+progress_sections = SectionRegistry()
+
+
+# ctx é o UserDataLoader do request: só dados do próprio usuário
+@progress_sections.section("user")
+def _user_section(ctx):
+    user = ctx.user
+    return {
+        "xp_total": user.xp_total,
+        "level": user.level,
+        "level_progress": user.level_progress
+    }
+
+
+@progress_sections.section("today")
+def _today_section(ctx):
+    return get_today_summary(ctx)
+
+
+@progress_sections.section("streaks")
+def _streaks_section(ctx):
+    return get_global_streaks(ctx)
+
+
+@progress_sections.section("week_summary")
+def _week_section(ctx):
+    return get_week_summary(ctx)
+
+
+@progress_sections.section("achievements")
+def _achievements_section(ctx):
+    return get_user_achievements(ctx)
+
+
+@router.get("/", response_model=ProgressOut, response_model_exclude_unset=True)
 def get_full_progress(
+    fields: Optional[str] = Query(None, description="Seções separadas por vírgula (padrão: todas)"),
     db: Session = Depends(get_db),
     user: AuthUser = Depends(get_current_user)
 ):
-    # IMPORTANTE: estas funções do progress_engine PRECISAM usar user.id / habits do user
-    today_summary = get_today_summary(user, db)
-    streaks = get_global_streaks(user, db)
-    week = get_week_summary(user, db)
-    achievements = get_user_achievements(user, db)
-
-    return {
-        "user": {
-            "xp_total": user.xp_total,
-            "level": user.level,
-            "level_progress": user.level_progress
-        },
-        "today": today_summary,
-        "streaks": streaks,
-        "week_summary": week,
-        "achievements": achievements
-    }
+    loader = UserDataLoader(db, user)
+    if "week_summary" in progress_sections.parse(fields):
+        # uma query para a semana; "today" sai dela
+        days = loader.recent_days(7)
+        loader.prefetch_logs(days[0], days[-1])
+    return progress_sections.compute(fields, loader)
 
 
 # ============================================================
 # 5.2 — MONTHLY OVERVIEW GLOBAL
 # ============================================================
-@router.get("/monthly-overview")
+@router.get("/monthly-overview", response_model=MonthlyOverviewOut)
 def monthly_overview(
     month: str,
+    request: Request,
     db: Session = Depends(get_db),
     user: AuthUser = Depends(get_current_user)
 ):
     import calendar
 
-    try:
-        year, mon = map(int, month.split("-"))
-    except:
-        return {"error": "Formato inválido. Use YYYY-MM"}
+    year, mon = aggregate_cache.parse_month(month)
 
     total_days = calendar.monthrange(year, mon)[1]
 
-    habits = db.query(Habit).filter(Habit.user_id == user.id).all()
-    habit_ids = [h.id for h in habits]
-    total_habits = len(habits)
+    loader = UserDataLoader(db, user)
+    total_habits = len(loader.habits)
 
     if total_habits == 0:
-        return {
+        return ModelResponse(MonthlyOverviewOut.model_validate({
             "month": month,
             "total_days": total_days,
             "perfect_days": 0,
@@ -82,50 +135,49 @@ def monthly_overview(
                 {"date": f"{year}-{mon:02d}-{d:02d}", "done": 0, "total": 0, "percent": 0}
                 for d in range(1, total_days + 1)
             ]
-        }
+        }))
 
-    logs = db.query(HabitLog).filter(
-        HabitLog.habit_id.in_(habit_ids),
-        HabitLog.date.like(f"{month}-%")
-    ).all()
+    month_key = f"{year}-{mon:02d}"
 
-    log_map = {f"{year}-{mon:02d}-{d:02d}": [] for d in range(1, total_days + 1)}
-    for log in logs:
-        if log.date in log_map:
-            log_map[log.date].append(log)
+    def build():
+        # feitos por dia; o total de hábitos é o de agora (fora do cache)
+        done_by_day = [0] * total_days
+        for log in loader.logs_between(f"{month_key}-01", f"{month_key}-{total_days:02d}"):
+            if log.done:
+                done_by_day[int(log.date[8:10]) - 1] += 1
+        return {"done": done_by_day}
+
+    cached = aggregate_cache.get_or_build(db, user.id, aggregate_cache.MONTHLY_OVERVIEW, month_key, build)
 
     days_output = []
     perfect_days = 0
 
-    for d in range(1, total_days + 1):
-        ds = f"{year}-{mon:02d}-{d:02d}"
-        logs_day = log_map[ds]
-
-        done = len([l for l in logs_day if l.done])
+    for d, done in enumerate(cached["done"], start=1):
         percent = (done / total_habits * 100) if total_habits else 0
 
         if total_habits > 0 and done == total_habits:
             perfect_days += 1
 
         days_output.append({
-            "date": ds,
+            "date": f"{month_key}-{d:02d}",
             "done": done,
             "total": total_habits,
             "percent": round(percent, 2)
         })
 
-    return {
+    response = ModelResponse(MonthlyOverviewOut.model_validate({
         "month": month,
         "total_days": total_days,
         "perfect_days": perfect_days,
         "days": days_output
-    }
+    }))
+    return aggregate_cache.cache_response(request, response, month_key)
 
 
 # ============================================================
 # 5.3 — WEEKLY OVERVIEW GLOBAL
 # ============================================================
-@router.get("/weekly-overview")
+@router.get("/weekly-overview", response_model=WeeklyOverviewOut)
 def weekly_overview(
     db: Session = Depends(get_db),
     user: AuthUser = Depends(get_current_user)
@@ -135,9 +187,8 @@ def weekly_overview(
 
     dates = [(start_date + timedelta(days=i)) for i in range(7)]
 
-    habits = db.query(Habit).filter(Habit.user_id == user.id).all()
-    habit_ids = [h.id for h in habits]
-    total_habits = len(habits)
+    loader = UserDataLoader(db, user)
+    total_habits = len(loader.habits)
 
     if total_habits == 0:
         output = []
@@ -153,10 +204,7 @@ def weekly_overview(
             "week_completion_percent": 0
         }
 
-    logs = db.query(HabitLog).filter(
-        HabitLog.habit_id.in_(habit_ids),
-        HabitLog.date >= start_date.strftime("%Y-%m-%d")
-    ).all()
+    logs = loader.logs_between(start_date.strftime("%Y-%m-%d"))
 
     log_map = {d.strftime("%Y-%m-%d"): [] for d in dates}
     for log in logs:
@@ -199,223 +247,57 @@ def weekly_overview(
 # ============================================================
 # 5.4 — FULL HISTORY GLOBAL
 # ============================================================
-@router.get("/full-history")
+@router.get("/full-history", response_model=FullHistoryOut)
 def full_history(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(json|bits)$", description="json (padrão) ou bits (bitmap base64 por hábito)"),
     db: Session = Depends(get_db),
     user: AuthUser = Depends(get_current_user)
 ):
-    habits = db.query(Habit).filter(Habit.user_id == user.id).all()
-    habit_ids = [h.id for h in habits]
-    total_habits = len(habits)
-
-    if total_habits == 0:
-        return {
-            "start": None,
-            "end": None,
-            "total_days": 0,
-            "perfect_days": 0,
-            "timeline": []
-        }
-
-    logs = db.query(HabitLog).filter(
-        HabitLog.habit_id.in_(habit_ids)
-    ).all()
+    bits = wants_bits(request, format)
+    loader = UserDataLoader(db, user)
+    total_habits = len(loader.habits)
+    logs = loader.all_logs() if total_habits else []
 
     if not logs:
-        return {
-            "start": None,
-            "end": None,
-            "total_days": 0,
-            "perfect_days": 0,
-            "timeline": []
-        }
+        if bits:
+            return ModelResponse(FullHistoryBitsOut(total_days=0, perfect_days=0, habits=[]), media_type=BITS_MEDIA_TYPE)
+        return ModelResponse(FullHistoryOut(total_days=0, perfect_days=0, timeline=[]))
 
-    first_date = min(datetime.strptime(l.date, "%Y-%m-%d").date() for l in logs)
-    last_date = now_brazil().date()
+    # CPU no pool de processos; para lá vão só primitivos
+    rows = [tuple(log) for log in logs]
+    today = now_brazil().strftime("%Y-%m-%d")
 
-    delta = (last_date - first_date).days + 1
-    dates = [first_date + timedelta(days=i) for i in range(delta)]
+    if bits:
+        # grade hábito × dia: o cliente soma as colunas para done/total
+        habits = [(h.id, h.title) for h in loader.habits]
+        data = compute_pool.run(analytics.full_history_grid, habits, rows, today, rows=len(rows))
+        return ModelResponse(FullHistoryBitsOut.model_validate(data), media_type=BITS_MEDIA_TYPE)
 
-    log_map = {}
-    for log in logs:
-        log_map.setdefault(log.date, []).append(log.done)
-
-    timeline = []
-    perfect_days = 0
-
-    for d in dates:
-        ds = d.strftime("%Y-%m-%d")
-        values = log_map.get(ds, [])
-
-        done = values.count(True)
-        percent = (done / total_habits * 100) if total_habits else 0
-        percent = round(percent, 2)
-
-        if done == total_habits and total_habits > 0:
-            perfect_days += 1
-
-        timeline.append({
-            "date": ds,
-            "done": done,
-            "total": total_habits,
-            "percent": percent
-        })
-
-    return {
-        "start": first_date.strftime("%Y-%m-%d"),
-        "end": last_date.strftime("%Y-%m-%d"),
-        "total_days": len(timeline),
-        "perfect_days": perfect_days,
-        "timeline": timeline
-    }
+    data = compute_pool.run(analytics.full_history, total_habits, rows, today, rows=len(rows))
+    return ModelResponse(FullHistoryOut.model_validate(data))
 
 
 # ============================================================
 # 5.5 — INSIGHTS AVANÇADOS
 # ============================================================
-@router.get("/insights")
+@router.get("/insights", response_model=InsightsOut)
 def insights(
     db: Session = Depends(get_db),
     user: AuthUser = Depends(get_current_user)
 ):
-    from collections import defaultdict
-
-    habits = db.query(Habit).filter(Habit.user_id == user.id).all()
-    habit_ids = [h.id for h in habits]
+    loader = UserDataLoader(db, user)
+    habits = loader.habits
 
     if not habits:
-        return {"error": "Nenhum hábito encontrado"}
-
-    logs = db.query(HabitLog).filter(
-        HabitLog.habit_id.in_(habit_ids)
-    ).all()
-
-    # ---------------------------------------------------------
-    # PREPARAÇÃO DE MAPAS
-    # ---------------------------------------------------------
-    logs_by_habit = defaultdict(list)
-    logs_by_day = defaultdict(list)
-    logs_last_30 = []
-
-    today = now_brazil().date()
-    last_30 = today - timedelta(days=30)
-
-    for log in logs:
-        logs_by_habit[log.habit_id].append(log)
-        logs_by_day[log.date].append(log)
-
-        d = datetime.strptime(log.date, "%Y-%m-%d").date()
-        if d >= last_30:
-            logs_last_30.append(log)
-
-    # ---------------------------------------------------------
-    # 1️⃣ CONSISTENCY SCORE
-    # ---------------------------------------------------------
-    if logs_last_30:
-        done_30 = len([l for l in logs_last_30 if l.done])
-        pct_30 = (done_30 / len(logs_last_30)) * 100
-    else:
-        pct_30 = 0
-
-    avg_current_streak = sum(h.current_streak for h in habits) / len(habits)
-    avg_best_streak = sum(h.best_streak for h in habits) / len(habits)
-
-    streak_score = min((avg_current_streak / (avg_best_streak + 0.0001)) * 100, 100) if avg_best_streak else 0
-
-    perfect_days = 0
-    for d, logs_day in logs_by_day.items():
-        total = len(logs_day)
-        done = len([l for l in logs_day if l.done])
-        if total > 0 and done == total:
-            perfect_days += 1
-
-    perfect_days_pct = min((perfect_days / 30) * 100, 100)
-
-    consistency_score = round(
-        (pct_30 * 0.5) + (streak_score * 0.3) + (perfect_days_pct * 0.2),
-        2
+        return ORJSONResponse({"error": "Nenhum hábito encontrado"})
+
+    rows = [tuple(log) for log in loader.all_logs()]
+    data = compute_pool.run(
+        analytics.insights,
+        [(h.id, h.title, h.current_streak, h.best_streak) for h in habits],
+        rows,
+        now_brazil().strftime("%Y-%m-%d"),
+        rows=len(rows),
     )
-
-    # ---------------------------------------------------------
-    # 2️⃣ MELHOR / PIOR DIA DA SEMANA
-    # ---------------------------------------------------------
-    week_map = defaultdict(lambda: {"done": 0, "total": 0})
-    week_names = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
-
-    for d, logs_day in logs_by_day.items():
-        dt = datetime.strptime(d, "%Y-%m-%d")
-        weekday = dt.weekday()
-
-        week_map[weekday]["total"] += len(logs_day)
-        week_map[weekday]["done"] += len([l for l in logs_day if l.done])
-
-    week_stats = []
-    for wd in range(7):
-        total = week_map[wd]["total"]
-        done = week_map[wd]["done"]
-        pct = (done / total * 100) if total else 0
-        week_stats.append({"day": week_names[wd], "percent": round(pct, 2)})
-
-    best_day = max(week_stats, key=lambda x: x["percent"])
-    worst_day = min(week_stats, key=lambda x: x["percent"])
-
-    # ---------------------------------------------------------
-    # 3️⃣ HÁBITO MAIS FÁCIL / MAIS DIFÍCIL
-    # ---------------------------------------------------------
-    habit_performance = []
-
-    for h in habits:
-        logs_h = logs_by_habit[h.id]
-        total = len(logs_h)
-        done = len([l for l in logs_h if l.done])
-        pct = (done / total * 100) if total else 0
-
-        habit_performance.append({
-            "id": h.id,
-            "title": h.title,
-            "percent": pct
-        })
-
-    easiest = max(habit_performance, key=lambda x: x["percent"])
-    hardest = min(habit_performance, key=lambda x: x["percent"])
-
-    # ---------------------------------------------------------
-    # 4️⃣ ROLLING AVERAGE
-    # ---------------------------------------------------------
-    all_dates = sorted(logs_by_day.keys())
-    rolling = []
-    window = 7
-
-    for i in range(len(all_dates)):
-        slice_days = all_dates[max(0, i - window + 1): i + 1]
-
-        done_count = sum(
-            len([l for l in logs_by_day[d] if l.done])
-            for d in slice_days
-        )
-        total_count = sum(len(logs_by_day[d]) for d in slice_days)
-
-        pct = (done_count / total_count * 100) if total_count else 0
-
-        rolling.append({
-            "date": all_dates[i],
-            "rolling_percent": round(pct, 2)
-        })
-
-    return {
-        "consistency_score": consistency_score,
-        "days_of_week": week_stats,
-        "best_day": best_day,
-        "worst_day": worst_day,
-        "habit_difficulty": {
-            "easiest": easiest,
-            "hardest": hardest
-        },
-        "rolling_average": rolling,
-        "streaks": {
-            "average_current": round(avg_current_streak, 2),
-            "average_best": round(avg_best_streak, 2)
-        },
-        "perfect_days_last_30": perfect_days,
-        "completion_last_30_percent": round(pct_30, 2)
-    }
+    return ModelResponse(InsightsOut.model_validate(data))
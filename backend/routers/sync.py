@@ -0,0 +1,97 @@
+# routers/sync.py
+#
+# GET /sync?since=<cursor> — só o que mudou depois do cursor.
+# Cursor = AuthUser.change_seq; cada linha guarda o change_seq da escrita
+# que a alterou. since=0 (ou cursor desconhecido) → sync completo.
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from database import get_db
+from models import Achievement, Habit, HabitLog, UserAchievement
+from models_auth import AuthUser
+from schemas import SyncOut
+from services.data_loader import owned_logs
+from services.xp_engine import get_level_from_xp
+
+from dependencies.auth_user import get_current_user
+from dependencies.priority import priority
+
+router = APIRouter(
+    prefix="/sync",
+    tags=["Sync"],
+    dependencies=[Depends(priority("normal"))],
+)
+
+
+@router.get("/", response_model=SyncOut)
+def sync(
+    since: int = Query(0, ge=0),
+    db: Session = Depends(get_db),
+    user: AuthUser = Depends(get_current_user)
+):
+    # lido junto com o usuário, antes das linhas: tudo com seq <= cursor
+    # já está commitado; o que vier a mais só se repete no próximo sync
+    cursor = user.change_seq or 0
+
+    full = since == 0 or since > cursor
+    if full:
+        since = 0
+
+    user_data = None
+    if full or cursor > since:
+        level_info = get_level_from_xp(user.xp_total)
+        user_data = {
+            "xp_total": user.xp_total,
+            "level": level_info["level"],
+            "level_progress": level_info["progress"],
+            "next_level_xp": level_info["next_level_xp"],
+        }
+
+    habits = db.query(
+        Habit.id, Habit.title, Habit.difficulty, Habit.importance_weight,
+        Habit.frequency_per_week, Habit.xp, Habit.current_streak,
+        Habit.best_streak, Habit.last_done_date,
+    ).filter(
+        Habit.user_id == user.id,
+        Habit.change_seq > since,
+    ).all()
+
+    # pelo user_id do log (ix_habit_logs_user_date), sem JOIN com habits
+    logs = db.query(HabitLog.habit_id, HabitLog.date, HabitLog.done).filter(
+        owned_logs(db, user.id),
+        HabitLog.change_seq > since,
+    ).all()
+
+    achievements = db.query(
+        Achievement.id, Achievement.name, Achievement.icon, UserAchievement.unlocked_at
+    ).join(
+        UserAchievement, UserAchievement.achievement_id == Achievement.id
+    ).filter(
+        UserAchievement.user_id == user.id,
+        UserAchievement.change_seq > since,
+    ).all()
+
+    return {
+        "cursor": cursor,
+        "full": full,
+        "user": user_data,
+        "habits": [
+            {
+                "id": h.id,
+                "title": h.title,
+                "difficulty": h.difficulty,
+                "importance": h.importance_weight,
+                "frequency_per_week": h.frequency_per_week,
+                "habit_xp": h.xp,
+                "current_streak": h.current_streak,
+                "best_streak": h.best_streak,
+                "last_done_date": h.last_done_date,
+            }
+            for h in habits
+        ],
+        "logs": [{"habit_id": l.habit_id, "date": l.date, "done": l.done} for l in logs],
+        "achievements": [
+            {"id": a.id, "name": a.name, "icon": a.icon, "unlocked_at": a.unlocked_at}
+            for a in achievements
+        ],
+    }
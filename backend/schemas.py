@@ -1,5 +1,12 @@
-from pydantic import BaseModel
+from datetime import datetime
+from typing import Optional
 
+from pydantic import BaseModel, ConfigDict
+
+
+# ============================================================
+# ENTRADA
+# ============================================================
 class UserCreate(BaseModel):
     name: str
     email: str
@@ -11,15 +18,327 @@ class UserLogin(BaseModel):
 
 class HabitCreate(BaseModel):
     title: str
+    difficulty: str = "medium"        # easy | medium | hard
+    importance: int = 3               # 1–5
+    frequency: int = 7                # 1–7
+
+
+# ============================================================
+# BLOCOS COMUNS
+# ============================================================
+class MessageOut(BaseModel):
+    message: str
+
+class StatusOut(BaseModel):
+    status: str
+
+class DayDoneOut(BaseModel):
+    date: str
+    done: bool
+
+class DayPercentOut(BaseModel):
+    date: str
+    percent: float
+
+class DayOverviewOut(BaseModel):
+    date: str
+    done: int
+    total: int
+    percent: float
+
+class TodaySummaryOut(BaseModel):
+    date: str
+    total_habits: int
+    done_today: int
+    percent: float
+
+class AchievementOut(BaseModel):
+    id: str
+    name: str
+    description: str
+    icon: Optional[str] = None
+    unlocked_at: Optional[datetime] = None
+
+
+# ============================================================
+# AUTH
+# ============================================================
+class RegisterOut(BaseModel):
+    message: str
+    user_id: str
+
+class TokenPairOut(BaseModel):
+    access_token: str
+    refresh_token: str
+    token_type: str
+
+class MeOut(BaseModel):
+    id: str
+    email: str
+    username: str
+    active: bool
 
+
+# ============================================================
+# HABITS
+# ============================================================
 class HabitOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     id: str
     title: str
-    class Config:
-        orm_mode = True
 
-class HabitCreate(BaseModel):
+class HabitCreatedOut(BaseModel):
+    message: str
+    id: str
+    difficulty: str
+    importance: int
+    frequency: int
+
+class ToggleOut(BaseModel):
+    done: bool
+    xp_gained: Optional[int] = None     # só quando marca
+    xp_lost: Optional[int] = None       # só quando desmarca
+    habit_xp: int
+    current_streak: int
+    best_streak: int
+    global_xp: int
+    level: int
+    level_progress: float
+    next_level_xp: Optional[int] = None
+
+class HabitStatsOut(BaseModel):
+    habit_id: str
     title: str
-    difficulty: str = "medium"        # easy | medium | hard
-    importance: int = 3               # 1–5
-    frequency: int = 7                # 1–7
+    current_streak: int
+    best_streak: int
+    total_logs: int
+    done_logs: int
+    adherence_percent: float
+    history: list[DayDoneOut]
+
+class HabitHistoryOut(BaseModel):
+    habit_id: str
+    title: str
+    month: str
+    days_total: int
+    days_done: int
+    percent: float
+    history: list[DayDoneOut]
+
+class HabitDoneOut(BaseModel):
+    id: str
+    title: str
+    done: bool
+
+class DailySummaryOut(BaseModel):
+    date: str
+    total_habits: int
+    done_today: int
+    percent: float
+    details: list[HabitDoneOut]
+
+class MonthlyChartOut(BaseModel):
+    habit_id: str
+    title: str
+    month: str
+    days: int
+    calendar: list[DayDoneOut]
+
+class HabitAnalyticsHabitOut(BaseModel):
+    id: str
+    title: str
+    created_at: Optional[datetime] = None
+    current_streak: int
+    best_streak: int
+    total_logs: int
+    done_logs: int
+    adherence_percent: float
+
+class WeekStatsOut(BaseModel):
+    done: int
+    failed: int
+
+class HabitAnalyticsOut(BaseModel):
+    habit: HabitAnalyticsHabitOut
+    last_30_days: list[DayDoneOut]
+    week_stats: WeekStatsOut
+    common_completion_time: Optional[str] = None
+
+
+# ============================================================
+# DASHBOARD
+# ============================================================
+class DashboardUserOut(BaseModel):
+    xp_total: int
+    level: int
+    level_progress: float
+    next_level_xp: int
+
+class DashboardHabitOut(BaseModel):
+    id: str
+    title: str
+    difficulty: Optional[str] = None
+    importance: Optional[int] = None
+    frequency_per_week: Optional[int] = None
+    habit_xp: int
+    done_today: bool
+    current_streak: int
+    best_streak: int
+
+# seções opcionais: com ?fields= só as pedidas aparecem
+class DashboardOut(BaseModel):
+    user: Optional[DashboardUserOut] = None
+    today: Optional[TodaySummaryOut] = None
+    habits: Optional[list[DashboardHabitOut]] = None
+    week_summary: Optional[list[DayPercentOut]] = None
+    achievements: Optional[list[AchievementOut]] = None
+
+
+# ============================================================
+# PROGRESS
+# ============================================================
+class ProgressUserOut(BaseModel):
+    xp_total: int
+    level: int
+    level_progress: float
+
+class TopHabitOut(BaseModel):
+    title: str
+    streak: int
+
+class GlobalStreaksOut(BaseModel):
+    best_global_streak: int
+    average_streak: float
+    top_habits: list[TopHabitOut]
+
+class ProgressOut(BaseModel):
+    user: Optional[ProgressUserOut] = None
+    today: Optional[TodaySummaryOut] = None
+    streaks: Optional[GlobalStreaksOut] = None
+    week_summary: Optional[list[DayPercentOut]] = None
+    achievements: Optional[list[AchievementOut]] = None
+
+class MonthlyOverviewOut(BaseModel):
+    month: str
+    total_days: int
+    perfect_days: int
+    days: list[DayOverviewOut]
+
+class WeeklyOverviewOut(BaseModel):
+    week_start: str
+    week_end: str
+    total_habits: int
+    days: list[DayOverviewOut]
+    perfect_days: int
+    week_completion_percent: float
+
+class FullHistoryOut(BaseModel):
+    start: Optional[str] = None
+    end: Optional[str] = None
+    total_days: int
+    perfect_days: int
+    timeline: list[DayOverviewOut]
+
+class WeekdayPercentOut(BaseModel):
+    day: str
+    percent: float
+
+class HabitPercentOut(BaseModel):
+    id: str
+    title: str
+    percent: float
+
+class HabitDifficultyOut(BaseModel):
+    easiest: HabitPercentOut
+    hardest: HabitPercentOut
+
+class RollingPercentOut(BaseModel):
+    date: str
+    rolling_percent: float
+
+class StreakAveragesOut(BaseModel):
+    average_current: float
+    average_best: float
+
+class InsightsOut(BaseModel):
+    consistency_score: float
+    days_of_week: list[WeekdayPercentOut]
+    best_day: WeekdayPercentOut
+    worst_day: WeekdayPercentOut
+    habit_difficulty: HabitDifficultyOut
+    rolling_average: list[RollingPercentOut]
+    streaks: StreakAveragesOut
+    perfect_days_last_30: int
+    completion_last_30_percent: float
+
+
+# ============================================================
+# SYNC (delta por change_seq)
+# ============================================================
+class SyncHabitOut(BaseModel):
+    id: str
+    title: str
+    difficulty: Optional[str] = None
+    importance: Optional[int] = None
+    frequency_per_week: Optional[int] = None
+    habit_xp: int
+    current_streak: int
+    best_streak: int
+    last_done_date: Optional[str] = None
+
+class SyncLogOut(BaseModel):
+    habit_id: str
+    date: str
+    done: bool
+
+class SyncAchievementOut(BaseModel):
+    id: str
+    name: str
+    icon: Optional[str] = None
+    unlocked_at: Optional[datetime] = None
+
+class SyncOut(BaseModel):
+    cursor: int                         # mandar como ?since= na próxima
+    full: bool                          # True → substituir o estado local
+    user: Optional[DashboardUserOut] = None
+    habits: list[SyncHabitOut]
+    logs: list[SyncLogOut]
+    achievements: list[SyncAchievementOut]
+
+
+# ============================================================
+# FORMATO COMPACTO (?format=bits — services/bitpack.py)
+# ============================================================
+class BitSeriesOut(BaseModel):
+    start: str                          # dia do bit 0
+    days: int
+    bits: str                           # base64; bit i (LSB primeiro) = dia start+i feito
+
+class HabitBitsOut(BaseModel):
+    habit_id: str
+    title: str
+    series: BitSeriesOut
+
+class HabitHistoryBitsOut(BaseModel):
+    habit_id: str
+    title: str
+    month: str
+    days_total: int
+    days_done: int
+    percent: float
+    history: BitSeriesOut
+
+class MonthlyChartBitsOut(BaseModel):
+    habit_id: str
+    title: str
+    month: str
+    days: int
+    calendar: BitSeriesOut
+
+class FullHistoryBitsOut(BaseModel):
+    start: Optional[str] = None
+    end: Optional[str] = None
+    total_days: int
+    perfect_days: int
+    habits: list[HabitBitsOut]          # grade hábito × dia numa resposta só
@@ -1,6 +1,17 @@
-from models import Achievement, UserAchievement
+import logging
+import uuid
+
+from database import SessionLocal
+from models import Achievement, Habit, HabitLog, UserAchievement
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 
+from services import live_updates
+from services.change_seq import next_change_seq
+from services.data_loader import owned_logs
+from services.metrics import timed
+
+logger = logging.getLogger("discipline.achievements")
 
 DEFAULT_ACHIEVEMENTS = [
     {
@@ -34,6 +45,15 @@ DEFAULT_ACHIEVEMENTS = [
 ]
 
 
+# ids determinísticos (uuid5 do nome): a mesma conquista tem o mesmo id
+# em todo shard, e user_achievements pode ser copiado entre eles
+_ACHIEVEMENT_NS = uuid.uuid5(uuid.NAMESPACE_URL, "discipline/achievements")
+
+
+def default_achievement_id(name: str) -> str:
+    return str(uuid.uuid5(_ACHIEVEMENT_NS, name))
+
+
 def create_default_achievements(db: Session):
 
     # Se já existem conquistas, não cria novamente
@@ -43,6 +63,7 @@ def create_default_achievements(db: Session):
     # Criar conquistas padrão
     for item in DEFAULT_ACHIEVEMENTS:
         db.add(Achievement(
+            id=default_achievement_id(item["name"]),
             name=item["name"],
             description=item["description"],
             icon=item["icon"],
@@ -53,14 +74,30 @@ def create_default_achievements(db: Session):
     db.commit()
 
 
-def check_achievements(user, streak, habits_completed_today, perfect_day, db: Session):
+@timed("achievement_engine.check_achievements")
+def check_achievements(user, streak, habits_completed_today, perfect_day, db: Session, xp_total=None):
+    """
+    xp_total: valor vindo do banco (RETURNING do toggle); o padrão é o do
+    objeto, que pode estar defasado depois de incrementos em SQL.
+    """
+    if xp_total is None:
+        xp_total = user.xp_total
+    return _unlock(db, user.id, streak, habits_completed_today, perfect_day, xp_total)
+
 
+def _unlock(db: Session, user_id: str, streak, habits_completed_today, perfect_day, xp_total) -> list:
     unlocked = []
 
-    all_achs = db.query(Achievement).all()
-    user_achs = {ua.achievement_id for ua in user.achievements}
+    def owned():
+        return {
+            achievement_id for (achievement_id,) in
+            db.query(UserAchievement.achievement_id).filter(UserAchievement.user_id == user_id)
+        }
 
-    for ach in all_achs:
+    user_achs = owned()
+    candidates = []
+
+    for ach in db.query(Achievement).all():
 
         # já desbloqueou?
         if ach.id in user_achs:
@@ -75,18 +112,60 @@ def check_achievements(user, streak, habits_completed_today, perfect_day, db: Se
         elif ach.condition_type == "habit_completion" and habits_completed_today >= ach.condition_value:
             unlock = True
 
-        elif ach.condition_type == "xp_total" and user.xp_total >= ach.condition_value:
+        elif ach.condition_type == "xp_total" and xp_total >= ach.condition_value:
             unlock = True
 
         elif ach.condition_type == "perfect_day" and perfect_day:
             unlock = True
 
         if unlock:
+            candidates.append(ach)
+
+    if candidates:
+        # trava o usuário e relê: dois toggles simultâneos não desbloqueiam
+        # a mesma conquista duas vezes
+        seq = next_change_seq(db, user_id)
+        user_achs = owned()
+        for ach in candidates:
+            if ach.id in user_achs:
+                continue
             db.add(UserAchievement(
-                user_id=user.id,
-                achievement_id=ach.id
+                user_id=user_id,
+                achievement_id=ach.id,
+                change_seq=seq,
             ))
-            unlocked.append(ach.name)
+            # copia antes do commit (que expira os objetos)
+            unlocked.append({"id": ach.id, "name": ach.name, "icon": ach.icon})
 
     db.commit()
-    return unlocked
+
+    for ach in unlocked:
+        live_updates.publish(user_id, "achievement_unlocked", **ach)
+
+    return [ach["name"] for ach in unlocked]
+
+
+def check_after_toggle(user_id: str, today: str, streak: int, xp_total: int, shard: str = None) -> list:
+    """
+    Conquistas depois de MARCAR um hábito (desmarcar nunca desbloqueia
+    nada). Roda como background task da rota do toggle, depois da resposta,
+    numa sessão própria: o request do toggle não paga as contagens, as
+    leituras de conquistas nem o segundo commit, e no modo coalescido a
+    conexão liberada pelo toggle continua liberada. Best-effort: o toggle
+    já está gravado, uma falha aqui só vai para o log.
+    """
+    db = SessionLocal()
+    if shard is not None:
+        db.use_shard(shard)
+    try:
+        completed = db.query(func.count(HabitLog.id)).filter(
+            owned_logs(db, user_id), HabitLog.date == today, HabitLog.done.is_(True),
+        ).scalar()
+        total = db.query(func.count(Habit.id)).filter(Habit.user_id == user_id).scalar()
+        return _unlock(db, user_id, streak, completed, total > 0 and completed >= total, xp_total)
+    except Exception:
+        db.rollback()
+        logger.exception("checagem de conquistas falhou")
+        return []
+    finally:
+        db.close()
@@ -0,0 +1,172 @@
+# services/aggregate_cache.py
+#
+# Cache persistente dos agregados de meses FECHADOS (anteriores ao mês
+# atual no fuso do Brasil). Mês passado quase não muda, mas monthly_overview,
+# monthly_chart e history recalculavam tudo dos logs a cada request.
+#
+#   chave:  (user_id, kind, habit_id, month)   habit_id = "" → usuário inteiro
+#   kinds:  monthly_overview → {"done": [feitos no dia 1, dia 2, ...]}
+#           habit_month      → {"logs": [[date, done], ...]}  (history + chart)
+#
+# - construído na primeira leitura (get_or_build); mês aberto nunca entra
+# - o que depende de estado vivo (título, nº de hábitos) fica fora do cache:
+#   o handler junta na hora
+# - o toggle só grava o dia de hoje; o único jeito de ele cair num mês
+#   fechado é a virada do mês entre o today_brazil_str() e o commit. Por
+#   isso a rota chama invalidate() DEPOIS do commit (no mês aberto não
+#   custa nem query). Escrita fora da API (import, correção manual):
+#   `manage.py clear-aggregates`.
+#
+# HTTP (cache_response): meses fechados saem com ETag e Cache-Control
+# `private, no-cache` — o corpo tem campos vivos (total de hábitos,
+# títulos), então o cliente guarda mas revalida sempre; sem mudança a
+# resposta é um 304 sem corpo. Vary: Accept (formato bits) e
+# Authorization (mesmo navegador, outro usuário não reaproveita).
+import hashlib
+import json
+import logging
+import os
+
+from fastapi import HTTPException
+from fastapi.responses import Response
+from sqlalchemy import bindparam, delete, select
+
+from database import dialect_insert
+from models import AggregateCache
+from services.metrics import registry
+from services.timezone import now_brazil
+
+AGGREGATE_CACHE_ENABLED = os.getenv("AGGREGATE_CACHE_ENABLED", "1").strip() == "1"
+
+# meses aceitos nas rotas (parse_month)
+MIN_YEAR = 2000
+MAX_YEAR = 2100
+
+MONTHLY_OVERVIEW = "monthly_overview"
+HABIT_MONTH = "habit_month"
+
+logger = logging.getLogger("discipline.aggregate_cache")
+
+cache = AggregateCache.__table__
+
+aggregate_reads = registry.counter(
+    "aggregate_cache_reads_total", "Leituras de agregados de meses fechados",
+    labels=("kind", "result"),
+)
+
+_GET = select(cache.c.payload).where(
+    cache.c.user_id == bindparam("b_user_id"),
+    cache.c.kind == bindparam("b_kind"),
+    cache.c.habit_id == bindparam("b_habit_id"),
+    cache.c.month == bindparam("b_month"),
+)
+
+
+def parse_month(month: str) -> tuple:
+    """
+    "YYYY-MM" do query param → (ano, mês), ou 400. Toda rota que usa o
+    mês como chave do cache passa por aqui ANTES de ler/gravar: mês 13 ou
+    ano 9999 não viram linha nova na tabela (nem 500 no calendar).
+    """
+    try:
+        year, mon = map(int, month.split("-"))
+    except ValueError:
+        raise HTTPException(400, "Formato inválido. Use YYYY-MM")
+    if not (1 <= mon <= 12 and MIN_YEAR <= year <= MAX_YEAR):
+        raise HTTPException(400, f"Mês fora do intervalo ({MIN_YEAR}-01 a {MAX_YEAR}-12)")
+    return year, mon
+
+
+def is_closed(month: str) -> bool:
+    """month = "YYYY-MM" (com zero à esquerda)."""
+    return month < now_brazil().strftime("%Y-%m")
+
+
+# ============================================================
+# LEITURA
+# ============================================================
+def get_or_build(db, user_id: str, kind: str, month: str, build, habit_id: str = ""):
+    """
+    Agregado do cache se o mês está fechado; senão (ou na falta) build().
+    O valor precisa ser JSON (listas, não tuplas, se a forma importar).
+    """
+    if not AGGREGATE_CACHE_ENABLED or not is_closed(month):
+        return build()
+
+    params = {"b_user_id": user_id, "b_kind": kind, "b_habit_id": habit_id, "b_month": month}
+    raw = db.execute(_GET, params).scalar()
+    if raw is not None:
+        aggregate_reads.inc(kind, "hit")
+        return json.loads(raw)
+
+    aggregate_reads.inc(kind, "miss")
+    value = build()
+
+    # conexão própria: um commit na sessão do request expiraria os objetos
+    # já carregados (user, hábito) e custaria queries de refresh
+    bind = db.get_bind()
+    stmt = dialect_insert(bind.dialect.name)(cache).values(
+        user_id=user_id, kind=kind, habit_id=habit_id, month=month,
+        payload=json.dumps(value, separators=(",", ":")),
+    ).on_conflict_do_nothing()
+    try:
+        with bind.begin() as conn:
+            conn.execute(stmt)
+    except Exception:
+        # cache é otimização: a leitura não falha por causa dele
+        logger.exception("falha ao gravar agregado %s %s", kind, month)
+    return value
+
+
+# ============================================================
+# INVALIDAÇÃO
+# ============================================================
+def invalidate(bind, user_id: str, dates, habit_id: str = None) -> int:
+    """
+    Depois do commit de uma escrita em `dates` ("YYYY-MM-DD"): apaga os
+    agregados dos meses fechados tocados, em transação própria. Com
+    habit_id, só os do hábito + os do usuário. Dias do mês aberto não
+    custam nada (nem query).
+    """
+    months = {d[:7] for d in dates if is_closed(d[:7])}
+    if not months:
+        return 0
+
+    stmt = delete(cache).where(cache.c.user_id == user_id, cache.c.month.in_(months))
+    if habit_id is not None:
+        stmt = stmt.where(cache.c.habit_id.in_([habit_id, ""]))
+    with bind.begin() as conn:
+        return conn.execute(stmt).rowcount
+
+
+def clear(bind, user_id: str = None, month: str = None) -> int:
+    stmt = delete(cache)
+    if user_id:
+        stmt = stmt.where(cache.c.user_id == user_id)
+    if month:
+        stmt = stmt.where(cache.c.month == month)
+    with bind.begin() as conn:
+        return conn.execute(stmt).rowcount
+
+
+# ============================================================
+# HTTP
+# ============================================================
+def cache_response(request, response: Response, month: str) -> Response:
+    """Cache-Control/ETag para mês fechado; 304 se o cliente já tem a versão."""
+    if not is_closed(month):
+        return response
+
+    # fraco: a compressão muda os bytes, não a representação
+    etag = 'W/"' + hashlib.blake2b(response.body, digest_size=12).hexdigest() + '"'
+    headers = {
+        "Cache-Control": "private, no-cache",
+        "ETag": etag,
+        "Vary": "Accept, Authorization",
+    }
+
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+
+    response.headers.update(headers)
+    return response
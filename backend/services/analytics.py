@@ -0,0 +1,210 @@
+# services/analytics.py
+#
+# Estágio de CPU dos endpoints de análise, separado do acesso ao banco.
+# Funções puras sobre primitivos (tuplas/str/int): rodam no processo
+# do compute_pool sem ORM nem sessão, e o pickle de ida/volta é barato.
+# Não importar nada pesado aqui — o worker importa este módulo ao subir.
+#
+#   habits: [(id, title, current_streak, best_streak)]  (insights)
+#           [(id, title)]                               (grade de bits)
+#   logs:   [(habit_id, date, done)]
+from collections import defaultdict
+from datetime import date, timedelta
+
+from services.bitpack import pack
+
+_WEEK_NAMES = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+
+# ============================================================
+# FULL HISTORY
+# ============================================================
+def full_history(total_habits: int, logs: list, today: str) -> dict:
+    first_date = min(date.fromisoformat(d) for _, d, _ in logs)
+    last_date = date.fromisoformat(today)
+
+    log_map = {}
+    for _, d, done in logs:
+        log_map.setdefault(d, []).append(done)
+
+    timeline = []
+    perfect_days = 0
+
+    for i in range((last_date - first_date).days + 1):
+        ds = (first_date + timedelta(days=i)).strftime("%Y-%m-%d")
+        done = log_map.get(ds, []).count(True)
+
+        if done == total_habits and total_habits > 0:
+            perfect_days += 1
+
+        timeline.append({
+            "date": ds,
+            "done": done,
+            "total": total_habits,
+            "percent": round((done / total_habits * 100) if total_habits else 0, 2)
+        })
+
+    return {
+        "start": first_date.strftime("%Y-%m-%d"),
+        "end": last_date.strftime("%Y-%m-%d"),
+        "total_days": len(timeline),
+        "perfect_days": perfect_days,
+        "timeline": timeline
+    }
+
+
+def full_history_grid(habits: list, logs: list, today: str) -> dict:
+    """Mesmo recorte do full_history, com um bitmap por hábito (?format=bits)."""
+    summary = full_history(len(habits), logs, today)
+
+    done_by_habit = {habit_id: [] for habit_id, _ in habits}
+    for habit_id, d, done in logs:
+        if done and habit_id in done_by_habit:
+            done_by_habit[habit_id].append(d)
+
+    return {
+        "start": summary["start"],
+        "end": summary["end"],
+        "total_days": summary["total_days"],
+        "perfect_days": summary["perfect_days"],
+        "habits": [
+            {"habit_id": habit_id, "title": title,
+             "series": pack(summary["start"], summary["total_days"], done_by_habit[habit_id])}
+            for habit_id, title in habits
+        ],
+    }
+
+
+# ============================================================
+# INSIGHTS
+# ============================================================
+def insights(habits: list, logs: list, today: str) -> dict:
+    logs_by_habit = defaultdict(list)
+    logs_by_day = defaultdict(list)
+    logs_last_30 = []
+
+    last_30 = (date.fromisoformat(today) - timedelta(days=30)).strftime("%Y-%m-%d")
+
+    for log in logs:
+        habit_id, d, done = log
+        logs_by_habit[habit_id].append(done)
+        logs_by_day[d].append(done)
+        if d >= last_30:
+            logs_last_30.append(done)
+
+    # ---------------------------------------------------------
+    # 1️⃣ CONSISTENCY SCORE
+    # ---------------------------------------------------------
+    pct_30 = (logs_last_30.count(True) / len(logs_last_30)) * 100 if logs_last_30 else 0
+
+    avg_current_streak = sum(h[2] for h in habits) / len(habits)
+    avg_best_streak = sum(h[3] for h in habits) / len(habits)
+
+    streak_score = min((avg_current_streak / (avg_best_streak + 0.0001)) * 100, 100) if avg_best_streak else 0
+
+    perfect_days = sum(
+        1 for values in logs_by_day.values()
+        if values and values.count(True) == len(values)
+    )
+    perfect_days_pct = min((perfect_days / 30) * 100, 100)
+
+    consistency_score = round(
+        (pct_30 * 0.5) + (streak_score * 0.3) + (perfect_days_pct * 0.2),
+        2
+    )
+
+    # ---------------------------------------------------------
+    # 2️⃣ MELHOR / PIOR DIA DA SEMANA
+    # ---------------------------------------------------------
+    week_map = defaultdict(lambda: {"done": 0, "total": 0})
+    for d, values in logs_by_day.items():
+        weekday = date.fromisoformat(d).weekday()
+        week_map[weekday]["total"] += len(values)
+        week_map[weekday]["done"] += values.count(True)
+
+    week_stats = []
+    for wd in range(7):
+        total = week_map[wd]["total"]
+        pct = (week_map[wd]["done"] / total * 100) if total else 0
+        week_stats.append({"day": _WEEK_NAMES[wd], "percent": round(pct, 2)})
+
+    # ---------------------------------------------------------
+    # 3️⃣ HÁBITO MAIS FÁCIL / MAIS DIFÍCIL
+    # ---------------------------------------------------------
+    habit_performance = []
+    for habit_id, title, _, _ in habits:
+        values = logs_by_habit[habit_id]
+        pct = (values.count(True) / len(values) * 100) if values else 0
+        habit_performance.append({"id": habit_id, "title": title, "percent": pct})
+
+    # ---------------------------------------------------------
+    # 4️⃣ ROLLING AVERAGE (janela de 7 dias com registro)
+    # ---------------------------------------------------------
+    all_dates = sorted(logs_by_day)
+    rolling = []
+    window = 7
+    done_sum = total_sum = 0
+
+    for i, d in enumerate(all_dates):
+        done_sum += logs_by_day[d].count(True)
+        total_sum += len(logs_by_day[d])
+        if i >= window:
+            old = logs_by_day[all_dates[i - window]]
+            done_sum -= old.count(True)
+            total_sum -= len(old)
+
+        pct = (done_sum / total_sum * 100) if total_sum else 0
+        rolling.append({"date": d, "rolling_percent": round(pct, 2)})
+
+    return {
+        "consistency_score": consistency_score,
+        "days_of_week": week_stats,
+        "best_day": max(week_stats, key=lambda x: x["percent"]),
+        "worst_day": min(week_stats, key=lambda x: x["percent"]),
+        "habit_difficulty": {
+            "easiest": max(habit_performance, key=lambda x: x["percent"]),
+            "hardest": min(habit_performance, key=lambda x: x["percent"])
+        },
+        "rolling_average": rolling,
+        "streaks": {
+            "average_current": round(avg_current_streak, 2),
+            "average_best": round(avg_best_streak, 2)
+        },
+        "perfect_days_last_30": perfect_days,
+        "completion_last_30_percent": round(pct_30, 2)
+    }
+
+
+# ============================================================
+# ANALYTICS DE UM HÁBITO
+#   logs: [(date, done)]
+# ============================================================
+def habit_analytics(logs: list, today: str) -> dict:
+    total_logs = len(logs)
+    done_logs = sum(1 for _, done in logs if done)
+
+    last_30 = (date.fromisoformat(today) - timedelta(days=30)).strftime("%Y-%m-%d")
+    last_30_days = [{"date": d, "done": done} for d, done in logs if d >= last_30]
+
+    # sequências a partir do log mais recente ("YYYY-MM-DD" ordena como data)
+    recent_first = sorted(logs, key=lambda l: l[0], reverse=True)
+
+    streak_done = 0
+    for _, done in recent_first:
+        if not done:
+            break
+        streak_done += 1
+
+    streak_failed = 0
+    for _, done in recent_first:
+        if done:
+            break
+        streak_failed += 1
+
+    return {
+        "total_logs": total_logs,
+        "done_logs": done_logs,
+        "adherence_percent": round((done_logs / total_logs * 100) if total_logs else 0, 2),
+        "last_30_days": last_30_days,
+        "week_stats": {"done": streak_done, "failed": streak_failed},
+    }
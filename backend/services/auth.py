@@ -2,44 +2,50 @@
 from datetime import datetime, timedelta
 from fastapi import HTTPException
 from sqlalchemy.orm import Session
-from passlib.context import CryptContext
 
-from models_auth import AuthUser, RefreshToken
+from models_auth import AuthUser, RefreshToken, generate_uuid
+from services import sharding
+from services.password import hash_password, verify_password
 from services.jwt_token import (
     create_access_token,
     create_refresh_token,
+    decode_token,
     REFRESH_EXPIRE_DAYS,
 )
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-
-def _hash_password(password: str) -> str:
-    return pwd_context.hash(password)
-
-
-def _verify_password(password: str, hashed: str) -> bool:
-    return pwd_context.verify(password, hashed)
-
+from services.revocation import revoke_payload
 
 # ============================================================
 # REGISTER
+# - email/username são únicos no diretório (todos os shards)
+# - o diretório decide o shard; a conta é criada lá
 # ============================================================
 def register_user(db: Session, email: str, username: str, password: str) -> AuthUser:
-    exists = db.query(AuthUser).filter(
-        (AuthUser.email == email) | (AuthUser.username == username)
-    ).first()
-    if exists:
+    # antes do bcrypt: não gasta CPU com cadastro repetido
+    if sharding.identity_taken(email, username):
         raise HTTPException(400, "Email ou username já existe")
 
+    password_hash = hash_password(password)
+
+    user_id = generate_uuid()
+    shard = sharding.claim_identity(user_id, email, username)
+    if shard is None:
+        raise HTTPException(400, "Email ou username já existe")
+
+    db.use_shard(shard)
     user = AuthUser(
+        id=user_id,
         email=email,
         username=username,
-        password_hash=_hash_password(password),
+        password_hash=password_hash,
         is_active=True
     )
-    db.add(user)
-    db.commit()
+    try:
+        db.add(user)
+        db.commit()
+    except Exception:
+        db.rollback()
+        sharding.release_identity(user_id)
+        raise
     db.refresh(user)
     return user
 
@@ -50,11 +56,14 @@ def register_user(db: Session, email: str, username: str, password: str) -> Auth
 # - cria refresh token e salva no banco (sessão)
 # ============================================================
 def login_user(db: Session, identifier: str, password: str):
-    user = db.query(AuthUser).filter(
-        (AuthUser.email == identifier) | (AuthUser.username == identifier)
-    ).first()
-
-    if not user or not _verify_password(password, user.password_hash):
+    # email/username → (user_id, shard) pelo diretório global
+    entry = sharding.lookup_identifier(identifier)
+    user = None
+    if entry is not None:
+        db.use_shard(entry.shard)
+        user = db.query(AuthUser).filter(AuthUser.id == entry.user_id).first()
+
+    if not user or not verify_password(password, user.password_hash):
         raise HTTPException(401, "Credenciais inválidas")
 
     if not user.is_active:
@@ -89,6 +98,11 @@ def login_user(db: Session, identifier: str, password: str):
 # - devolve novo access + novo refresh
 # ============================================================
 def refresh_access(db: Session, refresh_token: str):
+    shard = sharding.shard_of_refresh_token(refresh_token)
+    if shard is None:
+        raise HTTPException(401, "Refresh token inválido")
+    db.use_shard(shard)
+
     rt = db.query(RefreshToken).filter(RefreshToken.token == refresh_token).first()
     if not rt:
         raise HTTPException(401, "Refresh token inválido")
@@ -133,8 +147,22 @@ def refresh_access(db: Session, refresh_token: str):
 # ============================================================
 # LOGOUT
 # - revoga refresh token
+# - revoga o access token enviado (se houver): deixa de valer já,
+#   não só no exp
 # ============================================================
-def logout(db: Session, refresh_token: str):
+def logout(db: Session, refresh_token: str, access_token: str = None):
+    if access_token:
+        try:
+            revoke_payload(decode_token(access_token))
+        except HTTPException:
+            # expirado/inválido/já revogado: nada a revogar
+            pass
+
+    shard = sharding.shard_of_refresh_token(refresh_token)
+    if shard is None:
+        return {"message": "Logout ok"}
+    db.use_shard(shard)
+
     rt = db.query(RefreshToken).filter(RefreshToken.token == refresh_token).first()
     if not rt:
         # logout idempotente: não precisa “quebrar” se já não existe
@@ -0,0 +1,46 @@
+# services/bitpack.py
+#
+# Formato compacto para calendários/históricos (opt-in):
+#   ?format=bits   ou   Accept: application/vnd.discipline.bits+json
+#
+# Em vez de um {"date": ..., "done": ...} por dia, cada série vira
+#   {"start": "YYYY-MM-DD", "days": N, "bits": "<base64>"}
+# onde o bit i (LSB primeiro dentro de cada byte) = dia start+i feito.
+# Um ano de um hábito cabe em 46 bytes (64 chars de base64).
+#
+# Decodificação no cliente (JS):
+#   const raw = atob(s.bits);
+#   const done = i => (raw.charCodeAt(i >> 3) >> (i & 7)) & 1;
+#   // dia i = new Date(s.start) + i dias
+import base64
+from datetime import date, timedelta
+
+BITS_MEDIA_TYPE = "application/vnd.discipline.bits+json"
+
+
+def wants_bits(request, format) -> bool:
+    """?format=bits vence; senão negocia pelo Accept."""
+    if format:
+        return format == "bits"
+    return BITS_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def pack(start: str, days: int, done_dates) -> dict:
+    """Série de `days` dias a partir de `start`; done_dates fora dela é ignorado."""
+    first = date.fromisoformat(start)
+    bitmap = bytearray((days + 7) // 8)
+    for ds in done_dates:
+        i = (date.fromisoformat(ds) - first).days
+        if 0 <= i < days:
+            bitmap[i >> 3] |= 1 << (i & 7)
+    return {"start": start, "days": days, "bits": base64.b64encode(bitmap).decode("ascii")}
+
+
+def unpack(series: dict) -> list:
+    """Inverso do pack: [(date, done)] — referência para clientes Python."""
+    first = date.fromisoformat(series["start"])
+    bitmap = base64.b64decode(series["bits"])
+    return [
+        ((first + timedelta(days=i)).strftime("%Y-%m-%d"), bool(bitmap[i >> 3] >> (i & 7) & 1))
+        for i in range(series["days"])
+    ]
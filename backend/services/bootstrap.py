@@ -0,0 +1,206 @@
+# services/bootstrap.py
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import inspect, text
+from sqlalchemy.orm import Session
+
+from database import Base, all_engines, engine
+
+# chave fixa do advisory lock do Postgres (qualquer int64 serve)
+_INIT_LOCK_KEY = 7_204_311
+
+_lock = threading.Lock()
+_ready = False
+
+
+@contextmanager
+def _init_lock(conn):
+    """
+    Serializa o init entre workers/instâncias.
+    - Postgres: advisory lock da transação (liberado no commit)
+    - SQLite: uso local/dev, o lock do processo já basta
+    """
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _INIT_LOCK_KEY})
+    yield
+
+
+# ============================================================
+# INIT (schema + seeds) — one-shot, idempotente
+# ============================================================
+def init_database(backfill: bool = True):
+    """
+    Cria as tabelas e as conquistas padrão em cada banco (home + shards).
+    Roda uma vez por processo (lifespan) ou via `python manage.py init-db`.
+    """
+    global _ready
+
+    # registra todos os mappers antes do create_all
+    import models  # noqa: F401
+    from services.achievement_engine import create_default_achievements
+
+    with _lock:
+        if _ready:
+            return
+
+        # schema completo em todos: o diretório só é usado no home, mas um
+        # shard pode virar home (e as conquistas existem em cada shard)
+        for bind in all_engines():
+            with bind.begin() as conn:
+                with _init_lock(conn):
+                    Base.metadata.create_all(bind=conn)
+                    _upgrade_schema(conn)
+
+                    db = Session(bind=conn)
+                    try:
+                        create_default_achievements(db)
+                    finally:
+                        db.close()
+
+        # fora da transação do init: lotes curtos, cada um com seu commit
+        if backfill:
+            from services.sharding import backfill_directory
+
+            for bind in all_engines():
+                backfill_log_user_ids(bind=bind)
+            backfill_directory()
+
+        _ready = True
+
+
+# ============================================================
+# UPGRADES — o create_all não mexe em tabelas que já existem
+# ============================================================
+def _upgrade_schema(conn):
+    _ensure_habit_log_unique_index(conn)
+    _ensure_change_seq(conn)
+    _ensure_habit_log_user_id(conn)
+    _ensure_habit_event_user_index(conn)
+
+
+def _add_missing_columns(conn, table: str, columns: dict):
+    existing = {c["name"] for c in inspect(conn).get_columns(table)}
+    for name, ddl in columns.items():
+        if name not in existing:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}"))
+
+
+def _ensure_change_seq(conn):
+    for table in ("auth_users", "habits", "habit_logs", "user_achievements"):
+        _add_missing_columns(conn, table, {"change_seq": "INTEGER NOT NULL DEFAULT 0"})
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_habits_user_seq ON habits (user_id, change_seq)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_habit_logs_habit_seq ON habit_logs (habit_id, change_seq)"))
+
+
+def _ensure_habit_log_user_id(conn):
+    _add_missing_columns(conn, "habit_logs", {"user_id": "VARCHAR REFERENCES auth_users(id)"})
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_habit_logs_user_date ON habit_logs (user_id, date)"))
+
+
+def _ensure_habit_event_user_index(conn):
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_habit_events_user ON habit_events (user_id, id)"))
+
+
+def _ensure_habit_log_unique_index(conn):
+    """
+    Bancos antigos podem ter logs duplicados no mesmo dia (toggle
+    concorrente). Mantém um por (habit_id, date) — o feito, se houver —
+    e só então cria o índice único.
+    """
+    indexes = {ix["name"] for ix in inspect(conn).get_indexes("habit_logs")}
+    if "ux_habit_logs_habit_date" in indexes:
+        return
+
+    conn.execute(text("""
+        DELETE FROM habit_logs WHERE id IN (
+            SELECT id FROM (
+                SELECT id, ROW_NUMBER() OVER (
+                    PARTITION BY habit_id, date ORDER BY done DESC, id
+                ) AS rn
+                FROM habit_logs
+            ) ranked
+            WHERE rn > 1
+        )
+    """))
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_habit_logs_habit_date "
+        "ON habit_logs (habit_id, date)"
+    ))
+
+
+# ============================================================
+# BACKFILLS — dados de colunas novas, em lotes
+# ============================================================
+# só logs cujo hábito existe: órfão fica NULL e, sem o JOIN, voltaria em
+# todo lote (com batch órfãos o loop nunca terminaria)
+_BACKFILL_LOG_USER_IDS = text("""
+    UPDATE habit_logs
+    SET user_id = (SELECT habits.user_id FROM habits WHERE habits.id = habit_logs.habit_id)
+    WHERE habit_logs.id IN (
+        SELECT l.id FROM habit_logs l JOIN habits h ON h.id = l.habit_id
+        WHERE l.user_id IS NULL
+        LIMIT :batch
+    )
+""")
+_PENDING_LOG_USER_IDS = text("""
+    SELECT l.id FROM habit_logs l JOIN habits h ON h.id = l.habit_id
+    WHERE l.user_id IS NULL
+    LIMIT 1
+""")
+
+# sem DB_AUTO_INIT o backfill roda fora do processo: reconfere a cada N s
+LOG_USER_IDS_RECHECK_S = float(os.getenv("LOG_USER_IDS_RECHECK_S", "60"))
+
+_log_user_ids_done = set()   # engines com habit_logs.user_id completo
+_log_user_ids_checked = {}   # engine -> instante da última conferência
+
+
+def backfill_log_user_ids(batch_size: int = 10_000, log=None, bind=engine) -> int:
+    """
+    Preenche habit_logs.user_id dos logs anteriores à coluna.
+    Um commit por lote: nenhuma transação longa segurando locks, e pode
+    ser interrompido/retomado. Sem pendências custa uma busca no índice.
+    """
+    filled = 0
+    while True:
+        with bind.begin() as conn:
+            updated = conn.execute(_BACKFILL_LOG_USER_IDS, {"batch": batch_size}).rowcount
+        filled += updated
+        if updated and log:
+            log(f"  {filled} logs preenchidos")
+        if updated < batch_size:
+            _log_user_ids_done.add(bind)
+            return filled
+
+
+def log_user_ids_complete(bind) -> bool:
+    """
+    True quando todo log (de hábito existente) em `bind` tem user_id. Até
+    lá, as leituras por usuário incluem os NULL pelo habit_id. Depois de
+    True não volta a consultar: inserts novos sempre gravam o user_id.
+    """
+    if bind in _log_user_ids_done:
+        return True
+    now = time.monotonic()
+    last = _log_user_ids_checked.get(bind)
+    if last is not None and now - last < LOG_USER_IDS_RECHECK_S:
+        return False
+    _log_user_ids_checked[bind] = now
+    with bind.connect() as conn:
+        pending = conn.execute(_PENDING_LOG_USER_IDS).first() is not None
+    if not pending:
+        _log_user_ids_done.add(bind)
+    return not pending
+
+
+def mark_ready():
+    """Schema gerenciado fora do processo (ex: init-db no deploy)."""
+    global _ready
+    _ready = True
+
+
+def is_ready() -> bool:
+    return _ready
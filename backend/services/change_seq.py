@@ -0,0 +1,22 @@
+# services/change_seq.py
+#
+# Sequência de mudanças por usuário, base do GET /sync.
+# Toda escrita começa com next_change_seq(): o UPDATE trava a linha do
+# usuário (escritas do mesmo usuário ficam em fila) e devolve o valor que
+# a transação carimba em cada linha que alterar.
+from sqlalchemy import bindparam, update
+
+from models_auth import AuthUser
+
+users = AuthUser.__table__
+
+_BUMP = (
+    update(users)
+    .where(users.c.id == bindparam("b_user_id"))
+    .values(change_seq=users.c.change_seq + 1)
+    .returning(users.c.change_seq)
+)
+
+
+def next_change_seq(db, user_id: str) -> int:
+    return db.execute(_BUMP, {"b_user_id": user_id}).scalar_one()
@@ -0,0 +1,152 @@
+# services/compute_pool.py
+#
+# Pool de processos para o estágio de CPU dos endpoints de análise
+# (insights, full_history, analytics do hábito). O handler busca os dados
+# no banco, reduz a primitivos e manda a função de services/analytics.py
+# para cá: o Python puro roda fora do GIL do worker e os requests baratos
+# não disputam CPU com ele.
+#
+# - limitado: até COMPUTE_MAX_PENDING tarefas (rodando + na fila); acima
+#   disso 503 + Retry-After, como o load shedding
+# - timeout por tarefa (COMPUTE_TASK_TIMEOUT_S): 504; se ainda estava na
+#   fila, a tarefa é cancelada. Uma que já começou termina no worker e só
+#   então libera a vaga — o limite vale mesmo para as abandonadas.
+# - worker que morre quebra o executor (BrokenProcessPool): ele é trocado
+#   por um novo e a tarefa tenta mais uma vez; falhou de novo → 503
+#
+# Só compensa com núcleo sobrando e volume: o pickle dos argumentos custa
+# ~2/3 do cálculo por linha e ainda roda com o GIL do worker web. Por isso
+# o pool liga por padrão só com 2+ CPUs, e tarefas com menos de
+# COMPUTE_MIN_ROWS linhas rodam no próprio thread (o ida/volta fixo, ~1 ms,
+# seria maior que o cálculo). COMPUTE_POOL_ENABLED=0 desliga de vez.
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from fastapi import HTTPException
+
+from services.metrics import registry
+
+_CPUS = os.cpu_count() or 1
+
+COMPUTE_POOL_ENABLED = os.getenv("COMPUTE_POOL_ENABLED", "1" if _CPUS > 1 else "0").strip() == "1"
+COMPUTE_POOL_WORKERS = int(os.getenv("COMPUTE_POOL_WORKERS", str(max(1, min(2, _CPUS - 1)))))
+COMPUTE_MAX_PENDING = int(os.getenv("COMPUTE_MAX_PENDING", str(COMPUTE_POOL_WORKERS * 4)))
+COMPUTE_TASK_TIMEOUT_S = float(os.getenv("COMPUTE_TASK_TIMEOUT_S", "10"))
+COMPUTE_RETRY_AFTER = int(os.getenv("COMPUTE_RETRY_AFTER", "2"))
+COMPUTE_MIN_ROWS = int(os.getenv("COMPUTE_MIN_ROWS", "5000"))
+
+compute_tasks = registry.counter(
+    "compute_pool_tasks_total", "Tarefas do pool de CPU por desfecho", labels=("outcome",),
+)
+
+
+class ComputePool:
+    def __init__(self, workers=COMPUTE_POOL_WORKERS, max_pending=COMPUTE_MAX_PENDING):
+        self.workers = workers
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pending = 0
+        self._executor = None
+        self._lock = threading.Lock()
+
+    # --------------------------------------------------------
+    # API
+    # --------------------------------------------------------
+    def run(self, fn, *args, rows: int = None, timeout: float = COMPUTE_TASK_TIMEOUT_S):
+        """
+        fn(*args) num processo do pool; args e retorno precisam ser picklable.
+        `rows` = volume da entrada; abaixo de COMPUTE_MIN_ROWS roda aqui mesmo.
+        """
+        if not COMPUTE_POOL_ENABLED or (rows is not None and rows < COMPUTE_MIN_ROWS):
+            compute_tasks.inc("inline")
+            return fn(*args)
+
+        # worker morto (OOM, segfault) quebra o executor inteiro: descarta,
+        # sobe outro e tenta uma vez mais; quebrou de novo → 503
+        for _ in range(2):
+            self._acquire_slot()
+            executor = self._ensure_executor()
+            try:
+                future = executor.submit(fn, *args)
+            except BrokenProcessPool:
+                self._slots.release()
+                self._discard(executor)
+                continue
+            except BaseException:
+                self._slots.release()
+                raise
+            with self._lock:
+                self._pending += 1
+            future.add_done_callback(self._release)
+
+            try:
+                result = future.result(timeout)
+            except FutureTimeout:
+                future.cancel()
+                compute_tasks.inc("timeout")
+                raise HTTPException(504, "Análise demorou demais")
+            except BrokenProcessPool:
+                compute_tasks.inc("broken")
+                self._discard(executor)
+                continue
+            compute_tasks.inc("ok")
+            return result
+
+        raise HTTPException(
+            503,
+            "Análises indisponíveis, tente novamente",
+            headers={"Retry-After": str(COMPUTE_RETRY_AFTER)},
+        )
+
+    def pending(self) -> int:
+        return self._pending
+
+    def shutdown(self):
+        """Cancela o que está na fila e encerra os workers (shutdown do app)."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    # --------------------------------------------------------
+    # INTERNOS
+    # --------------------------------------------------------
+    def _acquire_slot(self):
+        if not self._slots.acquire(blocking=False):
+            compute_tasks.inc("rejected")
+            raise HTTPException(
+                503,
+                "Análises sobrecarregadas, tente novamente",
+                headers={"Retry-After": str(COMPUTE_RETRY_AFTER)},
+            )
+
+    def _discard(self, executor):
+        """Tira o executor quebrado de uso; o próximo submit cria outro."""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _release(self, future):
+        with self._lock:
+            self._pending -= 1
+        self._slots.release()
+
+    def _ensure_executor(self):
+        if self._executor is not None:
+            return self._executor
+        with self._lock:
+            if self._executor is None:
+                # spawn: o worker não herda threads/conexões do processo web
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+        return self._executor
+
+
+compute_pool = ComputePool()
+
+registry.gauge("compute_pool_pending", "Tarefas no pool de CPU (rodando + fila)", compute_pool.pending)
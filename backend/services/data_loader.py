@@ -0,0 +1,121 @@
+# services/data_loader.py
+#
+# Loader por request: os dados do usuário que vários engines/seções
+# precisam (hábitos, ids, logs por intervalo, conquistas) são buscados
+# uma vez e reaproveitados. Intervalos de logs contidos num intervalo já
+# carregado são filtrados em memória, sem nova query.
+#
+# Vive só durante o request — nunca guardar entre requests.
+from datetime import timedelta
+from functools import cached_property
+
+from sqlalchemy import and_, or_, select
+from sqlalchemy.orm import joinedload
+
+from models import Habit, HabitLog, UserAchievement
+from services.bootstrap import log_user_ids_complete
+from services.timezone import now_brazil, today_brazil_str
+
+
+def owned_logs(db, user_id: str):
+    """
+    Filtro "logs do usuário". Com habit_logs.user_id completo é o range
+    scan em ix_habit_logs_user_date; enquanto o backfill não terminou
+    (DB_AUTO_INIT=0), inclui também os NULL dos hábitos dele.
+    """
+    if log_user_ids_complete(db.get_bind()):
+        return HabitLog.user_id == user_id
+    return or_(
+        HabitLog.user_id == user_id,
+        and_(
+            HabitLog.user_id.is_(None),
+            HabitLog.habit_id.in_(select(Habit.id).where(Habit.user_id == user_id)),
+        ),
+    )
+
+
+class UserDataLoader:
+    def __init__(self, db, user):
+        self.db = db
+        self.user = user
+        self.today = today_brazil_str()
+        self._log_ranges = []  # [(start, end, rows)]; None = sem limite
+
+    def recent_days(self, n: int) -> list:
+        """Os últimos n dias até hoje, do mais antigo para o mais novo."""
+        today = now_brazil().date()
+        return [(today - timedelta(days=i)).strftime("%Y-%m-%d") for i in range(n - 1, -1, -1)]
+
+    # --------------------------------------------------------
+    # HÁBITOS
+    # --------------------------------------------------------
+    @cached_property
+    def habits(self):
+        return self.db.query(Habit).filter(Habit.user_id == self.user.id).all()
+
+    @cached_property
+    def habit_ids(self):
+        return [h.id for h in self.habits]
+
+    # --------------------------------------------------------
+    # LOGS  (linhas leves: habit_id, date, done)
+    # --------------------------------------------------------
+    def logs_between(self, start=None, end=None):
+        """Logs com start <= date <= end ("YYYY-MM-DD"; None = aberto)."""
+        for loaded_start, loaded_end, rows in self._log_ranges:
+            if _covers(loaded_start, loaded_end, start, end):
+                if (loaded_start, loaded_end) == (start, end):
+                    return rows
+                return [
+                    r for r in rows
+                    if (start is None or r.date >= start) and (end is None or r.date <= end)
+                ]
+
+        rows = self._fetch_logs(start, end)
+        self._log_ranges.append((start, end, rows))
+        return rows
+
+    def prefetch_logs(self, start=None, end=None):
+        """Carrega um intervalo maior antes: os menores saem dele."""
+        self.logs_between(start, end)
+
+    def logs_on(self, date: str):
+        return self.logs_between(date, date)
+
+    def all_logs(self):
+        return self.logs_between(None, None)
+
+    def done_habit_ids(self, date: str) -> set:
+        return {r.habit_id for r in self.logs_on(date) if r.done}
+
+    def _fetch_logs(self, start, end):
+        # range scan em ix_habit_logs_user_date: não depende dos hábitos
+        query = self.db.query(HabitLog.habit_id, HabitLog.date, HabitLog.done).filter(
+            owned_logs(self.db, self.user.id)
+        )
+        if start is not None and start == end:
+            query = query.filter(HabitLog.date == start)
+        else:
+            if start is not None:
+                query = query.filter(HabitLog.date >= start)
+            if end is not None:
+                query = query.filter(HabitLog.date <= end)
+        return query.all()
+
+    # --------------------------------------------------------
+    # CONQUISTAS
+    # --------------------------------------------------------
+    @cached_property
+    def achievements(self):
+        return (
+            self.db.query(UserAchievement)
+            .options(joinedload(UserAchievement.achievement))
+            .filter(UserAchievement.user_id == self.user.id)
+            .all()
+        )
+
+
+def _covers(loaded_start, loaded_end, start, end) -> bool:
+    starts_ok = loaded_start is None or (start is not None and loaded_start <= start)
+    ends_ok = loaded_end is None or (end is not None and loaded_end >= end)
+    return starts_ok and ends_ok
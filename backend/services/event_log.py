@@ -0,0 +1,45 @@
+# services/event_log.py
+#
+# Log append-only das mutações de hábito. Gravado na MESMA transação da
+# mutação: se o commit acontece, o evento existe. Nunca há UPDATE/DELETE
+# aqui — correções viram novos eventos.
+from sqlalchemy import insert
+
+from models import HabitEvent
+
+HABIT_CREATED = "habit_created"
+HABIT_TOGGLED = "habit_toggled"
+XP_APPLIED = "xp_applied"
+
+habit_events = HabitEvent.__table__
+
+_INSERT_EVENTS = insert(habit_events)
+
+
+def _event(type_, user_id, habit_id, date=None, done=None, xp_delta=None) -> dict:
+    # mesmas chaves em todo evento: vira um único executemany
+    return {
+        "type": type_,
+        "user_id": user_id,
+        "habit_id": habit_id,
+        "date": date,
+        "done": done,
+        "xp_delta": xp_delta,
+    }
+
+
+def habit_created(user_id: str, habit_id: str) -> dict:
+    return _event(HABIT_CREATED, user_id, habit_id)
+
+
+def habit_toggled(user_id: str, habit_id: str, date: str, done: bool) -> dict:
+    return _event(HABIT_TOGGLED, user_id, habit_id, date=date, done=done)
+
+
+def xp_applied(user_id: str, habit_id: str, date: str, xp_delta: int) -> dict:
+    return _event(XP_APPLIED, user_id, habit_id, date=date, xp_delta=xp_delta)
+
+
+def record(db, *events):
+    """Anexa os eventos na transação corrente (sem commit)."""
+    db.execute(_INSERT_EVENTS, list(events))
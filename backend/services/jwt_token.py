@@ -5,6 +5,8 @@ import uuid
 from datetime import datetime, timedelta, timezone
 from fastapi import HTTPException
 
+from services.revocation import denylist
+
 # ============================================================
 # CONFIG (use .env em produção)
 # ============================================================
@@ -52,6 +54,10 @@ def decode_token(token: str, expected_type: str = "access"):
         if token_type != expected_type:
             raise HTTPException(401, f"Token inválido (type={token_type})")
 
+        # logout antes do exp: Bloom filter em memória, banco só no "talvez"
+        if denylist.is_revoked(payload.get("jti")):
+            raise HTTPException(401, "Token revogado")
+
         return payload
 
     except jwt.ExpiredSignatureError:
@@ -1,12 +1,14 @@
+import math
+
+
 def calculate_level(xp: int) -> int:
     """
     Retorna o nível baseado no XP total usando o modelo:
     xp_needed = 50 * (level^2)
+
+    Menor level >= 1 com 50 * level^2 > xp, em O(1) via isqrt.
     """
-    level = 1
-    while xp >= 50 * (level ** 2):
-        level += 1
-    return level
+    return 1 + math.isqrt(max(0, int(xp)) // 50)
 
 
 def xp_for_next_level(level: int) -> int:
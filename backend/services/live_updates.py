@@ -0,0 +1,207 @@
+# services/live_updates.py
+#
+# Deltas ao vivo para o dashboard (SSE em GET /dashboard/stream).
+#
+#   escrita (thread do pool) ──publish──▶ broker ──▶ hub local ──▶ filas dos streams
+#
+# - LocalBroker: entrega direto no hub (um processo / dev)
+# - RedisBroker: pub/sub entre instâncias; cada instância entrega só
+#   aos streams que ela mesma segura
+#
+# Publicar SEMPRE depois do commit: o cliente pode reagir ao delta
+# relendo a API, e precisa achar o dado lá.
+import asyncio
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+
+from services.metrics import registry
+
+LIVE_BROKER = os.getenv("LIVE_BROKER", "local").strip().lower()
+LIVE_REDIS_URL = os.getenv("LIVE_REDIS_URL", "")
+LIVE_QUEUE_SIZE = int(os.getenv("LIVE_QUEUE_SIZE", "100"))
+LIVE_HEARTBEAT_SECONDS = float(os.getenv("LIVE_HEARTBEAT_SECONDS", "15"))
+LIVE_MAX_STREAMS_PER_USER = int(os.getenv("LIVE_MAX_STREAMS_PER_USER", "5"))
+LIVE_RECONNECT_MAX_S = float(os.getenv("LIVE_RECONNECT_MAX_S", "30"))
+
+_CHANNEL = "discipline:live"
+
+logger = logging.getLogger("discipline.live")
+
+live_events = registry.counter(
+    "live_events_total", "Deltas entregues aos streams", labels=("type",),
+)
+live_overflows = registry.counter(
+    "live_stream_overflows_total", "Filas cheias (cliente lento) convertidas em resync",
+)
+live_broker_errors = registry.counter(
+    "live_broker_errors_total", "Falhas do broker (publicar / conexão do listener)",
+    labels=("op",),
+)
+
+
+# ============================================================
+# HUB LOCAL (fan-out para os streams deste processo)
+# ============================================================
+class Subscription:
+    """Um stream SSE aberto. Só é tocado pelo event loop dono da fila."""
+
+    def __init__(self, user_id: str, loop):
+        self.user_id = user_id
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=LIVE_QUEUE_SIZE)
+
+    def offer(self, event: dict):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # cliente lento: descarta o atrasado e manda reler tudo
+            live_overflows.inc()
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"type": "resync"})
+
+
+class LiveHub:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subs = {}  # user_id -> set[Subscription]
+
+    def subscribe(self, user_id: str):
+        """None se o usuário já está no limite de streams."""
+        sub = Subscription(user_id, asyncio.get_running_loop())
+        with self._lock:
+            subs = self._subs.setdefault(user_id, set())
+            if len(subs) >= LIVE_MAX_STREAMS_PER_USER:
+                return None
+            subs.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            subs = self._subs.get(sub.user_id)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._subs[sub.user_id]
+
+    def deliver(self, user_id: str, event: dict):
+        """Chamável de qualquer thread."""
+        with self._lock:
+            subs = list(self._subs.get(user_id, ()))
+        for sub in subs:
+            sub.loop.call_soon_threadsafe(sub.offer, event)
+        if subs:
+            live_events.inc(event["type"])
+
+    def resync_all(self):
+        """Todos os streams deste processo relêem (eventos podem ter se perdido)."""
+        with self._lock:
+            subs = [sub for group in self._subs.values() for sub in group]
+        for sub in subs:
+            sub.loop.call_soon_threadsafe(sub.offer, {"type": "resync"})
+
+    def stream_count(self) -> int:
+        with self._lock:
+            return sum(len(s) for s in self._subs.values())
+
+
+hub = LiveHub()
+
+registry.gauge("live_streams_open", "Streams SSE abertos neste processo", hub.stream_count)
+
+
+# ============================================================
+# BROKERS
+# ============================================================
+class LocalBroker:
+    """Stand-in de um processo: publicar = entregar."""
+
+    def __init__(self, hub: LiveHub):
+        self.hub = hub
+
+    def publish(self, user_id: str, event: dict):
+        self.hub.deliver(user_id, event)
+
+
+class RedisBroker:
+    """Pub/sub num canal só; requer o pacote `redis`."""
+
+    def __init__(self, hub: LiveHub, url: str):
+        import redis
+
+        self.hub = hub
+        self.client = redis.Redis.from_url(url)
+        self._thread = threading.Thread(target=self._listen, name="live-redis", daemon=True)
+        self._thread.start()
+
+    def publish(self, user_id: str, event: dict):
+        self.client.publish(_CHANNEL, json.dumps({"user_id": user_id, "event": event}))
+
+    def _listen(self):
+        # conexão caiu: reconecta com backoff exponencial; ao voltar, os
+        # streams daqui recebem resync (o que passou no meio se perdeu)
+        delay = 0.5
+        reconnecting = False
+        while True:
+            pubsub = None
+            try:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(_CHANNEL)
+                if reconnecting:
+                    logger.info("pub/sub do Redis reconectado")
+                    self.hub.resync_all()
+                    reconnecting = False
+                delay = 0.5
+                for message in pubsub.listen():
+                    try:
+                        payload = json.loads(message["data"])
+                        self.hub.deliver(payload["user_id"], payload["event"])
+                    except (ValueError, KeyError, TypeError):
+                        continue
+            except Exception:
+                live_broker_errors.inc("listen")
+                logger.warning("pub/sub do Redis caiu; reconectando em %.1fs", delay, exc_info=True)
+                reconnecting = True
+            finally:
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+            time.sleep(delay)
+            delay = min(delay * 2, LIVE_RECONNECT_MAX_S)
+
+
+def _build_broker():
+    if LIVE_BROKER == "redis":
+        return RedisBroker(hub, LIVE_REDIS_URL)
+    return LocalBroker(hub)
+
+
+broker = _build_broker()
+
+_event_ids = itertools.count(1)
+
+
+def publish(user_id: str, event_type: str, **data):
+    """Publica um delta para os streams do usuário (após o commit)."""
+    try:
+        broker.publish(user_id, {"type": event_type, **data})
+    except Exception:
+        # ao vivo é best-effort (o polling/resync cobre a perda), mas não mudo
+        live_broker_errors.inc("publish")
+        logger.warning("falha ao publicar %s", event_type, exc_info=True)
+
+
+def format_sse(event: dict) -> bytes:
+    """Frame SSE: id/event/data. Comentários (':') servem de heartbeat."""
+    event_type = event["type"]
+    data = json.dumps({k: v for k, v in event.items() if k != "type"}, separators=(",", ":"))
+    return f"id: {next(_event_ids)}\nevent: {event_type}\ndata: {data}\n\n".encode()
+
+
+HEARTBEAT = b": ping\n\n"
@@ -0,0 +1,105 @@
+# services/load_shedding.py
+#
+# Descarte adaptativo de carga. Sinais lidos a cada request:
+# - in-flight: requests ainda sem resposta iniciada (middleware)
+# - fila do threadpool: rotas sync esperando thread livre (anyio)
+# - pool do banco: checkouts bloqueados agora + média móvel da espera
+#
+# Cada router declara sua prioridade (dependencies/priority.py):
+#   low      → cai primeiro (analytics do progress)
+#   normal   → cai só com o dobro dos limites
+#   critical → nunca cai (toggle — habits.toggle_router — e auth)
+import functools
+import os
+import threading
+import time
+
+import anyio.to_thread
+
+from services.metrics import registry
+
+LOAD_SHEDDING_ENABLED = os.getenv("LOAD_SHEDDING_ENABLED", "1").strip() == "1"
+SHED_MAX_IN_FLIGHT = int(os.getenv("SHED_MAX_IN_FLIGHT", "200"))
+SHED_MAX_QUEUE = int(os.getenv("SHED_MAX_QUEUE", "20"))
+SHED_MAX_POOL_WAIT_MS = float(os.getenv("SHED_MAX_POOL_WAIT_MS", "100"))
+SHED_RETRY_AFTER = int(os.getenv("SHED_RETRY_AFTER", "2"))
+
+# quantas vezes o limite cada prioridade aguenta antes de cair
+PRIORITY_HEADROOM = {"low": 1.0, "normal": 2.0, "critical": None}
+
+_EWMA_ALPHA = 0.2
+
+shed_requests = registry.counter(
+    "load_shed_total", "Requests descartados por sobrecarga",
+    labels=("priority",),
+)
+
+
+class LoadState:
+    """Contadores compartilhados entre event loop e threads do pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.pool_waiting = 0
+        self.pool_wait_ewma_ms = 0.0
+
+    def request_started(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def request_finished(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def checkout_started(self):
+        with self._lock:
+            self.pool_waiting += 1
+
+    def checkout_finished(self, wait_ms: float):
+        with self._lock:
+            self.pool_waiting -= 1
+            self.pool_wait_ewma_ms += _EWMA_ALPHA * (wait_ms - self.pool_wait_ewma_ms)
+
+    def pressure(self) -> float:
+        """
+        Maior razão sinal/limite. 1.0 = no limite de "low".
+        Só pode ser chamado do event loop (limiter do anyio).
+        """
+        queue = anyio.to_thread.current_default_thread_limiter().statistics().tasks_waiting
+        pool_wait = self.pool_wait_ewma_ms if self.pool_waiting else 0.0
+        return max(
+            self.in_flight / SHED_MAX_IN_FLIGHT,
+            queue / SHED_MAX_QUEUE,
+            pool_wait / SHED_MAX_POOL_WAIT_MS,
+        )
+
+
+state = LoadState()
+
+registry.gauge("http_requests_in_flight", "Requests sem resposta iniciada", lambda: state.in_flight)
+registry.gauge("db_pool_waiting", "Checkouts bloqueados esperando conexão", lambda: state.pool_waiting)
+registry.gauge("db_pool_wait_ewma_ms", "Média móvel da espera por conexão (ms)", lambda: round(state.pool_wait_ewma_ms, 3))
+
+
+def should_shed(priority: str) -> bool:
+    headroom = PRIORITY_HEADROOM[priority]
+    if not LOAD_SHEDDING_ENABLED or headroom is None:
+        return False
+    return state.pressure() > headroom
+
+
+def install_pool_probe(engine):
+    """Conta checkouts em espera e alimenta a média móvel da espera."""
+    raw_connection = engine.raw_connection
+
+    @functools.wraps(raw_connection)
+    def probed_raw_connection(*args, **kwargs):
+        state.checkout_started()
+        t0 = time.perf_counter()
+        try:
+            return raw_connection(*args, **kwargs)
+        finally:
+            state.checkout_finished((time.perf_counter() - t0) * 1000)
+
+    engine.raw_connection = probed_raw_connection
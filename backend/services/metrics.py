@@ -0,0 +1,226 @@
+# services/metrics.py
+#
+# Registry mínimo no formato texto do Prometheus, sem dependências externas.
+# Cada observação é um bisect + incremento sob lock: barato o bastante para
+# ficar ligado em produção.
+import functools
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# buckets em segundos (latência HTTP / banco)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names, values) -> str:
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _format_value(value) -> str:
+    if isinstance(value, float):
+        if value == float("inf"):
+            return "+Inf"
+        return repr(value)
+    return str(value)
+
+
+# ============================================================
+# COUNTER
+# ============================================================
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def collect(self):
+        with self._lock:
+            items = list(self._values.items())
+        for label_values, value in items:
+            yield self.name, _format_labels(self.label_names, label_values), value
+
+
+# ============================================================
+# GAUGE (valor lido na hora do scrape)
+# ============================================================
+class Gauge:
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, func):
+        self.name = name
+        self.help = help_text
+        self.func = func
+
+    def collect(self):
+        value = self.func()
+        if value is not None:
+            yield self.name, "", value
+
+
+# ============================================================
+# HISTOGRAM
+# ============================================================
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [counts por bucket (+Inf no fim), soma]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][idx] += 1
+            series[1] += value
+
+    def collect(self):
+        with self._lock:
+            snapshot = [(k, list(v[0]), v[1]) for k, v in self._series.items()]
+
+        for label_values, counts, total in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                labels = _format_labels(
+                    self.label_names + ("le",), label_values + (_format_value(float(bound)),)
+                )
+                yield f"{self.name}_bucket", labels, cumulative
+            labels = _format_labels(self.label_names, label_values)
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, cumulative
+
+
+# ============================================================
+# REGISTRY
+# ============================================================
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help_text, labels=()):
+        return self._metrics.get(name) or self.register(Counter(name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._metrics.get(name) or self.register(Histogram(name, help_text, labels, buckets))
+
+    def gauge(self, name, help_text, func):
+        return self.register(Gauge(name, help_text, func))
+
+    def render(self, extra=()) -> str:
+        lines = []
+        for metric in list(self._metrics.values()) + list(extra):
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.collect():
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+# ============================================================
+# MÉTRICAS DO APP
+# ============================================================
+http_requests = registry.counter(
+    "http_requests_total", "Requests HTTP por rota/método/status",
+    labels=("method", "route", "status"),
+)
+http_latency = registry.histogram(
+    "http_request_duration_seconds", "Latência HTTP por rota",
+    labels=("method", "route"),
+)
+engine_latency = registry.histogram(
+    "engine_duration_seconds", "Tempo dos engines de domínio",
+    labels=("engine",),
+    buckets=(0.00001, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+db_checkout_wait = registry.histogram(
+    "db_pool_checkout_wait_seconds", "Espera para obter conexão do pool",
+)
+
+
+def timed(engine_name: str):
+    """Decorator: registra a duração da função em engine_duration_seconds."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                engine_latency.observe(time.perf_counter() - t0, engine_name)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def engine_timer(engine_name: str):
+    """Mesmo que @timed, para um trecho (etapas dentro de uma função)."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        engine_latency.observe(time.perf_counter() - t0, engine_name)
+
+
+# ============================================================
+# POOL DO SQLALCHEMY
+# ============================================================
+def instrument_engine(engine, gauges: bool = True):
+    """
+    Mede a espera por conexão (checkout) e expõe os gauges do pool.
+    Pools sem checkedout()/overflow() (ex: SQLite em memória) são ignorados.
+    gauges=False: só a espera (engines extras, os gauges têm nome fixo).
+    """
+    raw_connection = engine.raw_connection
+
+    @functools.wraps(raw_connection)
+    def timed_raw_connection(*args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return raw_connection(*args, **kwargs)
+        finally:
+            db_checkout_wait.observe(time.perf_counter() - t0)
+
+    engine.raw_connection = timed_raw_connection
+
+    if not gauges:
+        return
+
+    def _pool_stat(attr):
+        def read():
+            func = getattr(engine.pool, attr, None)
+            return func() if callable(func) else None
+        return read
+
+    registry.gauge("db_pool_size", "Tamanho configurado do pool", _pool_stat("size"))
+    registry.gauge("db_pool_checked_out", "Conexões em uso", _pool_stat("checkedout"))
+    registry.gauge("db_pool_overflow", "Conexões acima do pool_size", _pool_stat("overflow"))
+    registry.gauge("db_pool_checked_in", "Conexões livres no pool", _pool_stat("checkedin"))
@@ -1,11 +1,21 @@
-from passlib.context import CryptContext
+from functools import lru_cache
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from services.metrics import timed
 
 
+@lru_cache(maxsize=1)
+def _pwd_context():
+    # passlib + bcrypt são pesados no import: só carregam no primeiro
+    # login/registro, não no cold start do worker
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+@timed("password.bcrypt_hash")
 def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    return _pwd_context().hash(password)
 
 
+@timed("password.bcrypt_verify")
 def verify_password(password: str, hashed: str) -> bool:
-    return pwd_context.verify(password, hashed)
+    return _pwd_context().verify(password, hashed)
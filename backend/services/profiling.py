@@ -0,0 +1,247 @@
+# services/profiling.py
+#
+# Profiling opt-in por request (cProfile) + alocações por rota (tracemalloc).
+# Com PROFILING_ENABLED=0 nada aqui é instalado: rotas, middleware e
+# router admin ficam exatamente como sem o módulo.
+import cProfile
+import functools
+import inspect
+import io
+import json
+import os
+import pstats
+import re
+import threading
+import time
+import tracemalloc
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "0").strip() == "1"
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "./profiles")
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "200"))
+
+# setado pelo middleware quando o request atual deve ser perfilado
+profile_requested = ContextVar("profile_requested", default=False)
+
+_index_lock = threading.Lock()
+_INDEX_FILE = "index.jsonl"
+_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+# ============================================================
+# WRAP DAS ROTAS
+# ============================================================
+def instrument_router(router):
+    """
+    Envolve os endpoints do router ANTES do include_router: o FastAPI
+    recria as rotas a partir de route.endpoint e segue __wrapped__
+    para montar a assinatura/dependências.
+    """
+    for route in router.routes:
+        endpoint = getattr(route, "endpoint", None)
+        if endpoint is not None and not getattr(endpoint, "_profiled", False):
+            route.endpoint = _profiled(endpoint, route.path)
+
+
+def _profiled(endpoint, route_path: str):
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def async_wrapper(*args, **kwargs):
+            if not profile_requested.get():
+                return await endpoint(*args, **kwargs)
+            session = _ProfileSession(route_path, kwargs)
+            session.start()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                session.stop()
+        async_wrapper._profiled = True
+        return async_wrapper
+
+    @functools.wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        if not profile_requested.get():
+            return endpoint(*args, **kwargs)
+        session = _ProfileSession(route_path, kwargs)
+        session.start()
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            session.stop()
+    wrapper._profiled = True
+    return wrapper
+
+
+class _ProfileSession:
+    """cProfile é por thread: roda na mesma thread do endpoint."""
+
+    def __init__(self, route_path, kwargs):
+        self.route = route_path
+        user = kwargs.get("user")
+        self.user_id = getattr(user, "id", None)
+        self.profiler = cProfile.Profile()
+        self.mem_before = None
+
+    def start(self):
+        if tracemalloc.is_tracing():
+            self.mem_before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        self.t0 = time.perf_counter()
+        self.profiler.enable()
+
+    def stop(self):
+        self.profiler.disable()
+        duration_ms = (time.perf_counter() - self.t0) * 1000
+
+        mem = None
+        if self.mem_before is not None and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            mem = {"delta_kb": round((current - self.mem_before) / 1024, 1),
+                   "peak_kb": round((peak - self.mem_before) / 1024, 1)}
+            route_memory.record(self.route, mem)
+
+        try:
+            _save_profile(self.profiler, {
+                "route": self.route,
+                "user_id": self.user_id,
+                "duration_ms": round(duration_ms, 2),
+                "memory": mem,
+            })
+        except OSError:
+            pass  # profiling nunca derruba o request
+
+
+# ============================================================
+# ARMAZENAMENTO LOCAL (.prof + index.jsonl)
+# ============================================================
+def _save_profile(profiler, meta: dict):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+
+    profile_id = uuid.uuid4().hex
+    profiler.dump_stats(os.path.join(PROFILE_DIR, f"{profile_id}.prof"))
+
+    meta = {"id": profile_id, "created_at": datetime.now(timezone.utc).isoformat(), **meta}
+    with _index_lock:
+        entries = _read_index()
+        entries.append(meta)
+        for old in entries[:-PROFILE_MAX_FILES]:
+            try:
+                os.remove(os.path.join(PROFILE_DIR, f"{old['id']}.prof"))
+            except OSError:
+                pass
+        entries = entries[-PROFILE_MAX_FILES:]
+        with open(os.path.join(PROFILE_DIR, _INDEX_FILE), "w") as f:
+            f.write("".join(json.dumps(e) + "\n" for e in entries))
+
+
+def _read_index():
+    path = os.path.join(PROFILE_DIR, _INDEX_FILE)
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def list_profiles(route: str = None, user_id: str = None):
+    with _index_lock:
+        entries = _read_index()
+    if route:
+        entries = [e for e in entries if e["route"] == route]
+    if user_id:
+        entries = [e for e in entries if e["user_id"] == user_id]
+    return list(reversed(entries))
+
+
+def profile_path(profile_id: str):
+    if not _ID_RE.match(profile_id):
+        return None
+    path = os.path.join(PROFILE_DIR, f"{profile_id}.prof")
+    return path if os.path.exists(path) else None
+
+
+def profile_report(profile_id: str, sort: str = "cumulative", limit: int = 40):
+    path = profile_path(profile_id)
+    if path is None:
+        return None
+    out = io.StringIO()
+    stats = pstats.Stats(path, stream=out)
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return out.getvalue()
+
+
+# ============================================================
+# MEMÓRIA (tracemalloc)
+# ============================================================
+class RouteMemory:
+    """
+    Alocação média/pico por rota nos requests perfilados.
+    O tracemalloc é global: com requests perfilados em paralelo os números
+    se misturam — use amostragem baixa ou o header em requests isolados.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+
+    def record(self, route, mem):
+        with self._lock:
+            entry = self._routes.setdefault(route, {"samples": 0, "delta_kb_total": 0.0, "peak_kb_max": 0.0})
+            entry["samples"] += 1
+            entry["delta_kb_total"] += mem["delta_kb"]
+            entry["peak_kb_max"] = max(entry["peak_kb_max"], mem["peak_kb"])
+
+    def summary(self):
+        with self._lock:
+            return {
+                route: {
+                    "samples": e["samples"],
+                    "avg_delta_kb": round(e["delta_kb_total"] / e["samples"], 1),
+                    "max_peak_kb": e["peak_kb_max"],
+                }
+                for route, e in self._routes.items()
+            }
+
+
+route_memory = RouteMemory()
+
+_baseline_snapshot = None
+
+
+def start_tracing(frames: int = 10):
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+
+
+def stop_tracing():
+    global _baseline_snapshot
+    _baseline_snapshot = None
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def take_snapshot():
+    """Guarda o snapshot atual como base do próximo diff."""
+    global _baseline_snapshot
+    start_tracing()
+    _baseline_snapshot = tracemalloc.take_snapshot()
+    current, peak = tracemalloc.get_traced_memory()
+    return {"traced_kb": round(current / 1024, 1), "peak_kb": round(peak / 1024, 1)}
+
+
+def snapshot_diff(limit: int = 25, group_by: str = "lineno"):
+    if _baseline_snapshot is None or not tracemalloc.is_tracing():
+        return None
+    current = tracemalloc.take_snapshot()
+    stats = current.compare_to(_baseline_snapshot, group_by)
+    return [
+        {
+            "location": str(stat.traceback[0]) if stat.traceback else "?",
+            "size_diff_kb": round(stat.size_diff / 1024, 1),
+            "size_kb": round(stat.size / 1024, 1),
+            "count_diff": stat.count_diff,
+        }
+        for stat in stats[:limit]
+    ]
@@ -1,20 +1,14 @@
-from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
-
-from models import Habit, HabitLog, UserAchievement
-
-# timezone Brasil (consistente com o resto do projeto)
-from services.timezone import today_brazil_str, now_brazil
+# Funções de progresso do usuário. Todas recebem o UserDataLoader do
+# request (services/data_loader.py): hábitos, logs e conquistas vêm dele,
+# então várias seções na mesma resposta não repetem queries.
 
 
 # ============================================================
 # 📌 RESUMO DO DIA
 # ============================================================
-def get_today_summary(user, db: Session):
-    today = today_brazil_str()
-
-    habits = db.query(Habit).filter(Habit.user_id == user.id).all()
-    total = len(habits)
+def get_today_summary(loader):
+    today = loader.today
+    total = len(loader.habits)
 
     if total == 0:
         return {
@@ -24,13 +18,7 @@ def get_today_summary(user, db: Session):
             "percent": 0
         }
 
-    habit_ids = [h.id for h in habits]
-
-    done = db.query(HabitLog).filter(
-        HabitLog.habit_id.in_(habit_ids),
-        HabitLog.date == today,
-        HabitLog.done == True
-    ).count()
+    done = len(loader.done_habit_ids(today))
 
     percent = round((done / total) * 100, 2)
 
@@ -45,8 +33,8 @@ def get_today_summary(user, db: Session):
 # ============================================================
 # 📌 STREAKS GLOBAIS
 # ============================================================
-def get_global_streaks(user, db: Session):
-    habits = db.query(Habit).filter(Habit.user_id == user.id).all()
+def get_global_streaks(loader):
+    habits = loader.habits
 
     if not habits:
         return {
@@ -76,44 +64,29 @@ def get_global_streaks(user, db: Session):
 # ============================================================
 # 📌 RESUMO DOS ÚLTIMOS 7 DIAS
 # ============================================================
-def get_week_summary(user, db: Session):
-    today = now_brazil().date()
-    result = []
-
-    habits = db.query(Habit).filter(Habit.user_id == user.id).all()
-    if not habits:
+def get_week_summary(loader):
+    if not loader.habits:
         return []
 
-    habit_ids = [h.id for h in habits]
-    total = len(habits)
-
-    for i in range(6, -1, -1):
-        day = today - timedelta(days=i)
-        day_str = day.strftime("%Y-%m-%d")
+    total = len(loader.habits)
+    days = loader.recent_days(7)
 
-        logs = db.query(HabitLog).filter(
-            HabitLog.habit_id.in_(habit_ids),
-            HabitLog.date == day_str
-        ).all()
+    # uma query para a semana inteira (antes: uma por dia)
+    done_by_day = dict.fromkeys(days, 0)
+    for log in loader.logs_between(days[0], days[-1]):
+        if log.done:
+            done_by_day[log.date] += 1
 
-        done = sum(1 for log in logs if log.done)
-
-        percent = round((done / total) * 100, 2) if total > 0 else 0
-
-        result.append({
-            "date": day_str,
-            "percent": percent
-        })
-
-    return result
+    return [
+        {"date": day, "percent": round((done_by_day[day] / total) * 100, 2)}
+        for day in days
+    ]
 
 
 # ============================================================
 # 📌 LISTA DE CONQUISTAS JÁ DESBLOQUEADAS
 # ============================================================
-def get_user_achievements(user, db: Session):
-    achs = db.query(UserAchievement).filter(UserAchievement.user_id == user.id).all()
-
+def get_user_achievements(loader):
     return [
         {
             "id": a.achievement.id,
@@ -122,5 +95,5 @@ def get_user_achievements(user, db: Session):
             "icon": a.achievement.icon,
             "unlocked_at": a.unlocked_at
         }
-        for a in achs
+        for a in loader.achievements
     ]
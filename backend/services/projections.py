@@ -0,0 +1,272 @@
+# services/projections.py
+#
+# Projeções derivadas do habit_events:
+#   - estado do hábito: habits.xp / current_streak / best_streak / last_done_date
+#   - XP/nível do usuário: auth_users.xp_total / level / level_progress
+#
+# O caminho de escrita (toggle_engine) atualiza as projeções em SQL na
+# mesma transação. rebuild() refaz qualquer uma delas do zero lendo o log
+# em páginas por id e gravando em lote — as regras de replay abaixo
+# espelham as do caminho ao vivo.
+import functools
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import bindparam, func, insert, select, update
+
+from models import Habit, HabitEvent, HabitLog
+from models_auth import AuthUser
+from services import event_log
+from services.timezone import today_brazil_str
+from services.xp_engine import calculate_xp_for_habit, get_level_from_xp
+
+PROJECTIONS = ("habits", "users")
+
+habit_events = HabitEvent.__table__
+habits = Habit.__table__
+users = AuthUser.__table__
+
+
+# ============================================================
+# REPLAY
+# ============================================================
+@functools.lru_cache(maxsize=4096)
+def _previous_day(date: str) -> str:
+    return (datetime.strptime(date, "%Y-%m-%d") - timedelta(days=1)).strftime("%Y-%m-%d")
+
+
+class _Fold:
+    """Estado das projeções em memória durante o replay."""
+
+    def __init__(self):
+        self.habits = {}   # habit_id -> [xp, current_streak, best_streak, last_done_date]
+        self.users = {}    # user_id -> xp_total
+        self.events = 0
+        self.id_sum = 0    # soma dos ids lidos (ver _missed_events)
+        self.last_id = 0
+
+    def apply(self, type_, user_id, habit_id, date, done, xp_delta):
+        if type_ == event_log.HABIT_CREATED:
+            self.habits.setdefault(habit_id, [0, 0, 0, None])
+            self.users.setdefault(user_id, 0)
+            return
+
+        if type_ == event_log.HABIT_TOGGLED:
+            if done:
+                habit = self.habits.setdefault(habit_id, [0, 0, 0, None])
+                # mesma regra do streak_sql_values
+                last = habit[3]
+                if last != date:
+                    habit[1] = habit[1] + 1 if last == _previous_day(date) else 1
+                    if habit[1] > habit[2]:
+                        habit[2] = habit[1]
+                    habit[3] = date
+            return
+
+        if type_ == event_log.XP_APPLIED:
+            habit = self.habits.setdefault(habit_id, [0, 0, 0, None])
+            habit[0] = max(0, habit[0] + xp_delta)
+            self.users[user_id] = max(0, self.users.get(user_id, 0) + xp_delta)
+
+
+_PAGE = (
+    select(
+        habit_events.c.id, habit_events.c.type, habit_events.c.user_id,
+        habit_events.c.habit_id, habit_events.c.date, habit_events.c.done,
+        habit_events.c.xp_delta,
+    )
+    .where(habit_events.c.id > bindparam("b_last_id"))
+    .order_by(habit_events.c.id)
+    .limit(bindparam("b_limit"))
+)
+_SEEN = (
+    select(func.count(), func.coalesce(func.sum(habit_events.c.id), 0))
+    .where(habit_events.c.id <= bindparam("b_last_id"))
+)
+
+
+def _chunks(rows, size):
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+
+def _read_page(conn, fold: _Fold, batch_size: int) -> int:
+    rows = conn.execute(_PAGE, {"b_last_id": fold.last_id, "b_limit": batch_size}).all()
+    apply = fold.apply
+    for row in rows:
+        apply(row[1], row[2], row[3], row[4], row[5], row[6])
+    if rows:
+        fold.events += len(rows)
+        fold.id_sum += sum(row[0] for row in rows)
+        fold.last_id = rows[-1][0]
+    return len(rows)
+
+
+def _missed_events(conn, fold: _Fold) -> bool:
+    """
+    O replay sem lock pode ter passado por um id cuja transação ainda não
+    tinha commitado (Postgres: o id sai da sequence antes do commit), ou
+    por eventos que um move-user apagou depois. Com os escritores travados,
+    contagem + soma dos ids até last_id dizem se o que foi lido é o log.
+    """
+    count, id_sum = conn.execute(_SEEN, {"b_last_id": fold.last_id}).one()
+    return (count, id_sum) != (fold.events, fold.id_sum)
+
+
+def _lock_writers(conn):
+    """
+    Trava os escritores NA ORDEM DO TOGGLE: toda escrita começa pelo
+    UPDATE da linha do usuário (change_seq) e só depois mexe em hábitos,
+    logs e habit_events. Pegar auth_users primeiro espera os toggles em
+    andamento terminarem e segura os novos no primeiro passo — nenhum
+    deles fica com lock de hábito esperando pela gente (sem deadlock).
+    - Postgres: EXCLUSIVE em auth_users (leituras seguem), SHARE no log
+    - SQLite: o UPDATE abaixo é a primeira escrita e pega o lock do banco
+    E os clientes do /sync precisam rebaixar o estado reescrito.
+    """
+    if conn.dialect.name == "postgresql":
+        conn.exec_driver_sql("LOCK TABLE auth_users IN EXCLUSIVE MODE")
+        conn.exec_driver_sql("LOCK TABLE habit_events IN SHARE MODE")
+    conn.execute(update(users).values(change_seq=users.c.change_seq + 1))
+
+
+def rebuild(engine, only=PROJECTIONS, batch_size: int = 50_000, log=print) -> dict:
+    """
+    Refaz as projeções pedidas a partir do log, em duas fases:
+    1. replay sem lock: páginas por id (keyset, sem OFFSET), cada uma na
+       sua transação curta — toggles seguem normalmente enquanto isso
+    2. uma transação de escrita: trava os escritores (_lock_writers),
+       aplica o que entrou no log durante a fase 1 e grava as projeções
+       em executemany. Só essa fase segura toggles, e quem lê nunca vê
+       projeção pela metade.
+    """
+    t0 = time.perf_counter()
+    fold = _Fold()
+
+    while True:
+        with engine.connect() as conn:
+            read = _read_page(conn, fold, batch_size)
+        if not read:
+            break
+        log(f"  {fold.events} eventos lidos")
+
+    with engine.begin() as conn:
+        t_locked = time.perf_counter()
+        _lock_writers(conn)
+
+        if _missed_events(conn, fold):
+            log("  log mudou atrás do replay: relendo com os escritores travados")
+            fold = _Fold()
+        while _read_page(conn, fold, batch_size):
+            pass
+
+        if "habits" in only:
+            # a virada do dia (streak_reset) não gera evento: aplica a
+            # mesma regra aqui, senão o replay ressuscita streaks quebrados
+            yesterday = _previous_day(today_brazil_str())
+            for state in fold.habits.values():
+                if state[3] is None or state[3] < yesterday:
+                    state[1] = 0
+
+            # zera antes: hábito sem evento volta ao estado inicial
+            conn.execute(update(habits).values(xp=0, current_streak=0, best_streak=0, last_done_date=None))
+            stmt = (
+                update(habits)
+                .where(habits.c.id == bindparam("b_id"))
+                .values(
+                    xp=bindparam("b_xp"),
+                    current_streak=bindparam("b_current"),
+                    best_streak=bindparam("b_best"),
+                    last_done_date=bindparam("b_last"),
+                )
+            )
+            rows = [
+                {"b_id": habit_id, "b_xp": xp, "b_current": current, "b_best": best, "b_last": last}
+                for habit_id, (xp, current, best, last) in fold.habits.items()
+            ]
+            for chunk in _chunks(rows, batch_size):
+                conn.execute(stmt, chunk)
+
+            conn.execute(update(habits).values(change_seq=(
+                select(users.c.change_seq).where(users.c.id == habits.c.user_id).scalar_subquery()
+            )))
+
+        if "users" in only:
+            conn.execute(update(users).values(xp_total=0, level=1, level_progress=0.0))
+            stmt = (
+                update(users)
+                .where(users.c.id == bindparam("b_id"))
+                .values(xp_total=bindparam("b_xp"), level=bindparam("b_level"), level_progress=bindparam("b_progress"))
+            )
+            rows = []
+            for user_id, xp_total in fold.users.items():
+                level = get_level_from_xp(xp_total)
+                rows.append({"b_id": user_id, "b_xp": xp_total, "b_level": level["level"], "b_progress": level["progress"]})
+            for chunk in _chunks(rows, batch_size):
+                conn.execute(stmt, chunk)
+
+        locked = time.perf_counter() - t_locked
+
+    return {
+        "events": fold.events,
+        "habits": len(fold.habits),
+        "users": len(fold.users),
+        "seconds": round(time.perf_counter() - t0, 2),
+        "writers_blocked_seconds": round(locked, 2),
+    }
+
+
+# ============================================================
+# GÊNESE — bancos anteriores ao log
+# ============================================================
+def backfill_events(engine, batch_size: int = 50_000, log=print) -> dict:
+    """
+    Sintetiza o log a partir do estado atual quando habit_events está vazio:
+    habit_created por hábito e, para cada log feito (por data),
+    habit_toggled + xp_applied com o XP dos parâmetros atuais do hábito.
+    O rebuild seguinte corrige a deriva acumulada nas projeções.
+    """
+    t0 = time.perf_counter()
+    with engine.begin() as conn:
+        if conn.execute(select(habit_events.c.id).limit(1)).first() is not None:
+            raise RuntimeError("habit_events já tem eventos; gênese só roda em log vazio")
+
+        params = {}
+        created = []
+        for habit_id, user_id, difficulty, importance, frequency in conn.execute(
+            select(habits.c.id, habits.c.user_id, habits.c.difficulty,
+                   habits.c.importance_weight, habits.c.frequency_per_week)
+            .order_by(habits.c.created_at, habits.c.id)
+        ):
+            params[habit_id] = (user_id, calculate_xp_for_habit(difficulty, importance, frequency))
+            created.append(event_log.habit_created(user_id, habit_id))
+        for chunk in _chunks(created, batch_size):
+            conn.execute(insert(habit_events), chunk)
+
+        logs = conn.execution_options(yield_per=batch_size).execute(
+            select(HabitLog.habit_id, HabitLog.date)
+            .where(HabitLog.done.is_(True))
+            .order_by(HabitLog.date, HabitLog.habit_id)
+        )
+        pending = []
+        toggles = 0
+        for habit_id, date in logs:
+            owner = params.get(habit_id)
+            if owner is None:
+                continue
+            user_id, xp = owner
+            pending.append(event_log.habit_toggled(user_id, habit_id, date, True))
+            pending.append(event_log.xp_applied(user_id, habit_id, date, xp))
+            toggles += 1
+            if len(pending) >= batch_size:
+                conn.execute(insert(habit_events), pending)
+                pending = []
+                log(f"  {toggles} toggles sintetizados")
+        if pending:
+            conn.execute(insert(habit_events), pending)
+
+    return {
+        "habits": len(created),
+        "toggles": toggles,
+        "seconds": round(time.perf_counter() - t0, 2),
+    }
@@ -0,0 +1,108 @@
+# services/query_stats.py
+#
+# Contagem de queries / tempo de banco por request, via eventos do engine.
+# O QueryStats fica numa ContextVar: o anyio copia o contexto para a thread
+# das rotas sync, então o objeto mutado lá é o mesmo que o middleware lê.
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+# mesmo SQL repetido N+ vezes com parâmetros diferentes → provável N+1
+N_PLUS_ONE_THRESHOLD = 3
+
+_current = ContextVar("query_stats", default=None)
+
+
+class QueryStats:
+    __slots__ = ("count", "duration", "parent", "_statements")
+
+    def __init__(self, parent=None):
+        self.count = 0
+        self.duration = 0.0
+        # bloco aninhado (teste → middleware do request) conta nos dois
+        self.parent = parent
+        self._statements = {}  # sql -> [execuções, {hash dos parâmetros}]
+
+    def record(self, statement: str, parameters, elapsed: float):
+        if self.parent is not None:
+            self.parent.record(statement, parameters, elapsed)
+        self.count += 1
+        self.duration += elapsed
+
+        entry = self._statements.get(statement)
+        if entry is None:
+            entry = self._statements[statement] = [0, set()]
+        entry[0] += 1
+        try:
+            entry[1].add(hash(repr(parameters)))
+        except Exception:
+            pass
+
+    def n_plus_one(self, threshold: int = N_PLUS_ONE_THRESHOLD):
+        """[(sql, execuções)] repetidos com parâmetros distintos."""
+        return [
+            (sql, executions)
+            for sql, (executions, params) in self._statements.items()
+            if executions >= threshold and len(params) > 1
+        ]
+
+
+def current_stats():
+    return _current.get()
+
+
+@contextmanager
+def track_queries():
+    """Coleta as queries executadas dentro do bloco (request, job, teste)."""
+    stats = QueryStats(parent=_current.get())
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def assert_max_queries(budget: int):
+    """Falha se o bloco executar mais que `budget` queries."""
+    with track_queries() as stats:
+        yield stats
+    if stats.count > budget:
+        raise AssertionError(
+            f"{stats.count} queries executadas (orçamento: {budget}); "
+            f"N+1 suspeitos: {stats.n_plus_one()}"
+        )
+
+
+@contextmanager
+def assert_num_queries(expected: int):
+    """Falha se o bloco não executar exatamente `expected` queries."""
+    with track_queries() as stats:
+        yield stats
+    if stats.count != expected:
+        raise AssertionError(
+            f"{stats.count} queries executadas (esperado: {expected}); "
+            f"N+1 suspeitos: {stats.n_plus_one()}"
+        )
+
+
+# ============================================================
+# HOOKS DO ENGINE
+# ============================================================
+def install_query_hooks(engine):
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if _current.get() is not None:
+            conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        stats = _current.get()
+        if stats is None:
+            return
+        starts = conn.info.get("query_start")
+        if not starts:
+            return
+        stats.record(statement, parameters, time.perf_counter() - starts.pop())
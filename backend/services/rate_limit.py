@@ -0,0 +1,226 @@
+# services/rate_limit.py
+#
+# Token bucket para proteger as rotas que rodam bcrypt (login/registro).
+# - InMemoryBackend: por processo, O(1), sem I/O
+# - SharedStoreBackend: mesmo algoritmo sobre um KV com compare-and-set,
+#   para várias instâncias (Redis em produção, LocalCASStore em dev/testes)
+import json
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from time import monotonic
+
+from fastapi import HTTPException
+
+from services.metrics import registry
+
+rate_limit_rejections = registry.counter(
+    "rate_limit_rejections_total", "Requests recusados pelo rate limit",
+    labels=("policy",),
+)
+
+
+# ============================================================
+# POLÍTICAS  (capacidade / janela em segundos)
+# ============================================================
+class Policy:
+    __slots__ = ("name", "capacity", "rate")
+
+    def __init__(self, name: str, capacity: float, period_seconds: float):
+        self.name = name
+        self.capacity = float(capacity)
+        self.rate = self.capacity / period_seconds  # tokens por segundo
+
+
+def _policy_from_env(name: str, env: str, default: str) -> Policy:
+    capacity, period = os.getenv(env, default).split("/")
+    return Policy(name, float(capacity), float(period))
+
+
+LOGIN_PER_IP = _policy_from_env("login_ip", "RATE_LIMIT_LOGIN_IP", "20/60")
+# por (IP, conta): limita o chute de senha numa conta sem deixar que
+# qualquer um tranque a conta alheia — quem erra de outro IP não gasta o
+# bucket do dono
+LOGIN_PER_IP_IDENTIFIER = _policy_from_env(
+    "login_ip_identifier", "RATE_LIMIT_LOGIN_IP_IDENTIFIER", "5/60",
+)
+REGISTER_PER_IP = _policy_from_env("register_ip", "RATE_LIMIT_REGISTER_IP", "5/600")
+
+
+# ============================================================
+# BACKEND LOCAL
+# ============================================================
+class InMemoryBackend:
+    """
+    Buckets num OrderedDict (LRU): key -> [tokens, instante da última leitura].
+    Um lookup, uma conta e uma escrita sob lock — fica abaixo de 1µs.
+    Cheio, sai só o bucket usado há mais tempo: quem gira max_keys chaves
+    empurra para fora as mais antigas, não zera o limite de todo mundo.
+    """
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key: str, policy: Policy, cost: float = 1.0) -> float:
+        """0.0 se liberou; senão segundos até haver tokens suficientes."""
+        now = monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= self.max_keys:
+                    self._buckets.popitem(last=False)
+                bucket = self._buckets[key] = [policy.capacity, now]
+                tokens = policy.capacity
+            else:
+                self._buckets.move_to_end(key)
+                tokens = bucket[0] + (now - bucket[1]) * policy.rate
+                if tokens > policy.capacity:
+                    tokens = policy.capacity
+                bucket[1] = now
+
+            if tokens >= cost:
+                bucket[0] = tokens - cost
+                return 0.0
+            bucket[0] = tokens
+            return (cost - tokens) / policy.rate
+
+
+# ============================================================
+# BACKEND COMPARTILHADO (multi-instância)
+# ============================================================
+class SharedStoreBackend:
+    """
+    Token bucket sobre um KV com compare-and-set. O store precisa de:
+      get(key) -> str | None
+      cas(key, expected: str | None, new: str, ttl_seconds: float) -> bool
+    Usa relógio de parede (time.time): instâncias diferentes, mesma escala.
+    """
+
+    def __init__(self, store, max_retries: int = 5, prefix: str = "rl:"):
+        self.store = store
+        self.max_retries = max_retries
+        self.prefix = prefix
+
+    def consume(self, key: str, policy: Policy, cost: float = 1.0) -> float:
+        key = self.prefix + key
+        ttl = policy.capacity / policy.rate + 1
+
+        for _ in range(self.max_retries):
+            now = time.time()
+            raw = self.store.get(key)
+            if raw is None:
+                tokens = policy.capacity
+            else:
+                stored_tokens, stored_at = json.loads(raw)
+                tokens = min(policy.capacity, stored_tokens + (now - stored_at) * policy.rate)
+
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+
+            if self.store.cas(key, raw, json.dumps([tokens, now]), ttl):
+                return 0.0 if allowed else (cost - tokens) / policy.rate
+
+        # disputa alta na mesma chave: trata como excedido
+        return 1.0 / policy.rate
+
+
+class LocalCASStore:
+    """Stand-in local do Redis: mesma interface get/cas, num dict com lock."""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[1] < time.time():
+                return None
+            return item[0]
+
+    def cas(self, key, expected, new, ttl_seconds):
+        with self._lock:
+            item = self._data.get(key)
+            current = item[0] if item is not None and item[1] >= time.time() else None
+            if current != expected:
+                return False
+            self._data[key] = (new, time.time() + ttl_seconds)
+            return True
+
+
+_REDIS_CAS = """
+local current = redis.call('GET', KEYS[1])
+if (current == false and ARGV[1] == '') or current == ARGV[1] then
+    redis.call('SET', KEYS[1], ARGV[2], 'PX', ARGV[3])
+    return 1
+end
+return 0
+"""
+
+
+class RedisCASStore:
+    """CAS atômico via script Lua (requer o pacote `redis`)."""
+
+    def __init__(self, url: str):
+        import redis
+
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self._cas = self.client.register_script(_REDIS_CAS)
+
+    def get(self, key):
+        return self.client.get(key)
+
+    def cas(self, key, expected, new, ttl_seconds):
+        return bool(self._cas(keys=[key], args=[expected or "", new, int(ttl_seconds * 1000)]))
+
+
+def _build_backend():
+    kind = os.getenv("RATE_LIMIT_BACKEND", "memory").strip().lower()
+    if kind == "redis":
+        return SharedStoreBackend(RedisCASStore(os.environ["RATE_LIMIT_REDIS_URL"]))
+    if kind == "local-shared":
+        return SharedStoreBackend(LocalCASStore())
+    return InMemoryBackend()
+
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1").strip() == "1"
+
+backend = _build_backend()
+
+
+# ============================================================
+# API USADA PELAS ROTAS
+# ============================================================
+def client_ip(request) -> str:
+    # atrás de proxy: rodar o uvicorn com --proxy-headers
+    return request.client.host if request.client else "unknown"
+
+
+def enforce(*checks):
+    """
+    checks: pares (policy, chave). Todos são consumidos; se algum estourar
+    → 429 com Retry-After. Chamar ANTES de qualquer hash de senha.
+    """
+    if not RATE_LIMIT_ENABLED:
+        return
+
+    retry_after = 0.0
+    rejected = None
+    for policy, key in checks:
+        wait = backend.consume(f"{policy.name}:{key}", policy)
+        if wait > retry_after:
+            retry_after = wait
+            rejected = policy
+
+    if rejected is not None:
+        rate_limit_rejections.inc(rejected.name)
+        raise HTTPException(
+            429,
+            "Muitas tentativas. Tente novamente mais tarde.",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
@@ -0,0 +1,182 @@
+# services/rebalance.py
+#
+# Move usuários entre shards: todas as linhas do usuário (conta, hábitos,
+# logs, conquistas, refresh tokens, eventos) vão do shard atual
+# para o destino e o diretório passa a apontar para lá.
+#
+#   python manage.py rebalance-shards [--dry-run]   (quem está fora do anel)
+#   python manage.py move-user <user_id> <shard>
+#
+# Por usuário:
+#   1. origem: UPDATE do change_seq trava a linha (toggles dele esperam,
+#      mesmo primeiro passo de toda escrita) e lê tudo
+#   2. destino: apaga sobra de tentativa anterior, insere tudo, commit
+#   3. diretório → destino; origem: apaga, commit
+# Se cair entre 2 e 3 o diretório ainda aponta para a origem e rodar de
+# novo refaz a cópia. Um toggle que estava esperando o lock falha (a
+# linha sumiu) e o retry do cliente já resolve o shard novo — o
+# get_current_user re-consulta o diretório quando não acha o usuário.
+import time
+
+from sqlalchemy import bindparam, delete, insert, select, update
+
+from database import SHARD_ENGINES, engine as home_engine
+from models import Achievement, AggregateCache, Habit, HabitEvent, HabitLog, UserAchievement
+from models_auth import AuthUser, RefreshToken, UserDirectory
+from services import sharding
+
+users = AuthUser.__table__
+habits = Habit.__table__
+logs = HabitLog.__table__
+events = HabitEvent.__table__
+achievements = Achievement.__table__
+user_achievements = UserAchievement.__table__
+tokens = RefreshToken.__table__
+aggregates = AggregateCache.__table__
+directory = UserDirectory.__table__
+
+_LOCK_USER = (
+    update(users)
+    .where(users.c.id == bindparam("b_user_id"))
+    .values(change_seq=users.c.change_seq + 1)
+)
+
+
+def _user_habit_ids(user_id):
+    return select(habits.c.id).where(habits.c.user_id == user_id)
+
+
+# ============================================================
+# CÓPIA DAS LINHAS
+# ============================================================
+def _read_user(conn, user_id: str) -> dict:
+    def rows(stmt):
+        return [dict(r) for r in conn.execute(stmt).mappings()]
+
+    return {
+        "auth_users": rows(select(users).where(users.c.id == user_id)),
+        "habits": rows(select(habits).where(habits.c.user_id == user_id)),
+        "habit_logs": rows(select(logs).where(logs.c.habit_id.in_(_user_habit_ids(user_id)))),
+        # ids de conquista podem diferir entre shards (bancos antigos): vai pelo nome
+        "user_achievements": rows(
+            select(user_achievements, achievements.c.name.label("achievement_name"))
+            .join(achievements, achievements.c.id == user_achievements.c.achievement_id)
+            .where(user_achievements.c.user_id == user_id)
+        ),
+        "refresh_tokens": rows(select(tokens).where(tokens.c.user_id == user_id)),
+        "habit_events": rows(select(events).where(events.c.user_id == user_id).order_by(events.c.id)),
+    }
+
+
+def _delete_user(conn, user_id: str):
+    # filhos antes dos pais (FK no Postgres)
+    conn.execute(delete(logs).where(logs.c.habit_id.in_(_user_habit_ids(user_id))))
+    conn.execute(delete(user_achievements).where(user_achievements.c.user_id == user_id))
+    conn.execute(delete(tokens).where(tokens.c.user_id == user_id))
+    conn.execute(delete(events).where(events.c.user_id == user_id))
+    # agregados não são copiados: o destino reconstrói na primeira leitura
+    conn.execute(delete(aggregates).where(aggregates.c.user_id == user_id))
+    conn.execute(delete(habits).where(habits.c.user_id == user_id))
+    conn.execute(delete(users).where(users.c.id == user_id))
+
+
+def _insert_user(conn, data: dict):
+    ach_ids = dict(conn.execute(select(achievements.c.name, achievements.c.id)).all())
+    for row in data["user_achievements"]:
+        name = row.pop("achievement_name")
+        if name not in ach_ids:
+            raise RuntimeError(f"Conquista {name!r} não existe no shard de destino (init-db?)")
+        row["achievement_id"] = ach_ids[name]
+
+    # eventos: id é autoincremento local; a ordem de inserção preserva o replay
+    for row in data["habit_events"]:
+        row.pop("id")
+
+    for table in (users, habits, logs, user_achievements, tokens, events):
+        batch = data[table.name]
+        if batch:
+            conn.execute(insert(table), batch)
+
+
+def move_user(user_id: str, target: str) -> dict:
+    source = sharding.shard_for_user(user_id, fresh=True)
+    if source == target:
+        return {"user_id": user_id, "from": source, "to": target, "moved": False}
+
+    src, dst = SHARD_ENGINES[source], SHARD_ENGINES[target]
+    if src is dst:
+        raise RuntimeError(f"Shards {source!r} e {target!r} apontam para o mesmo banco")
+
+    with src.begin() as conn:
+        if not conn.execute(_LOCK_USER, {"b_user_id": user_id}).rowcount:
+            raise LookupError(f"Usuário {user_id} não está no shard {source!r}")
+        data = _read_user(conn, user_id)
+        counts = {name: len(batch) for name, batch in data.items()}
+
+        with dst.begin() as target_conn:
+            _delete_user(target_conn, user_id)
+            _insert_user(target_conn, data)
+
+        # diretório no mesmo banco da origem: mesma transação do delete
+        sharding.set_user_shard(user_id, target, conn=conn if src is home_engine else None)
+        _delete_user(conn, user_id)
+
+    sharding.forget(user_id)
+    return {"user_id": user_id, "from": source, "to": target, "moved": True, "rows": counts}
+
+
+# ============================================================
+# REBALANCE — quem está num shard diferente do que o anel manda
+# ============================================================
+def plan(ring=None, batch_size: int = 10_000) -> list:
+    """[(user_id, shard_atual, shard_do_anel)] — varre o diretório por páginas."""
+    ring = ring or sharding.ring
+    moves = []
+    last_id = ""
+    while True:
+        with home_engine.connect() as conn:
+            page = conn.execute(
+                select(directory.c.user_id, directory.c.shard)
+                .where(directory.c.user_id > last_id)
+                .order_by(directory.c.user_id)
+                .limit(batch_size)
+            ).all()
+        if not page:
+            return moves
+        last_id = page[-1].user_id
+        for user_id, shard in page:
+            target = ring.node_for(user_id)
+            if target != shard:
+                moves.append((user_id, shard, target))
+
+
+def rebalance(batch_size: int = 100, dry_run: bool = False, ring=None, log=None) -> dict:
+    t0 = time.perf_counter()
+    moves = plan(ring)
+
+    by_route = {}
+    for _, source, target in moves:
+        key = f"{source}->{target}"
+        by_route[key] = by_route.get(key, 0) + 1
+
+    moved = failed = 0
+    if not dry_run:
+        for i in range(0, len(moves), batch_size):
+            for user_id, _, target in moves[i:i + batch_size]:
+                try:
+                    move_user(user_id, target)
+                    moved += 1
+                except LookupError:
+                    # apagado ou movido por outro processo no meio do caminho
+                    failed += 1
+            if log:
+                log(f"  {moved}/{len(moves)} usuários movidos")
+
+    return {
+        "planned": len(moves),
+        "routes": by_route,
+        "moved": moved,
+        "skipped": failed,
+        "dry_run": dry_run,
+        "seconds": round(time.perf_counter() - t0, 2),
+    }
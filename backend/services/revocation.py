@@ -0,0 +1,232 @@
+# services/revocation.py
+#
+# Revogação de access tokens (jti) antes do exp, sem query por request.
+#
+# - verdade: tabela revoked_tokens no banco home (jti, exp do token)
+# - cada worker mantém um Bloom filter com os jti revogados. O
+#   decode_token pergunta ao filtro (alguns hashes, ~µs): "não" é
+#   definitivo; "talvez" confirma no banco (falso positivo ~REVOCATION_FP_RATE)
+# - sincronização: thread relê a cada REVOCATION_REFRESH_S só o que foi
+#   revogado desde a última leitura (com REVOCATION_OVERLAP_S de folga
+#   para commits fora de ordem / relógios diferentes — readicionar é
+#   inofensivo). Revogação feita neste worker entra no filtro na hora;
+#   nos outros, em até REVOCATION_REFRESH_S.
+# - de hora em hora: apaga do banco os jti já expirados e reconstrói o
+#   filtro do zero (o Bloom não remove itens)
+#
+# O boot não toca no banco: a thread espera um intervalo antes da primeira
+# rodada e a carga inicial (sem poda) acontece na primeira verificação do
+# processo — nunca aceita token revogado por falta de carga.
+import hashlib
+import logging
+import math
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import bindparam, delete, select
+from sqlalchemy.exc import IntegrityError
+
+from database import engine
+from models_auth import RevokedToken
+from services.metrics import registry
+
+REVOCATION_REFRESH_S = float(os.getenv("REVOCATION_REFRESH_S", "2"))
+REVOCATION_OVERLAP_S = float(os.getenv("REVOCATION_OVERLAP_S", "10"))
+REVOCATION_FULL_RELOAD_S = float(os.getenv("REVOCATION_FULL_RELOAD_S", "3600"))
+REVOCATION_CAPACITY = int(os.getenv("REVOCATION_CAPACITY", "100000"))
+REVOCATION_FP_RATE = float(os.getenv("REVOCATION_FP_RATE", "0.001"))
+
+logger = logging.getLogger("discipline.revocation")
+
+revoked = RevokedToken.__table__
+
+revocation_lookups = registry.counter(
+    "token_revocation_db_lookups_total", "Consultas ao banco por 'talvez' do Bloom filter",
+    labels=("result",),
+)
+
+_IS_REVOKED = select(revoked.c.jti).where(revoked.c.jti == bindparam("b_jti"))
+_SINCE = (
+    select(revoked.c.jti, revoked.c.revoked_at)
+    .where(revoked.c.revoked_at > bindparam("b_since"))
+)
+_ALL_ACTIVE = select(revoked.c.jti, revoked.c.revoked_at).where(revoked.c.expires_at > bindparam("b_now"))
+_PRUNE = delete(revoked).where(revoked.c.expires_at <= bindparam("b_now"))
+
+
+# ============================================================
+# BLOOM FILTER
+# ============================================================
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float):
+        capacity = max(1, capacity)
+        self.m = max(8, math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.k = max(1, round(self.m / capacity * math.log(2)))
+        self.capacity = capacity
+        self.count = 0
+        self._bits = bytearray((self.m + 7) // 8)
+
+    def _positions(self, key: str):
+        # double hashing: k posições a partir de um único blake2b
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        m = self.m
+        return [(h1 + i * h2) % m for i in range(self.k)]
+
+    def add(self, key: str):
+        bits = self._bits
+        for pos in self._positions(key):
+            bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        bits = self._bits
+        for pos in self._positions(key):
+            if not bits[pos >> 3] >> (pos & 7) & 1:
+                return False
+        return True
+
+
+# ============================================================
+# DENYLIST (filtro + banco)
+# ============================================================
+class RevocationList:
+    def __init__(self):
+        self._filter = BloomFilter(REVOCATION_CAPACITY, REVOCATION_FP_RATE)
+        self._loaded = False
+        self._since = None
+        self._last_full = 0.0
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    # --------------------------------------------------------
+    # API
+    # --------------------------------------------------------
+    def is_revoked(self, jti: str) -> bool:
+        if not jti:
+            return False
+        if not self._loaded:
+            self._ensure_loaded()
+        if jti not in self._filter:
+            return False
+        with engine.connect() as conn:
+            hit = conn.execute(_IS_REVOKED, {"b_jti": jti}).first() is not None
+        revocation_lookups.inc("revoked" if hit else "false_positive")
+        return hit
+
+    def revoke(self, jti: str, expires_at: datetime, user_id: str = None):
+        """Grava o jti (idempotente) e já marca no filtro deste worker."""
+        try:
+            with engine.begin() as conn:
+                conn.execute(revoked.insert().values(
+                    jti=jti, user_id=user_id, expires_at=expires_at, revoked_at=datetime.utcnow(),
+                ))
+        except IntegrityError:
+            pass
+        # |= no bytearray não é atômico entre threads: bit perdido = falso negativo
+        with self._lock:
+            self._filter.add(jti)
+
+    def size(self) -> int:
+        return self._filter.count
+
+    # --------------------------------------------------------
+    # SINCRONIZAÇÃO
+    # --------------------------------------------------------
+    def refresh(self):
+        """Carga incremental; a cada REVOCATION_FULL_RELOAD_S, poda + recarga total."""
+        if not self._loaded:
+            self._ensure_loaded()
+            return
+        if time.monotonic() - self._last_full >= REVOCATION_FULL_RELOAD_S:
+            self.reload(prune=True)
+            return
+
+        since = self._since - timedelta(seconds=REVOCATION_OVERLAP_S)
+        with engine.connect() as conn:
+            rows = conn.execute(_SINCE, {"b_since": since}).all()
+        with self._lock:
+            for jti, revoked_at in rows:
+                self._filter.add(jti)
+                if revoked_at > self._since:
+                    self._since = revoked_at
+
+    def _ensure_loaded(self):
+        with self._load_lock:
+            if not self._loaded:
+                self.reload()
+
+    def reload(self, prune: bool = False):
+        now = datetime.utcnow()
+        if prune:
+            with engine.begin() as conn:
+                conn.execute(_PRUNE, {"b_now": now})
+        with engine.connect() as conn:
+            rows = conn.execute(_ALL_ACTIVE, {"b_now": now}).all()
+
+        # folga para crescer até a próxima recarga sem perder a taxa de FP
+        fresh = BloomFilter(max(REVOCATION_CAPACITY, len(rows) * 2), REVOCATION_FP_RATE)
+        since = now - timedelta(seconds=REVOCATION_OVERLAP_S)
+        for jti, revoked_at in rows:
+            fresh.add(jti)
+            if revoked_at > since:
+                since = revoked_at
+
+        with self._lock:
+            self._filter = fresh
+            self._since = since
+            self._last_full = time.monotonic()
+            self._loaded = True
+
+
+denylist = RevocationList()
+
+
+def revoke_payload(payload: dict):
+    """Revoga o access token já decodificado (logout)."""
+    jti = payload.get("jti")
+    if not jti:
+        return
+    expires_at = datetime.utcfromtimestamp(payload["exp"]) if payload.get("exp") else datetime.utcnow()
+    denylist.revoke(jti, expires_at, payload.get("sub"))
+
+registry.gauge("revoked_tokens_loaded", "jti no Bloom filter deste worker", denylist.size)
+
+
+# ============================================================
+# THREAD DE SINCRONIZAÇÃO (processo web)
+# ============================================================
+class RevocationSync:
+    def __init__(self, revocations: RevocationList = denylist, interval: float = REVOCATION_REFRESH_S):
+        self.revocations = revocations
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="revocation-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        thread = self._thread
+        if thread is None:
+            return
+        self._stop.set()
+        thread.join(timeout)
+        self._thread = None
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.revocations.refresh()
+            except Exception:
+                logger.exception("sincronização de tokens revogados falhou")
+
+
+sync = RevocationSync()
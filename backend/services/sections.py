@@ -0,0 +1,39 @@
+# services/sections.py
+#
+# Fieldsets esparsos (?fields=user,today). Cada seção de uma resposta é
+# uma função independente registrada aqui; só as pedidas rodam — e só
+# elas disparam as queries que usam. Dependências comuns entre seções
+# (ex: a lista de hábitos) ficam no contexto como cached_property:
+# carregadas uma vez, e só se alguma seção pedida precisar.
+from fastapi import HTTPException
+
+
+class SectionRegistry:
+    def __init__(self):
+        self._sections = {}
+
+    def section(self, name: str):
+        def decorator(func):
+            self._sections[name] = func
+            return func
+        return decorator
+
+    @property
+    def names(self):
+        return tuple(self._sections)
+
+    def parse(self, fields) -> tuple:
+        """None/vazio → todas as seções, na ordem de registro."""
+        if not fields:
+            return self.names
+        requested = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = [f for f in requested if f not in self._sections]
+        if unknown:
+            raise HTTPException(
+                400,
+                f"Campos inválidos: {', '.join(unknown)}. Disponíveis: {', '.join(self.names)}",
+            )
+        return tuple(n for n in self.names if n in requested)
+
+    def compute(self, fields, ctx) -> dict:
+        return {name: self._sections[name](ctx) for name in self.parse(fields)}
@@ -0,0 +1,216 @@
+# services/sharding.py
+#
+# Roteamento por usuário entre N bancos (DATABASE_SHARDS, ver database.py).
+#
+# - placement: usuário novo vai para ring.node_for(user_id) — hash
+#   consistente com nós virtuais, então adicionar um shard move só ~1/N
+#   dos usuários (e o `manage.py rebalance-shards` faz a mudança)
+# - diretório (user_directory, no banco home): user_id → shard, mais
+#   email/username únicos entre todos os shards (login e cadastro). O
+#   diretório é a verdade; o anel só decide onde o usuário DEVERIA estar
+# - por request: get_current_user resolve o shard (cache em memória com
+#   TTL) e chama db.use_shard(); o RoutingSession manda tudo para lá
+#
+# Com um shard só (o padrão) nada disso consulta o banco: shard_for_user
+# devolve o único nome e o request faz as mesmas queries de antes.
+import bisect
+import hashlib
+import os
+import time
+from datetime import datetime
+
+from sqlalchemy import bindparam, func, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+from database import DEFAULT_SHARD, SHARD_ENGINES, engine
+from models_auth import AuthUser, RefreshToken, UserDirectory
+
+SHARD_VNODES = int(os.getenv("SHARD_VNODES", "64"))
+SHARD_CACHE_TTL_S = float(os.getenv("SHARD_CACHE_TTL_S", "60"))
+SHARD_CACHE_SIZE = int(os.getenv("SHARD_CACHE_SIZE", "100000"))
+
+SHARDED = len(SHARD_ENGINES) > 1
+_ONLY_SHARD = next(iter(SHARD_ENGINES))
+
+directory = UserDirectory.__table__
+users = AuthUser.__table__
+tokens = RefreshToken.__table__
+
+
+# ============================================================
+# ANEL (hash consistente)
+# ============================================================
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], "big")
+
+
+class HashRing:
+    def __init__(self, nodes, vnodes: int = SHARD_VNODES):
+        points = sorted((_hash(f"{node}#{i}"), node) for node in nodes for i in range(vnodes))
+        self._keys = [key for key, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def node_for(self, key: str) -> str:
+        i = bisect.bisect(self._keys, _hash(key)) % len(self._keys)
+        return self._nodes[i]
+
+
+ring = HashRing(SHARD_ENGINES)
+
+
+# ============================================================
+# RESOLUÇÃO user_id → shard
+# ============================================================
+_SHARD_OF = select(directory.c.shard).where(directory.c.user_id == bindparam("b_user_id"))
+_BY_IDENTIFIER = select(directory.c.user_id, directory.c.shard).where(
+    or_(directory.c.email == bindparam("b_identifier"), directory.c.username == bindparam("b_identifier"))
+)
+_IDENTITY_TAKEN = select(directory.c.user_id).where(
+    or_(directory.c.email == bindparam("b_email"), directory.c.username == bindparam("b_username"))
+).limit(1)
+_SET_SHARD = (
+    update(directory)
+    .where(directory.c.user_id == bindparam("b_user_id"))
+    .values(shard=bindparam("b_shard"), updated_at=bindparam("b_now"))
+)
+
+_cache = {}  # user_id → (shard, expira_em)
+
+
+def shard_for_user(user_id: str, fresh: bool = False) -> str:
+    """
+    Shard dos dados do usuário. Sem linha no diretório = usuário anterior
+    aos shards, que continua no DEFAULT_SHARD.
+    """
+    if not SHARDED:
+        return _ONLY_SHARD
+
+    now = time.monotonic()
+    if not fresh:
+        hit = _cache.get(user_id)
+        if hit and hit[1] > now:
+            return hit[0]
+
+    with engine.connect() as conn:
+        shard = conn.execute(_SHARD_OF, {"b_user_id": user_id}).scalar() or DEFAULT_SHARD
+
+    if len(_cache) >= SHARD_CACHE_SIZE:
+        _cache.clear()
+    _cache[user_id] = (shard, now + SHARD_CACHE_TTL_S)
+    return shard
+
+
+def forget(user_id: str):
+    _cache.pop(user_id, None)
+
+
+def lookup_identifier(identifier: str):
+    """(user_id, shard) pelo email/username, ou None."""
+    with engine.connect() as conn:
+        return conn.execute(_BY_IDENTIFIER, {"b_identifier": identifier}).first()
+
+
+def shard_of_refresh_token(token: str):
+    """Shard onde o refresh token está salvo (None se não existe em nenhum)."""
+    if not SHARDED:
+        return _ONLY_SHARD
+    query = select(tokens.c.id).where(tokens.c.token == bindparam("b_token"))
+    for name, shard_engine in SHARD_ENGINES.items():
+        with shard_engine.connect() as conn:
+            if conn.execute(query, {"b_token": token}).first():
+                return name
+    return None
+
+
+# ============================================================
+# CADASTRO
+# ============================================================
+def identity_taken(email: str, username: str) -> bool:
+    with engine.connect() as conn:
+        return conn.execute(_IDENTITY_TAKEN, {"b_email": email, "b_username": username}).first() is not None
+
+
+def claim_identity(user_id: str, email: str, username: str):
+    """
+    Reserva email/username no diretório e devolve o shard do usuário novo.
+    None se outro cadastro levou o email/username (unique do diretório).
+    """
+    shard = ring.node_for(user_id)
+    try:
+        with engine.begin() as conn:
+            conn.execute(insert(directory).values(
+                user_id=user_id, email=email, username=username,
+                shard=shard, updated_at=datetime.utcnow(),
+            ))
+    except IntegrityError:
+        return None
+    return shard
+
+
+def release_identity(user_id: str):
+    """Desfaz o claim_identity quando a criação no shard falha."""
+    with engine.begin() as conn:
+        conn.execute(directory.delete().where(directory.c.user_id == user_id))
+    forget(user_id)
+
+
+def set_user_shard(user_id: str, shard: str, conn=None):
+    params = {"b_user_id": user_id, "b_shard": shard, "b_now": datetime.utcnow()}
+    if conn is not None:
+        conn.execute(_SET_SHARD, params)
+    else:
+        with engine.begin() as home:
+            home.execute(_SET_SHARD, params)
+    forget(user_id)
+
+
+# ============================================================
+# BACKFILL — usuários anteriores ao diretório
+# ============================================================
+def backfill_directory(batch_size: int = 10_000, log=None) -> int:
+    """
+    Cria a linha do diretório de quem ainda não tem, shard a shard.
+    Um commit por lote; com o diretório em dia custa dois COUNT por shard.
+    """
+    filled = 0
+    for name, shard_engine in SHARD_ENGINES.items():
+        with shard_engine.connect() as conn:
+            total = conn.execute(select(func.count()).select_from(users)).scalar()
+        with engine.connect() as conn:
+            known = conn.execute(
+                select(func.count()).select_from(directory).where(directory.c.shard == name)
+            ).scalar()
+        if known >= total:
+            continue
+
+        last_id = ""
+        while True:
+            with shard_engine.connect() as conn:
+                page = conn.execute(
+                    select(users.c.id, users.c.email, users.c.username)
+                    .where(users.c.id > last_id)
+                    .order_by(users.c.id)
+                    .limit(batch_size)
+                ).all()
+            if not page:
+                break
+            last_id = page[-1].id
+
+            with engine.begin() as conn:
+                existing = set(conn.execute(
+                    select(directory.c.user_id).where(directory.c.user_id.in_([r.id for r in page]))
+                ).scalars())
+                missing = [
+                    {"user_id": r.id, "email": r.email, "username": r.username,
+                     "shard": name, "updated_at": datetime.utcnow()}
+                    for r in page if r.id not in existing
+                ]
+                if missing:
+                    conn.execute(insert(directory), missing)
+
+            filled += len(missing)
+            if log:
+                log(f"  {name}: {filled} usuários no diretório")
+            if len(page) < batch_size:
+                break
+    return filled
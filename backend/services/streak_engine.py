@@ -43,3 +43,26 @@ def update_streak(habit, done_today: bool) -> None:
 
     # Atualiza a última data
     habit.last_done_date = today.strftime("%Y-%m-%d")
+
+
+def streak_sql_values(table, today: str, yesterday: str) -> dict:
+    """
+    Mesma regra de update_streak (done_today=True), como expressões SQL
+    para um UPDATE atômico. Os lados direitos do SET leem a linha antiga,
+    então best_streak compara com o streak já incrementado.
+    """
+    from sqlalchemy import case
+
+    new_streak = case(
+        (table.c.last_done_date == today, table.c.current_streak),
+        (table.c.last_done_date == yesterday, table.c.current_streak + 1),
+        else_=1,
+    )
+    return {
+        "current_streak": new_streak,
+        "best_streak": case(
+            (new_streak > table.c.best_streak, new_streak),
+            else_=table.c.best_streak,
+        ),
+        "last_done_date": today,
+    }
@@ -0,0 +1,185 @@
+# services/streak_reset.py
+#
+# Virada do dia: zera current_streak de todo hábito que não foi feito
+# ontem (last_done_date < ontem). Sem isso o streak só muda no próximo
+# toggle e quem parou há duas semanas continua exibindo o streak antigo.
+#
+# - set-based: páginas por id (keyset) e UPDATE ... WHERE id IN (...),
+#   nada de carregar hábito no ORM
+# - idempotente: o WHERE só pega streak > 0 ainda quebrado; rodar de novo
+#   no mesmo dia não muda nada
+# - seguro com toggles: cada lote trava primeiro as linhas dos usuários
+#   (UPDATE do change_seq, mesma ordem do toggle) e o UPDATE dos hábitos
+#   re-checa a condição — um hábito marcado no meio do caminho fica fora
+#
+# Roda logo depois da meia-noite de Brasília (scheduler abaixo) e via
+# `python manage.py reset-streaks`. Com shards, um shard por vez. O boot
+# NÃO varre nada por padrão (scale-to-zero: cada worker que sobe pagaria o
+# scan); quem dorme na virada agenda o manage.py num cron, ou liga
+# STREAK_RESET_ON_START=1 (recupera STREAK_RESET_DELAY_S depois do start).
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import bindparam, or_, select, text, update
+
+from database import SHARD_ENGINES
+from models import Habit
+from models_auth import AuthUser
+from services.metrics import registry
+from services.timezone import BR_TZ, now_brazil
+
+STREAK_RESET_SCHEDULE = os.getenv("STREAK_RESET_SCHEDULE", "1").strip() == "1"
+STREAK_RESET_BATCH = int(os.getenv("STREAK_RESET_BATCH", "5000"))
+STREAK_RESET_DELAY_S = float(os.getenv("STREAK_RESET_DELAY_S", "30"))
+STREAK_RESET_ON_START = os.getenv("STREAK_RESET_ON_START", "0").strip() == "1"
+
+# advisory lock (Postgres): uma instância roda o job por vez
+_RESET_LOCK_KEY = 7_204_312
+
+logger = logging.getLogger("discipline.streaks")
+
+streak_resets = registry.counter("streak_resets_total", "Streaks zerados pela virada do dia")
+
+habits = Habit.__table__
+users = AuthUser.__table__
+
+
+def _broken():
+    return (
+        (habits.c.current_streak > 0)
+        & or_(habits.c.last_done_date < bindparam("b_yesterday"), habits.c.last_done_date.is_(None))
+    )
+
+
+_PAGE = (
+    select(habits.c.id)
+    .where(habits.c.id > bindparam("b_last_id"), _broken())
+    .order_by(habits.c.id)
+    .limit(bindparam("b_limit"))
+)
+_BUMP_USERS = (
+    update(users)
+    .where(users.c.id.in_(
+        select(habits.c.user_id).where(habits.c.id.in_(bindparam("b_ids", expanding=True)), _broken())
+    ))
+    .values(change_seq=users.c.change_seq + 1)
+)
+_RESET_HABITS = (
+    update(habits)
+    .where(habits.c.id.in_(bindparam("b_ids", expanding=True)), _broken())
+    .values(
+        current_streak=0,
+        # mesmo carimbo do usuário: o /sync devolve o hábito zerado
+        change_seq=select(users.c.change_seq).where(users.c.id == habits.c.user_id).scalar_subquery(),
+    )
+)
+
+
+def reset_broken_streaks(bind, today: str = None, batch_size: int = STREAK_RESET_BATCH, log=None) -> dict:
+    """Zera os streaks quebrados em `today` (padrão: hoje em Brasília) no banco `bind`."""
+    today = today or now_brazil().strftime("%Y-%m-%d")
+    yesterday = (datetime.strptime(today, "%Y-%m-%d") - timedelta(days=1)).strftime("%Y-%m-%d")
+
+    t0 = time.perf_counter()
+    last_id = ""
+    scanned = reset = batches = 0
+
+    while True:
+        # um lote = uma transação curta (locks por pouco tempo)
+        with bind.begin() as conn:
+            ids = conn.execute(_PAGE, {
+                "b_last_id": last_id, "b_yesterday": yesterday, "b_limit": batch_size,
+            }).scalars().all()
+            if not ids:
+                break
+            params = {"b_ids": ids, "b_yesterday": yesterday}
+            conn.execute(_BUMP_USERS, params)
+            reset += conn.execute(_RESET_HABITS, params).rowcount
+
+        scanned += len(ids)
+        batches += 1
+        last_id = ids[-1]
+        if log:
+            log(f"  {reset} streaks zerados")
+        if len(ids) < batch_size:
+            break
+
+    streak_resets.inc(amount=reset)
+    elapsed = time.perf_counter() - t0
+    return {
+        "date": today,
+        "candidates": scanned,
+        "reset": reset,
+        "batches": batches,
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(reset / elapsed) if elapsed else None,
+    }
+
+
+def _run_locked(bind, **kwargs):
+    """reset_broken_streaks sob advisory lock; None se outra instância está rodando."""
+    if bind.dialect.name != "postgresql":
+        return reset_broken_streaks(bind, **kwargs)
+    with bind.connect() as conn:
+        if not conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": _RESET_LOCK_KEY}).scalar():
+            return None
+        try:
+            return reset_broken_streaks(bind, **kwargs)
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": _RESET_LOCK_KEY})
+            conn.commit()
+
+
+def run_exclusive(**kwargs) -> dict:
+    """{shard: resultado} — None no shard que outra instância está processando."""
+    return {name: _run_locked(bind, **kwargs) for name, bind in SHARD_ENGINES.items()}
+
+
+# ============================================================
+# SCHEDULER (thread do processo web)
+# ============================================================
+def seconds_until_next_run(now=None) -> float:
+    now = now or now_brazil()
+    midnight = BR_TZ.localize(datetime.combine(now.date() + timedelta(days=1), datetime.min.time()))
+    return max(0.0, (midnight - now).total_seconds()) + STREAK_RESET_DELAY_S
+
+
+class StreakResetScheduler:
+    def __init__(self):
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="streak-reset", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        thread = self._thread
+        if thread is None:
+            return
+        self._stop.set()
+        thread.join(timeout)
+        self._thread = None
+
+    def _loop(self):
+        first_wait = STREAK_RESET_DELAY_S if STREAK_RESET_ON_START else seconds_until_next_run()
+        if self._stop.wait(first_wait):
+            return
+        while not self._stop.is_set():
+            try:
+                for shard, result in run_exclusive().items():
+                    if result is not None:
+                        logger.info("streak reset [%s]: %s", shard, result)
+            except Exception:
+                logger.exception("streak reset falhou")
+            if self._stop.wait(seconds_until_next_run()):
+                return
+
+
+scheduler = StreakResetScheduler()
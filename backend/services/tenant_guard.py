@@ -0,0 +1,82 @@
+# services/tenant_guard.py
+#
+# Guard de tenant (dev/test): todo SELECT via Session que lê habits ou
+# habit_logs precisa filtrar por dono — habits.user_id, habits.id ou
+# habit_logs.habit_id/user_id comparados a um VALOR (parâmetro, IN, subquery).
+# Um JOIN habits.id = habit_logs.habit_id sozinho não escopa nada.
+#
+# Sem isso a query varre os logs de todos os usuários: o custo cresce com
+# a base inteira e o vazamento entre tenants fica a um bug de distância.
+#
+# Exceções legítimas (jobs, seed, admin) declaram a intenção:
+#     db.query(HabitLog).execution_options(tenant_scope_exempt=True)
+# Acesso via Core (engine.connect / conn.execute) não passa pela Session
+# e não é verificado — é o caminho de projections/seed/manage.py.
+from sqlalchemy import event
+from sqlalchemy.sql import visitors
+from sqlalchemy.sql.elements import BinaryExpression, ColumnClause
+
+from models import Habit, HabitLog
+
+EXEMPT_OPTION = "tenant_scope_exempt"
+
+_GUARDED_TABLES = {Habit.__tablename__, HabitLog.__tablename__}
+
+# (tabela, coluna) que identificam o dono da linha
+_SCOPE_COLUMNS = {
+    (Habit.__tablename__, "user_id"),
+    (Habit.__tablename__, "id"),
+    (HabitLog.__tablename__, "habit_id"),
+    (HabitLog.__tablename__, "user_id"),
+}
+
+
+class UnscopedQueryError(RuntimeError):
+    """SELECT em habits/habit_logs sem predicado de usuário/hábito."""
+
+
+def _column_key(element):
+    if isinstance(element, ColumnClause) and element.table is not None:
+        table = getattr(element.table, "name", None)
+        return (table, element.name)
+    return None
+
+
+def _guarded_tables(statement) -> set:
+    found = set()
+    for element in visitors.iterate(statement):
+        name = getattr(element, "name", None)
+        if getattr(element, "__visit_name__", None) == "table" and name in _GUARDED_TABLES:
+            found.add(name)
+    return found
+
+
+def _has_scope_predicate(statement) -> bool:
+    for element in visitors.iterate(statement):
+        if not isinstance(element, BinaryExpression):
+            continue
+        left, right = element.left, element.right
+        for column, other in ((left, right), (right, left)):
+            if _column_key(column) in _SCOPE_COLUMNS and not isinstance(other, ColumnClause):
+                return True
+    return False
+
+
+def check_statement(statement):
+    """Levanta UnscopedQueryError se o SELECT não tiver escopo de dono."""
+    tables = _guarded_tables(statement)
+    if tables and not _has_scope_predicate(statement):
+        raise UnscopedQueryError(
+            f"SELECT em {', '.join(sorted(tables))} sem filtro por user_id/habit_id. "
+            f"Escope a query ou marque execution_options({EXEMPT_OPTION}=True).\n{statement}"
+        )
+
+
+def install_tenant_guard(session_factory):
+    @event.listens_for(session_factory, "do_orm_execute")
+    def _guard(orm_execute_state):
+        if not orm_execute_state.is_select:
+            return
+        if orm_execute_state.execution_options.get(EXEMPT_OPTION):
+            return
+        check_statement(orm_execute_state.statement)
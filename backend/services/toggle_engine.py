@@ -0,0 +1,153 @@
+# services/toggle_engine.py
+#
+# Toggle do dia em uma única transação, seguro sob concorrência:
+# - upsert em (habit_id, date) que inverte `done` no próprio banco
+# - XP/streak do hábito e XP do usuário com UPDATE ... RETURNING
+# - eventos no habit_events (services/event_log.py)
+# Nada de ler-modificar-gravar em Python, nenhum refresh pós-commit.
+# Quem chama faz o commit (um só).
+import functools
+from datetime import datetime, timedelta
+
+from sqlalchemy import bindparam, case, func, not_, update
+
+from database import dialect_insert
+from models import Habit, HabitLog, generate_uuid
+from models_auth import AuthUser
+from services import event_log
+from services.change_seq import next_change_seq
+from services.metrics import engine_timer, timed
+from services.streak_engine import streak_sql_values
+from services.xp_engine import calculate_xp_for_habit, get_level_from_xp
+
+
+habit_logs = HabitLog.__table__
+habits = Habit.__table__
+users = AuthUser.__table__
+
+# statements montados uma vez, com bindparams: no caminho quente só
+# o execute roda (montar o statement custava mais que o próprio SQL)
+_MARK_HABIT = (
+    update(habits)
+    .where(habits.c.id == bindparam("b_habit_id"))
+    .values(
+        xp=habits.c.xp + bindparam("b_xp"),
+        change_seq=bindparam("b_seq"),
+        **streak_sql_values(habits, bindparam("b_today"), bindparam("b_yesterday")),
+    )
+    .returning(habits.c.xp, habits.c.current_streak, habits.c.best_streak)
+)
+_UNMARK_HABIT = (
+    update(habits)
+    .where(habits.c.id == bindparam("b_habit_id"))
+    .values(
+        xp=case((habits.c.xp < bindparam("b_xp"), 0), else_=habits.c.xp - bindparam("b_xp")),
+        change_seq=bindparam("b_seq"),
+    )
+    .returning(habits.c.xp, habits.c.current_streak, habits.c.best_streak)
+)
+_ADD_USER_XP = (
+    update(users)
+    .where(users.c.id == bindparam("b_user_id"))
+    .values(xp_total=case(
+        (func.coalesce(users.c.xp_total, 0) + bindparam("b_xp") < 0, 0),
+        else_=func.coalesce(users.c.xp_total, 0) + bindparam("b_xp"),
+    ))
+    .returning(users.c.xp_total)
+)
+_SET_USER_LEVEL = (
+    update(users)
+    .where(users.c.id == bindparam("b_user_id"))
+    .values(level=bindparam("b_level"), level_progress=bindparam("b_progress"))
+)
+
+
+@functools.lru_cache(maxsize=None)
+def _flip_log_stmt(dialect: str):
+    return (
+        dialect_insert(dialect)(habit_logs)
+        .values(
+            id=bindparam("b_id"), habit_id=bindparam("b_habit_id"), user_id=bindparam("b_user_id"),
+            date=bindparam("b_date"), done=True, change_seq=bindparam("b_seq"),
+        )
+        .on_conflict_do_update(
+            index_elements=["habit_id", "date"],
+            set_={
+                "done": not_(habit_logs.c.done),
+                "change_seq": bindparam("b_seq"),
+                "user_id": bindparam("b_user_id"),
+            },
+        )
+        .returning(habit_logs.c.done)
+    )
+
+
+def _flip_log(db, user_id: str, habit_id: str, today: str, seq: int) -> bool:
+    """Cria o log do dia como feito ou inverte o existente. Retorna o novo `done`."""
+    stmt = _flip_log_stmt(db.get_bind().dialect.name)
+    params = {
+        "b_id": generate_uuid(), "b_habit_id": habit_id, "b_user_id": user_id,
+        "b_date": today, "b_seq": seq,
+    }
+    return bool(db.execute(stmt, params).scalar_one())
+
+
+@timed("toggle_engine.apply_toggle")
+def apply_toggle(db, user, habit, today: str) -> dict:
+    """
+    Aplica o toggle de hoje sem commitar.
+    `user`/`habit` só fornecem ids e os parâmetros de XP; os valores
+    devolvidos vêm do banco (RETURNING), não dos objetos carregados.
+    """
+    # primeiro: trava a linha do usuário e pega o carimbo do /sync
+    seq = next_change_seq(db, user.id)
+    done = _flip_log(db, user.id, habit.id, today, seq)
+
+    xp_change = calculate_xp_for_habit(
+        habit.difficulty, habit.importance_weight, habit.frequency_per_week
+    )
+
+    # etapas com tempo próprio em engine_duration_seconds (antes cada
+    # engine tinha o seu @timed; agora é tudo SQL dentro deste toggle)
+    with engine_timer("toggle_engine.habit_xp_streak"):
+        if done:
+            yesterday = (datetime.strptime(today, "%Y-%m-%d") - timedelta(days=1)).strftime("%Y-%m-%d")
+            habit_row = db.execute(_MARK_HABIT, {
+                "b_habit_id": habit.id, "b_xp": xp_change, "b_seq": seq,
+                "b_today": today, "b_yesterday": yesterday,
+            }).one()
+        else:
+            habit_row = db.execute(_UNMARK_HABIT, {"b_habit_id": habit.id, "b_xp": xp_change, "b_seq": seq}).one()
+
+    xp_delta = xp_change if done else -xp_change
+
+    # log na mesma transação das projeções
+    with engine_timer("toggle_engine.events"):
+        event_log.record(
+            db,
+            event_log.habit_toggled(user.id, habit.id, today, done),
+            event_log.xp_applied(user.id, habit.id, today, xp_delta),
+        )
+
+    with engine_timer("toggle_engine.user_xp_level"):
+        # desmarcar também devolve o XP do usuário (antes ficava com a deriva)
+        total_xp = db.execute(_ADD_USER_XP, {"b_user_id": user.id, "b_xp": xp_delta}).scalar_one()
+
+        # a linha do usuário já está travada por esta transação
+        level_info = get_level_from_xp(total_xp)
+        db.execute(_SET_USER_LEVEL, {
+            "b_user_id": user.id, "b_level": level_info["level"], "b_progress": level_info["progress"],
+        })
+
+    return {
+        "done": done,
+        "xp_gained": xp_change if done else None,
+        "xp_lost": None if done else xp_change,
+        "habit_xp": habit_row.xp,
+        "current_streak": habit_row.current_streak,
+        "best_streak": habit_row.best_streak,
+        "global_xp": total_xp,
+        "level": level_info["level"],
+        "level_progress": level_info["progress"],
+        "next_level_xp": level_info["next_level_xp"],
+    }
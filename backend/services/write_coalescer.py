@@ -0,0 +1,177 @@
+# services/write_coalescer.py
+#
+# Group commit para o caminho quente do toggle. Requests concorrentes
+# enfileiram a mutação; uma thread junta até COALESCE_MAX_BATCH itens
+# (ou espera no máx. COALESCE_MAX_WAIT_MS) e aplica tudo numa transação:
+# um commit/fsync para o lote inteiro. Cada request recebe o próprio
+# resultado só depois do commit do seu lote.
+#
+# Timeout (COALESCE_TIMEOUT_S): só vale enquanto o item está na fila — ele
+# é cancelado (a thread pula) e o cliente recebe 503 + Retry-After. Item
+# que já saiu da fila vai commitar: esperamos o resultado em vez de dar
+# erro, senão a repetição do cliente desfaria o toggle.
+#
+# Opcional: WRITE_COALESCING=1. Desligado, o toggle commita sozinho.
+# Com shards, o lote é dividido por shard: uma transação (e um commit)
+# por banco envolvido.
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+from fastapi import HTTPException
+
+from database import SessionLocal
+from services.metrics import registry
+
+WRITE_COALESCING = os.getenv("WRITE_COALESCING", "0").strip() == "1"
+COALESCE_MAX_BATCH = int(os.getenv("COALESCE_MAX_BATCH", "64"))
+COALESCE_MAX_WAIT_MS = float(os.getenv("COALESCE_MAX_WAIT_MS", "5"))
+COALESCE_TIMEOUT_S = float(os.getenv("COALESCE_TIMEOUT_S", "30"))
+COALESCE_RETRY_AFTER = int(os.getenv("COALESCE_RETRY_AFTER", "1"))
+
+batch_size = registry.histogram(
+    "write_coalescer_batch_size", "Mutações por commit do coalescer",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+
+unapplied_writes = registry.counter(
+    "write_coalescer_unapplied_total", "Mutações que não chegaram a rodar", labels=("reason",),
+)
+
+_STOP = object()
+
+
+def _unavailable(detail: str) -> HTTPException:
+    return HTTPException(503, detail, headers={"Retry-After": str(COALESCE_RETRY_AFTER)})
+
+
+class WriteCoalescer:
+    def __init__(self, session_factory=SessionLocal, max_batch=COALESCE_MAX_BATCH, max_wait_ms=COALESCE_MAX_WAIT_MS):
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    # --------------------------------------------------------
+    # API
+    # --------------------------------------------------------
+    def submit(self, fn, *args, shard: str = None) -> Future:
+        """fn(db, *args) roda na thread do coalescer, sem commitar."""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((fn, args, future, shard))
+        return future
+
+    def run(self, fn, *args, shard: str = None, timeout: float = COALESCE_TIMEOUT_S):
+        future = self.submit(fn, *args, shard=shard)
+        try:
+            return future.result(timeout)
+        except FutureTimeout:
+            if not future.cancel():
+                # já saiu da fila: vai commitar, o resultado é do cliente
+                return future.result()
+            unapplied_writes.inc("timeout")
+            raise _unavailable("Gravação demorou demais, tente novamente")
+
+    def stop(self, timeout: float = 5.0):
+        """Drena a fila e encerra a thread (shutdown do app)."""
+        thread = self._thread
+        if thread is None:
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout)
+        self._thread = None
+
+        # o que entrou depois do _STOP não roda mais: falha explícita
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP and item[2].set_running_or_notify_cancel():
+                unapplied_writes.inc("stopped")
+                item[2].set_exception(_unavailable("Servidor reiniciando, tente novamente"))
+
+    # --------------------------------------------------------
+    # LOOP
+    # --------------------------------------------------------
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._loop, name="write-coalescer", daemon=True
+                )
+                self._thread.start()
+
+    def _loop(self):
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+
+            batch = [first]
+            stopping = False
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            by_shard = {}
+            for item in batch:
+                # cancelado por timeout enquanto esperava: não aplica
+                if not item[2].set_running_or_notify_cancel():
+                    continue
+                by_shard.setdefault(item[3], []).append(item)
+            for shard, items in by_shard.items():
+                self._flush(items, shard)
+            if stopping:
+                return
+
+    def _flush(self, batch, shard=None):
+        batch_size.observe(len(batch))
+        db = self.session_factory()
+        if shard is not None:
+            db.use_shard(shard)
+        try:
+            try:
+                results = [fn(db, *args) for fn, args, _, _ in batch]
+                db.commit()
+            except Exception:
+                db.rollback()
+                # um item ruim não derruba os outros: refaz um a um
+                self._flush_one_by_one(db, batch)
+                return
+
+            for (_, _, future, _), result in zip(batch, results):
+                future.set_result(result)
+        finally:
+            db.close()
+
+    def _flush_one_by_one(self, db, batch):
+        for fn, args, future, _ in batch:
+            try:
+                result = fn(db, *args)
+                db.commit()
+            except Exception as exc:
+                db.rollback()
+                future.set_exception(exc)
+            else:
+                future.set_result(result)
+
+
+coalescer = WriteCoalescer()
@@ -79,10 +79,10 @@ def get_level_from_xp(total_xp: int) -> dict:
     if total_xp < 0:
         total_xp = 0
 
-    # Descobre nível atual (nível mais alto cujo requisito <= total_xp)
-    level = 1
-    while total_xp >= xp_required_for_level(level + 1):
-        level += 1
+    # Nível mais alto cujo requisito <= total_xp, direto da fórmula:
+    #   50 * (level - 1)^2 <= total_xp  ⇔  level - 1 <= isqrt(total_xp // 50)
+    # (o loop antigo subia nível a nível: O(√xp) por toggle)
+    level = 1 + math.isqrt(total_xp // 50)
 
     xp_current = xp_required_for_level(level)
     xp_next = xp_required_for_level(level + 1)
@@ -99,45 +99,3 @@ def get_level_from_xp(total_xp: int) -> dict:
         "next_level_xp": xp_next,
         "progress": round(progress, 4)
     }
-
-
-# ============================================================
-# APLICA XP E ATUALIZA O USER
-# ============================================================
-
-def apply_xp_gain(user, habit, db, done=True):
-    """
-    Aplica XP ao usuário com base no hábito.
-    Se done=False → remove XP proporcional.
-    """
-
-    gained_xp = calculate_xp_for_habit(
-        difficulty=habit.difficulty,
-        importance=habit.importance_weight,
-        frequency_per_week=habit.frequency_per_week,
-        done=done
-    )
-
-    user.xp_total = int(user.xp_total or 0) + gained_xp
-    if user.xp_total < 0:
-        user.xp_total = 0
-
-    level_info = get_level_from_xp(user.xp_total)
-
-    # (Opcional) se você quiser sincronizar no banco:
-    user.level = level_info["level"]
-    user.level_progress = level_info["progress"]
-
-    db.commit()
-    try:
-        db.refresh(user)
-    except:
-        pass
-
-    return {
-        "gained_xp": gained_xp,
-        "total_xp": user.xp_total,
-        "level": level_info["level"],
-        "level_progress": level_info["progress"],
-        "next_level_xp": level_info["next_level_xp"]
-    }
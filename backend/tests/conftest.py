@@ -0,0 +1,80 @@
+# tests/conftest.py
+#
+#   python -m pytest -q            (de dentro de backend/)
+#
+# O app sobe uma vez por sessão num SQLite temporário, com os hooks de
+# contagem de queries ligados (SQL_DEBUG_HEADERS=1). O ambiente precisa
+# estar pronto ANTES do primeiro `import main`/`import database`.
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "tests.db")
+os.environ.pop("DATABASE_SHARDS", None)
+os.environ["SQL_DEBUG_HEADERS"] = "1"
+os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+os.environ.setdefault("STREAK_RESET_SCHEDULE", "0")
+sys.path.insert(0, BACKEND_DIR)
+
+import pytest
+
+from services.query_stats import assert_max_queries, assert_num_queries
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+
+    import main
+
+    with TestClient(main.app, base_url="http://localhost") as test_client:
+        yield test_client
+
+
+@pytest.fixture(scope="session")
+def new_user(client):
+    """Fábrica: new_user("nome") cadastra, loga e devolve os headers."""
+
+    def create(username: str) -> dict:
+        client.post(
+            "/auth/register", json={"email": f"{username}@t.com", "username": username, "password": "pw"},
+        ).raise_for_status()
+        login = client.post("/auth/login", json={"identifier": username, "password": "pw"})
+        return {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+    return create
+
+
+@pytest.fixture(scope="session")
+def auth_headers(client, new_user):
+    """Usuário com 3 hábitos, 2 deles marcados hoje."""
+    headers = new_user("q")
+
+    habit_ids = [
+        client.post("/habits/", json={"title": f"Hábito {i}"}, headers=headers).json()["id"]
+        for i in range(3)
+    ]
+    for habit_id in habit_ids[:2]:
+        client.post(f"/habits/{habit_id}/toggle", headers=headers).raise_for_status()
+    return headers
+
+
+@pytest.fixture
+def query_budget():
+    """
+    Orçamento de queries por bloco:
+
+        with query_budget(3):
+            client.get("/dashboard/", headers=auth_headers)
+
+    Conta tudo o que o bloco executa (inclusive dentro do request) e
+    falha com os N+1 suspeitos se passar do orçamento. exact=True exige o
+    número exato: para menos também falha (atualize o esperado).
+    """
+
+    def budget(queries: int, exact: bool = False):
+        return assert_num_queries(queries) if exact else assert_max_queries(queries)
+
+    return budget
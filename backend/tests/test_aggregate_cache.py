@@ -0,0 +1,74 @@
+from sqlalchemy import insert
+
+from database import engine
+from models import HabitLog
+from services import aggregate_cache
+
+logs = HabitLog.__table__
+
+CLOSED_MONTH = "2024-03"
+
+
+def _user_with_closed_month(client, new_user, username):
+    headers = new_user(username)
+    user_id = client.get("/auth/me", headers=headers).json()["id"]
+    habit_id = client.post("/habits/", json={"title": "Ler"}, headers=headers).json()["id"]
+
+    with engine.begin() as conn:
+        conn.execute(insert(logs).values(
+            id=f"{username}-log", habit_id=habit_id, user_id=user_id, date=f"{CLOSED_MONTH}-05", done=True,
+        ))
+    return headers, user_id, habit_id
+
+
+def test_closed_month_revalidates_with_etag(client, new_user):
+    headers, _, _ = _user_with_closed_month(client, new_user, "agg_etag")
+    url = f"/progress/monthly-overview?month={CLOSED_MONTH}"
+
+    first = client.get(url, headers=headers)
+    assert first.status_code == 200
+    assert first.headers["cache-control"] == "private, no-cache"
+    assert "max-age" not in first.headers["cache-control"]
+
+    again = client.get(url, headers={**headers, "If-None-Match": first.headers["etag"]})
+    assert again.status_code == 304
+
+
+def test_live_fields_change_the_etag(client, new_user):
+    headers, _, _ = _user_with_closed_month(client, new_user, "agg_live")
+    url = f"/progress/monthly-overview?month={CLOSED_MONTH}"
+
+    before = client.get(url, headers=headers)
+    client.post("/habits/", json={"title": "Correr"}, headers=headers).raise_for_status()
+    after = client.get(url, headers={**headers, "If-None-Match": before.headers["etag"]})
+
+    # total de hábitos é vivo: a revalidação devolve o corpo novo
+    assert after.status_code == 200
+    assert after.headers["etag"] != before.headers["etag"]
+
+
+def test_invalidate_closed_and_open_months(client, new_user):
+    headers, user_id, habit_id = _user_with_closed_month(client, new_user, "agg_inv")
+    client.get(f"/habits/{habit_id}/history?month={CLOSED_MONTH}", headers=headers).raise_for_status()
+
+    # mês aberto: nada a apagar
+    assert aggregate_cache.invalidate(engine, user_id, ["2099-01-01"], habit_id) == 0
+    assert aggregate_cache.invalidate(engine, user_id, [f"{CLOSED_MONTH}-31"], habit_id) >= 1
+    assert aggregate_cache.invalidate(engine, user_id, [f"{CLOSED_MONTH}-31"], habit_id) == 0
+
+
+def test_out_of_range_month_is_rejected_before_the_cache(client, new_user):
+    headers, user_id, habit_id = _user_with_closed_month(client, new_user, "agg_range")
+    urls = [
+        "/progress/monthly-overview?month={month}",
+        f"/habits/{habit_id}/history?month={{month}}",
+        f"/habits/{habit_id}/history?month={{month}}&format=bits",
+        f"/habits/{habit_id}/monthly-chart?month={{month}}",
+    ]
+    for month in ("2024-13", "2024-00", "9999-77", "0001-01", "2024-xx"):
+        for url in urls:
+            assert client.get(url.format(month=month), headers=headers).status_code == 400
+
+    with engine.connect() as conn:
+        rows = conn.execute(aggregate_cache.cache.select().where(aggregate_cache.cache.c.user_id == user_id)).all()
+    assert rows == []
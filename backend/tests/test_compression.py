@@ -0,0 +1,53 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from middleware.compression import CompressionMiddleware, skip_compression
+
+app = FastAPI()
+app.add_middleware(CompressionMiddleware, minimum_size=100)
+
+
+@app.get("/big")
+def big():
+    return {"items": ["x" * 10] * 50}
+
+
+@app.get("/small")
+def small():
+    return {"ok": True}
+
+
+@app.get("/raw")
+@skip_compression
+def raw():
+    return {"items": ["x" * 10] * 50}
+
+
+client = TestClient(app)
+
+
+def test_large_body_is_compressed():
+    response = client.get("/big", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+
+
+def test_uncompressed_variants_still_vary():
+    # pequena demais ou cliente sem gzip: cache na frente não pode reaproveitar
+    small = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    identity = client.get("/big", headers={"Accept-Encoding": "identity"})
+    for response in (small, identity):
+        assert "content-encoding" not in response.headers
+        assert "Accept-Encoding" in response.headers["vary"]
+
+
+def test_skip_compression_route():
+    response = client.get("/raw", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert "vary" not in response.headers
+
+
+def test_sse_stream_opts_out():
+    from routers.dashboard import dashboard_stream
+
+    assert getattr(dashboard_stream, "_skip_compression", False)
@@ -0,0 +1,23 @@
+import os
+
+import pytest
+from fastapi import HTTPException
+
+from services import compute_pool as compute_pool_module
+from services.compute_pool import ComputePool
+
+
+def test_crashed_worker_is_replaced(monkeypatch):
+    monkeypatch.setattr(compute_pool_module, "COMPUTE_POOL_ENABLED", True)
+    pool = ComputePool(workers=1, max_pending=2)
+    try:
+        # tarefa que derruba o worker nas duas tentativas → 503
+        with pytest.raises(HTTPException) as exc:
+            pool.run(os._exit, 1)
+        assert exc.value.status_code == 503
+
+        # o executor quebrado saiu de uso: o próximo request funciona
+        assert pool.run(pow, 2, 10) == 1024
+        assert pool.pending() == 0
+    finally:
+        pool.shutdown()
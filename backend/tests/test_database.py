@@ -0,0 +1,49 @@
+import pytest
+
+import database
+from database import DEFAULT_SHARD, _parse_shards
+
+
+def test_unnamed_url_with_query_string():
+    shards = _parse_shards("postgresql://u:p@db1/app?sslmode=require,postgresql+psycopg2://u:p@db2/app?sslmode=require")
+    assert list(shards) == [DEFAULT_SHARD, "s1"]
+    assert shards[DEFAULT_SHARD].url.query["sslmode"] == "require"
+    assert shards["s1"].url.host == "db2"
+
+
+def test_named_urls():
+    shards = _parse_shards("main=postgresql://u:p@db1/app?sslmode=require,eu=postgresql://u:p@db2/app")
+    assert list(shards) == ["main", "eu"]
+    assert shards["main"].url.host == "db1"
+
+
+def test_home_url_reuses_engine():
+    shards = _parse_shards(f"main={database.DATABASE_URL}")
+    assert shards["main"] is database.engine
+
+
+def test_default_shard_is_required():
+    with pytest.raises(RuntimeError, match="'main'"):
+        _parse_shards("s1=postgresql://u:p@db1/app,s2=postgresql://u:p@db2/app")
+
+
+def test_upgrade_indexes_habit_events_by_user(tmp_path):
+    from sqlalchemy import create_engine, inspect, text
+
+    import models  # noqa: F401  (registra as tabelas no metadata)
+    from services.bootstrap import _upgrade_schema
+
+    bind = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with bind.begin() as conn:
+        database.Base.metadata.create_all(bind=conn)
+        # banco anterior ao índice
+        conn.execute(text("DROP INDEX ix_habit_events_user"))
+        _upgrade_schema(conn)
+
+        assert "ix_habit_events_user" in {ix["name"] for ix in inspect(conn).get_indexes("habit_events")}
+        # rebalance: leitura/remoção dos eventos de um usuário pelo índice
+        plan = conn.execute(text(
+            "EXPLAIN QUERY PLAN SELECT * FROM habit_events WHERE user_id = 'u' ORDER BY id"
+        )).all()
+        assert any("ix_habit_events_user" in row[-1] for row in plan)
+    bind.dispose()
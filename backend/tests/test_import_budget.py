@@ -0,0 +1,53 @@
+# Orçamento de import do app (cold start).
+#
+# O teste de tempo é opt-in: só roda com IMPORT_BUDGET_MS definido (melhor
+# de 3 para tirar o ruído), p.ex. numa máquina de CI dedicada:
+#
+#   IMPORT_BUDGET_MS=1000 python -m pytest -q tests/test_import_budget.py
+#
+# Na suíte padrão, relógio de parede é flaky; a regressão de verdade
+# (módulo pesado carregado no import) é coberta pelo teste de lazy.
+import json
+import os
+import re
+import subprocess
+import sys
+
+import pytest
+
+from conftest import BACKEND_DIR
+
+IMPORT_BUDGET_MS = os.getenv("IMPORT_BUDGET_MS")
+
+# só podem carregar no primeiro request que realmente precisa deles
+LAZY_MODULES = ("passlib", "jose")
+
+_IMPORTTIME_RE = re.compile(r"import time:\s+\d+ \|\s+(\d+) \| (\s*)(\S+)")
+
+
+def _python(*args) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *args], cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+    )
+
+
+def _import_ms() -> float:
+    """Tempo cumulativo (ms) de `import main` num interpretador novo."""
+    for line in _python("-X", "importtime", "-c", "import main").stderr.splitlines():
+        m = _IMPORTTIME_RE.match(line)
+        if m and not m.group(2) and m.group(3) == "main":
+            return int(m.group(1)) / 1000
+    raise AssertionError("linha de importtime de `main` não encontrada")
+
+
+@pytest.mark.skipif(not IMPORT_BUDGET_MS, reason="defina IMPORT_BUDGET_MS para medir o import")
+def test_import_main_within_budget():
+    budget = float(IMPORT_BUDGET_MS)
+    best = min(_import_ms() for _ in range(3))
+    assert best <= budget, f"import main: {best:.0f} ms (orçamento: {budget:.0f} ms)"
+
+
+def test_heavy_modules_stay_lazy():
+    code = f"import json, sys, main; print(json.dumps([m for m in {LAZY_MODULES!r} if m in sys.modules]))"
+    eager = json.loads(_python("-c", code).stdout.strip().splitlines()[-1])
+    assert eager == []
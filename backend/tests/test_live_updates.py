@@ -0,0 +1,87 @@
+import json
+import sys
+import threading
+import types
+
+from services import live_updates
+
+
+class _Recorder:
+    def __init__(self):
+        self.events = []
+
+    def publish(self, user_id, event):
+        self.events.append(event)
+
+
+def test_first_toggle_publishes_achievement(client, new_user, monkeypatch):
+    headers = new_user("live")
+    habit_id = client.post("/habits/", json={"title": "Ler"}, headers=headers).json()["id"]
+    recorder = _Recorder()
+    monkeypatch.setattr(live_updates, "broker", recorder)
+
+    client.post(f"/habits/{habit_id}/toggle", headers=headers).raise_for_status()
+
+    types_ = [event["type"] for event in recorder.events]
+    assert types_[0] == "habit_toggled"
+    unlocked = {event["name"] for event in recorder.events if event["type"] == "achievement_unlocked"}
+    # 1 de 1 hábitos feito: primeiro hábito e dia perfeito
+    assert {"Primeiro Passo", "Dia Perfeito"} <= unlocked
+
+
+def test_publish_failure_is_logged(monkeypatch, caplog):
+    class Broken:
+        def publish(self, user_id, event):
+            raise ConnectionError("redis fora")
+
+    monkeypatch.setattr(live_updates, "broker", Broken())
+    live_updates.publish("u1", "habit_toggled")
+    assert "falha ao publicar habit_toggled" in caplog.text
+
+
+def test_redis_listener_reconnects_and_resyncs(monkeypatch):
+    delivered = threading.Event()
+    done = threading.Event()
+
+    class PubSub:
+        def __init__(self, attempt):
+            self.attempt = attempt
+
+        def subscribe(self, channel):
+            pass
+
+        def listen(self):
+            if self.attempt == 0:
+                raise ConnectionError("conexão caiu")
+            yield {"data": json.dumps({"user_id": "u1", "event": {"type": "habit_toggled"}})}
+            done.wait(5)
+
+        def close(self):
+            pass
+
+    class Client:
+        attempts = 0
+
+        def pubsub(self, ignore_subscribe_messages=False):
+            pubsub = PubSub(Client.attempts)
+            Client.attempts += 1
+            return pubsub
+
+    class Hub:
+        resyncs = 0
+
+        def deliver(self, user_id, event):
+            delivered.set()
+
+        def resync_all(self):
+            Hub.resyncs += 1
+
+    fake_redis = types.SimpleNamespace(Redis=types.SimpleNamespace(from_url=lambda url: Client()))
+    monkeypatch.setitem(sys.modules, "redis", fake_redis)
+
+    live_updates.RedisBroker(Hub(), "redis://fake")
+    try:
+        assert delivered.wait(5)
+        assert Client.attempts == 2 and Hub.resyncs == 1
+    finally:
+        done.set()
@@ -0,0 +1,12 @@
+from services import load_shedding
+
+
+def test_toggle_survives_overload(client, new_user, monkeypatch):
+    headers = new_user("shed")
+    habit_id = client.post("/habits/", json={"title": "Ler"}, headers=headers).json()["id"]
+
+    monkeypatch.setattr(load_shedding.state, "pressure", lambda: 100.0)
+
+    assert client.get("/habits/", headers=headers).status_code == 503
+    assert client.get("/progress/insights", headers=headers).status_code == 503
+    assert client.post(f"/habits/{habit_id}/toggle", headers=headers).status_code == 200
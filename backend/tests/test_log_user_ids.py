@@ -0,0 +1,41 @@
+from sqlalchemy import delete, insert, update
+
+import database
+from models import HabitLog
+from services import bootstrap
+
+logs = HabitLog.__table__
+
+
+def test_backfill_terminates_with_orphan_logs(client):
+    # logs de hábito que não existe mais: ficam NULL, mas não travam o loop
+    orphans = [
+        {"id": f"orphan-{i}", "habit_id": "habit-apagado", "date": f"2024-01-{i + 1:02d}", "done": True}
+        for i in range(5)
+    ]
+    with database.engine.begin() as conn:
+        conn.execute(insert(logs), orphans)
+    try:
+        assert bootstrap.backfill_log_user_ids(batch_size=2, bind=database.engine) == 0
+    finally:
+        with database.engine.begin() as conn:
+            conn.execute(delete(logs).where(logs.c.habit_id == "habit-apagado"))
+
+
+def test_reads_include_unbackfilled_logs(client, new_user, monkeypatch):
+    headers = new_user("legacy")
+    habit_id = client.post("/habits/", json={"title": "Ler"}, headers=headers).json()["id"]
+    client.post(f"/habits/{habit_id}/toggle", headers=headers).raise_for_status()
+
+    # log anterior à coluna + processo que ainda não viu o backfill terminar
+    with database.engine.begin() as conn:
+        conn.execute(update(logs).where(logs.c.habit_id == habit_id).values(user_id=None))
+    monkeypatch.setattr(bootstrap, "_log_user_ids_done", set())
+    monkeypatch.setattr(bootstrap, "_log_user_ids_checked", {})
+
+    assert client.get("/habits/daily-summary", headers=headers).json()["done_today"] == 1
+    assert client.get("/dashboard/weekly-overview", headers=headers).json()[-1]["done"] == 1
+
+    assert bootstrap.backfill_log_user_ids(bind=database.engine) == 1
+    assert bootstrap.log_user_ids_complete(database.engine)
+    assert client.get("/habits/daily-summary", headers=headers).json()["done_today"] == 1
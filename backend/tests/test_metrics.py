@@ -0,0 +1,47 @@
+import os
+import subprocess
+import sys
+
+from conftest import BACKEND_DIR
+
+
+def test_toggle_steps_are_timed(client, new_user):
+    headers = new_user("metrics")
+    habit_id = client.post("/habits/", json={"title": "Ler"}, headers=headers).json()["id"]
+    client.post(f"/habits/{habit_id}/toggle", headers=headers).raise_for_status()
+
+    body = client.get("/metrics").text
+    for step in ("apply_toggle", "habit_xp_streak", "events", "user_xp_level"):
+        assert f'engine_duration_seconds_count{{engine="toggle_engine.{step}"}}' in body
+    # engines que o toggle não chama mais não aparecem
+    assert "streak_engine.update_streak" not in body
+
+
+def _boot(**env) -> subprocess.CompletedProcess:
+    """Importa o main num interpretador novo, com o ambiente dado."""
+    code = (
+        "from fastapi.testclient import TestClient; import main; "
+        "client = TestClient(main.app, base_url='http://localhost'); "
+        "print(client.get('/metrics', headers={'Authorization': 'Bearer s3cr3t'}).status_code)"
+    )
+    clean = {k: v for k, v in os.environ.items() if not k.startswith("METRICS_")}
+    return subprocess.run(
+        [sys.executable, "-c", code], cwd=BACKEND_DIR, capture_output=True, text=True,
+        env={**clean, "ENV": "prod", "DB_AUTO_INIT": "0", **env},
+    )
+
+
+def test_prod_metrics_off_by_default():
+    result = _boot()
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.split()[-1] == "404"
+
+
+def test_prod_metrics_require_token():
+    result = _boot(METRICS_ENABLED="1")
+    assert result.returncode != 0
+    assert "METRICS_TOKEN" in result.stderr
+
+    result = _boot(METRICS_ENABLED="1", METRICS_TOKEN="s3cr3t")
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.split()[-1] == "200"
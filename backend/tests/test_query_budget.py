@@ -0,0 +1,14 @@
+import pytest
+
+
+def test_dashboard_within_budget(client, auth_headers, query_budget):
+    # usuário autenticado + hábitos + logs do período
+    with query_budget(3):
+        response = client.get("/dashboard/", headers=auth_headers)
+    assert response.status_code == 200
+
+
+def test_budget_overrun_fails(client, auth_headers, query_budget):
+    with pytest.raises(AssertionError, match="orçamento: 1"):
+        with query_budget(1):
+            client.get("/dashboard/", headers=auth_headers)
@@ -0,0 +1,51 @@
+# Número EXATO de queries por endpoint de leitura. Para mais é regressão
+# (query repetida / N+1); para menos, ótimo — atualize EXPECTED junto.
+import time
+
+import pytest
+
+# inclui a query do usuário autenticado (get_current_user)
+EXPECTED = {
+    "/dashboard/": 3,
+    "/dashboard/?fields=today,habits": 3,
+    "/dashboard/?fields=user": 1,
+    "/dashboard/weekly-overview": 3,
+    "/progress/": 4,
+    "/progress/?fields=today,streaks": 3,
+    "/progress/monthly-overview?month={month}": 3,
+    "/progress/weekly-overview": 3,
+    "/progress/full-history": 3,
+    "/progress/insights": 3,
+    "/sync/": 4,
+}
+
+
+@pytest.mark.parametrize("path", EXPECTED)
+def test_exact_query_count(client, auth_headers, query_budget, path):
+    with query_budget(EXPECTED[path], exact=True):
+        response = client.get(path.format(month=time.strftime("%Y-%m")), headers=auth_headers)
+    assert response.status_code == 200
+    assert response.headers["X-DB-Queries"] == str(EXPECTED[path])
+
+
+# usuário + hábito + trava/carimbo + log + hábito + evento + XP + nível;
+# a checagem de conquistas roda depois da resposta (background task)
+TOGGLE_QUERIES = 8
+
+
+def test_toggle_query_count(client, new_user, query_budget):
+    headers = new_user("toggle_count")
+    habit_id = client.post("/habits/", json={"title": "Ler"}, headers=headers).json()["id"]
+
+    client.post(f"/habits/{habit_id}/toggle", headers=headers).raise_for_status()
+
+    # o header só conta o request: marcar e desmarcar custam o mesmo
+    for done in (False, True):
+        response = client.post(f"/habits/{habit_id}/toggle", headers=headers)
+        assert response.json()["done"] is done
+        assert response.headers["X-DB-Queries"] == str(TOGGLE_QUERIES)
+
+    # desmarcar não agenda nada depois da resposta: o bloco inteiro conta
+    with query_budget(TOGGLE_QUERIES, exact=True):
+        response = client.post(f"/habits/{habit_id}/toggle", headers=headers)
+    assert response.json()["done"] is False
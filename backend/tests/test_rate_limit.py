@@ -0,0 +1,100 @@
+import threading
+
+from fastapi.testclient import TestClient
+
+from services import rate_limit
+from services.rate_limit import InMemoryBackend, LocalCASStore, Policy, SharedStoreBackend
+
+LOGIN = Policy("login", capacity=2, period_seconds=60)
+
+
+def test_bucket_limits_after_capacity():
+    backend = InMemoryBackend()
+    assert backend.consume("ip:1", LOGIN) == 0.0
+    assert backend.consume("ip:1", LOGIN) == 0.0
+    assert backend.consume("ip:1", LOGIN) > 0
+
+
+def test_key_rotation_does_not_reset_active_victim():
+    backend = InMemoryBackend(max_keys=10)
+    for _ in range(3):
+        backend.consume("victim", LOGIN)
+
+    # atacante gira chaves; a vítima segue sendo usada no meio
+    for i in range(50):
+        backend.consume(f"attacker:{i}", LOGIN)
+        if i % 5 == 0:
+            assert backend.consume("victim", LOGIN) > 0
+
+    assert len(backend._buckets) == 10
+
+
+def test_full_table_evicts_least_recently_used():
+    backend = InMemoryBackend(max_keys=3)
+    for key in ("a", "b", "c"):
+        backend.consume(key, LOGIN)
+    backend.consume("a", LOGIN)
+    backend.consume("d", LOGIN)
+    assert list(backend._buckets) == ["c", "a", "d"]
+
+
+def test_shared_store_limits_after_capacity():
+    backend = SharedStoreBackend(LocalCASStore())
+    assert backend.consume("ip:1", LOGIN) == 0.0
+    assert backend.consume("ip:1", LOGIN) == 0.0
+    assert backend.consume("ip:1", LOGIN) > 0
+    # outra chave tem o próprio bucket
+    assert backend.consume("ip:2", LOGIN) == 0.0
+
+
+def test_shared_store_concurrent_consumers_never_overadmit():
+    backend = SharedStoreBackend(LocalCASStore(), max_retries=1000)
+    policy = Policy("burst", capacity=10, period_seconds=3600)
+    allowed = []
+
+    def worker():
+        for _ in range(10):
+            if backend.consume("hot", policy) == 0.0:
+                allowed.append(1)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(allowed) == 10
+
+
+def test_shared_store_contention_counts_as_exceeded():
+    class AlwaysConflicting(LocalCASStore):
+        def cas(self, key, expected, new, ttl_seconds):
+            return False
+
+    assert SharedStoreBackend(AlwaysConflicting(), max_retries=3).consume("k", LOGIN) > 0
+
+
+def test_local_cas_store_compare_and_expiry():
+    store = LocalCASStore()
+    assert store.get("k") is None
+    assert store.cas("k", None, "1", ttl_seconds=60)
+    assert not store.cas("k", None, "2", ttl_seconds=60)  # valor mudou
+    assert store.cas("k", "1", "2", ttl_seconds=-1)        # já expirado
+    assert store.get("k") is None
+    assert store.cas("k", None, "3", ttl_seconds=60)
+
+
+def test_bad_passwords_from_elsewhere_do_not_lock_the_owner(client, new_user, monkeypatch):
+    new_user("lockout")
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(rate_limit, "backend", InMemoryBackend())
+    app = client.app
+
+    attacker = TestClient(app, base_url="http://localhost", client=("203.0.113.9", 1))
+    statuses = [
+        attacker.post("/auth/login", json={"identifier": "lockout", "password": "errada"}).status_code
+        for _ in range(int(rate_limit.LOGIN_PER_IP_IDENTIFIER.capacity) + 1)
+    ]
+    assert statuses[-1] == 429
+
+    owner = TestClient(app, base_url="http://localhost", client=("198.51.100.7", 1))
+    assert owner.post("/auth/login", json={"identifier": "lockout", "password": "pw"}).status_code == 200
@@ -0,0 +1,83 @@
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from services.write_coalescer import WriteCoalescer
+
+
+class FakeSession:
+    def __init__(self):
+        self.commits = 0
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_timed_out_item_is_never_applied():
+    session = FakeSession()
+    coalescer = WriteCoalescer(session_factory=lambda: session, max_wait_ms=0)
+    release = threading.Event()
+    applied = []
+
+    def toggle(db, name):
+        applied.append(name)
+
+    try:
+        # a thread fica presa no primeiro item; o segundo espera na fila
+        first = coalescer.submit(lambda db: release.wait(5))
+        with pytest.raises(HTTPException) as exc:
+            coalescer.run(toggle, "primeiro", timeout=0.05)
+        assert exc.value.status_code == 503
+        assert exc.value.headers["Retry-After"]
+
+        release.set()
+        assert first.result(5) is True
+        # o próximo lote já passou do cancelado
+        assert coalescer.run(toggle, "depois", timeout=5) is None
+        assert applied == ["depois"]
+    finally:
+        release.set()
+        coalescer.stop()
+
+
+def test_dequeued_item_waits_past_timeout():
+    coalescer = WriteCoalescer(session_factory=FakeSession, max_wait_ms=0)
+    started = threading.Event()
+
+    def slow(db):
+        started.set()
+        threading.Event().wait(0.2)
+        return "ok"
+
+    try:
+        # já está rodando quando o timeout vence: devolve o resultado
+        assert coalescer.run(slow, timeout=0.05) == "ok"
+        assert started.is_set()
+    finally:
+        coalescer.stop()
+
+
+def test_stop_fails_items_queued_after_stop():
+    coalescer = WriteCoalescer(session_factory=FakeSession, max_wait_ms=0)
+    release = threading.Event()
+    coalescer.submit(lambda db: release.wait(5))
+
+    stopper = threading.Thread(target=coalescer.stop)
+    stopper.start()
+    # entra na fila depois do _STOP
+    while coalescer._queue.qsize() == 0:
+        pass
+    late = coalescer.submit(lambda db: "nunca")
+    release.set()
+    stopper.join(5)
+
+    with pytest.raises(HTTPException) as exc:
+        late.result(1)
+    assert exc.value.status_code == 503